@@ -4,15 +4,21 @@ from sqlalchemy.orm import Session
 from jose import JWTError
 
 from .. import schemas, services
+from ..services import user_service
+from ..services.token_revocation_service import token_revocation_store
 from ..core.database import get_db
 from ..core.security import decode_token
-from ..models.user import User
 
 # OAuth2 scheme definition
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Decodes token, validates user, and returns the user object."""
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db, scope="function")) -> schemas.Principal:
+    """Decodes token, validates user, and returns the authenticated principal.
+
+    The principal comes from the token claims. Only the user's token version and
+    active flag are checked, through a short-lived cache, so the common case
+    runs no user query at all.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,22 +30,43 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     email: str = payload.get("sub")
     if email is None:
         raise credentials_exception
-    token_data = schemas.TokenData(email=email)
+    try:
+        jti = payload.get("jti")
+        if jti and token_revocation_store.is_revoked(db, jti):
+            raise credentials_exception
+        token_data = schemas.TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            is_admin=bool(payload.get("is_admin", False)),
+            token_version=payload.get("ver"),
+        )
 
-    user = services.user_service.get_user_by_email(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    if not user.is_active:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
-    return user
+        if token_data.user_id is None or token_data.token_version is None:
+            # Tokens issued before the uid/ver claims existed: resolve by email
+            user = user_service.get_user_by_email(db, email=token_data.email)
+            if user is None:
+                raise credentials_exception
+            if not user.is_active:
+                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+            return schemas.Principal(id=user.id, email=user.email, is_admin=user.is_admin)
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+        state = user_service.get_user_auth_state(db, token_data.user_id)
+        if state is None or state.token_version != token_data.token_version:
+            raise credentials_exception
+        if not state.is_active:
+             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+        return schemas.Principal(id=token_data.user_id, email=token_data.email, is_admin=token_data.is_admin)
+    finally:
+        # Auth only reads: end its transaction now rather than hold the connection for the route
+        db.close()
+
+def get_current_active_user(current_user: schemas.Principal = Depends(get_current_user)) -> schemas.Principal:
     """Ensures the user fetched is active (redundant check included in get_current_user)."""
     # This function primarily serves as a dependency marker for active users.
     # The active check is already in get_current_user.
     return current_user
 
-def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_admin_user(current_user: schemas.Principal = Depends(get_current_user)) -> schemas.Principal:
     """Ensures the current user is an admin."""
     if not current_user.is_admin:
         raise HTTPException(
@@ -47,4 +74,3 @@ def get_current_admin_user(current_user: User = Depends(get_current_user)) -> Us
             detail="The user doesn't have enough privileges"
         )
     return current_user
-
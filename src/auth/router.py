@@ -1,52 +1,114 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 
 from .. import schemas, services
-from ..services.user_service import authenticate_user
-from ..core.database import get_db
-from ..core.security import create_access_token
+from ..services import refresh_token_service
+from ..services.token_revocation_service import revoke_token_payload
+from ..services.user_service import authenticate_user_async
+from ..core.database import get_db, DuplicateEntryError
+from ..core.security import create_access_token, decode_token, get_password_hash_async, PasswordHashingBusy
+from .dependencies import oauth2_scheme, get_current_user, get_current_admin_user
 from ..core.config import settings
 
 router = APIRouter()
 
+def _hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+def _create_user_access_token(user) -> str:
+    """Issues an access token carrying everything get_current_user needs."""
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "is_admin": user.is_admin, "ver": user.token_version},
+        expires_delta=access_token_expires,
+    )
+
+# Auth routes are async so bcrypt waits on the dedicated hashing executor
+# instead of holding a thread of the shared request threadpool.
 @router.post("/register", response_model=schemas.UserRead, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db, scope="function")):
     """Registers a new user."""
-    db_user = services.user_service.get_user_by_email(db, email=user.email)
-    if db_user:
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy_exception()
+    try:
+        return await run_in_threadpool(
+            services.user_service.create_user, db=db, user=user, hashed_password=hashed_password
+        )
+    except DuplicateEntryError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    return services.user_service.create_user(db=db, user=user)
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db, scope="function")):
     """Authenticates user and returns JWT token."""
-    user = authenticate_user(db, email=form_data.username, password=form_data.password)
+    try:
+        user = await authenticate_user_async(db, email=form_data.username, password=form_data.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy_exception()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "is_admin": user.is_admin}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
-
-# Placeholder for refresh token - requires more complex logic (e.g., storing refresh tokens)
-@router.post("/refresh-token") #, response_model=schemas.Token)
-def refresh_token():
-    """Refreshes an access token (Placeholder)."""
-    # This endpoint requires storing and validating refresh tokens, which adds complexity.
-    # For this test, we might skip the full implementation or use a simplified approach.
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="Refresh token functionality not fully implemented in this version."
-    )
+    access_token = _create_user_access_token(user) # Before the commit below expires `user`
+    refresh = await run_in_threadpool(refresh_token_service.issue_refresh_token, db, user.id, user.token_version)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh}
+
+@router.post("/refresh-token", response_model=schemas.Token)
+def refresh_token(body: schemas.RefreshTokenRequest, db: Session = Depends(get_db, scope="function")):
+    """Exchanges a refresh token for a new access token and a rotated refresh token.
+
+    Costs one indexed lookup and no password hashing. Reusing a rotated refresh
+    token revokes the whole session.
+    """
+    rotated = refresh_token_service.rotate_refresh_token(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, new_refresh_token = rotated
+    return {
+        "access_token": _create_user_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": new_refresh_token,
+    }
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: Optional[schemas.LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_user)
+):
+    """Revokes the current access token and, if given, the refresh token's session."""
+    revoke_token_payload(db, decode_token(token) or {})
+    if body and body.refresh_token:
+        refresh_token_service.revoke_refresh_token(db, body.refresh_token)
 
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_token(
+    body: schemas.TokenRevokeRequest,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user)
+):
+    """Revokes a (e.g. compromised) access token. Requires admin authentication."""
+    payload = decode_token(body.token)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired token")
+    if not revoke_token_payload(db, payload):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token cannot be revoked individually")
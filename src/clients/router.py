@@ -1,84 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import BinaryIO, Iterator, List, Optional
+import csv
 
-from .. import schemas, services
-from ..core.database import get_db
-from ..auth.dependencies import get_current_active_user # Assuming all logged-in users can manage clients for now
-from ..models.user import User # To use User model for dependency
+from .. import schemas
+from ..services import client_import_service, client_service
+from ..core.database import get_async_db, get_batch_db, get_db, DuplicateEntryError
+from ..core.replicas import get_read_db
+from ..core.responses import FastJSONResponse, dump_rows
+from ..core.response_cache import cache_response
+from ..auth.dependencies import get_current_active_user, get_current_admin_user # Assuming all logged-in users can manage clients for now
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.ClientRead, status_code=status.HTTP_201_CREATED)
-def create_client(
+async def create_client(
     client: schemas.ClientCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Creates a new client. Requires authentication."""
-    # Check for existing email
-    db_client_email = services.client_service.get_client_by_email(db, email=client.email)
-    if db_client_email:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    # Check for existing CPF
-    db_client_cpf = services.client_service.get_client_by_cpf(db, cpf=client.cpf)
-    if db_client_cpf:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CPF already registered")
+    # Duplicate email/CPF is reported by the unique constraints on insert
+    try:
+        return await client_service.create_client_async(db=db, client=client)
+    except DuplicateEntryError as e:
+        detail = "CPF already registered" if e.field == "cpf" else "Email already registered"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
-    return services.client_service.create_client(db=db, client=client)
+def _csv_lines(upload: BinaryIO) -> Iterator[str]:
+    """Decodes the upload one line at a time, so an encoding error is tied to its line."""
+    for number, line in enumerate(upload, start=1):
+        yield line.decode("utf-8-sig" if number == 1 else "utf-8")
 
-@router.get("/", response_model=List[schemas.ClientRead])
-def read_clients(
+@router.post("/import", response_model=schemas.ClientImportReport)
+def import_clients(
+    file: UploadFile = File(..., description="CSV with header: name,email,cpf[,phone,address]"),
+    chunk_size: int = Query(client_import_service.DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_batch_db, scope="function"), # Commits per chunk, not once per request
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Bulk loads are an admin operation
+):
+    """Bulk-imports clients from a CSV upload. Requires admin authentication.
+
+    The file is streamed and processed in chunks; the report lists every row
+    as inserted, duplicate (in the file or already registered) or rejected.
+    Each chunk is committed as soon as it is written, so the import is not
+    all-or-nothing: if it stops early (e.g. a 400 for a bad line), the chunks
+    before the failing one stay imported.
+    """
+    reader = csv.DictReader(_csv_lines(file.file))
+    try:
+        missing = {"name", "email", "cpf"} - set(reader.fieldnames or [])
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Missing CSV columns: {', '.join(sorted(missing))}"
+            )
+        return client_import_service.import_clients(db, reader, chunk_size=chunk_size)
+    except UnicodeDecodeError:
+        # The underlying reader counts the lines it got, so the failing one is the next
+        # (DictReader.line_num only moves after a complete row)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV line {reader.reader.line_num + 1} is not valid UTF-8"
+        )
+    except csv.Error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed CSV at line {reader.reader.line_num}: {e}")
+
+@router.get("/", response_model=List[schemas.ClientRead], dependencies=[Depends(cache_response(("clients",), principal=get_current_active_user))])
+async def read_clients(
     skip: int = 0,
     limit: int = 100,
     name: Optional[str] = Query(None, description="Filter by client name (case-insensitive)"),
     email: Optional[str] = Query(None, description="Filter by client email (case-insensitive)"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    sort_by: Optional[client_service.ClientSortField] = Query(None, description="Sort by an order stat, descending"),
+    include_stats: bool = Query(False, description="Include order count, lifetime value and last order date"),
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
+    current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Retrieves a list of clients with pagination and filtering. Requires authentication."""
-    clients = services.client_service.get_clients(db, skip=skip, limit=limit, name=name, email=email)
-    return clients
+    clients = await client_service.get_clients_async(db, skip=skip, limit=limit, name=name, email=email, sort_by=sort_by)
+    if include_stats:
+        clients = [schemas.client_read_with_stats(c) for c in clients]
+    return FastJSONResponse(dump_rows(schemas.ClientRead, clients))
+
+@router.get("/search", response_model=List[schemas.ClientRead], dependencies=[Depends(cache_response(("clients",), principal=get_current_active_user))])
+async def search_clients(
+    q: str = Query(..., min_length=1, description="Name, email prefix, phone or CPF digits"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
+    current_user: schemas.Principal = Depends(get_current_active_user)
+):
+    """Searches clients using the trigram indexes, most relevant first. Requires authentication."""
+    clients = await client_service.search_clients_async(db, q=q, limit=limit)
+    return FastJSONResponse(dump_rows(schemas.ClientRead, clients))
 
-@router.get("/{client_id}", response_model=schemas.ClientRead)
-def read_client(
+@router.get("/{client_id}", response_model=schemas.ClientRead, dependencies=[Depends(cache_response(("client:{client_id}",), principal=get_current_active_user))])
+async def read_client(
     client_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    include_stats: bool = Query(False, description="Include order count, lifetime value and last order date"),
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
+    current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Retrieves a specific client by ID. Requires authentication."""
-    db_client = services.client_service.get_client(db, client_id=client_id)
+    db_client = await client_service.get_client_async(db, client_id=client_id)
     if db_client is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+    if include_stats:
+        return schemas.client_read_with_stats(db_client)
     return db_client
 
 @router.put("/{client_id}", response_model=schemas.ClientRead)
-def update_client(
+async def update_client(
     client_id: int,
     client: schemas.ClientUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Updates a specific client by ID. Requires authentication."""
     # Check if updated email already exists for another client
     if client.email:
-        existing_client = services.client_service.get_client_by_email(db, email=client.email)
+        existing_client = await client_service.get_client_by_email_async(db, email=client.email)
         if existing_client and existing_client.id != client_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered by another client")
 
-    updated_client = services.client_service.update_client(db=db, client_id=client_id, client_update=client)
+    updated_client = await client_service.update_client_async(db=db, client_id=client_id, client_update=client)
     if updated_client is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
     return updated_client
 
 @router.delete("/{client_id}", response_model=schemas.ClientRead)
-def delete_client(
+async def delete_client(
     client_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user) # Or get_current_admin_user if required
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_active_user) # Or get_current_admin_user if required
 ):
     """Deletes a specific client by ID. Requires authentication."""
-    deleted_client = services.client_service.delete_client(db=db, client_id=client_id)
+    deleted_client = await client_service.delete_client_async(db=db, client_id=client_id)
     if deleted_client is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
     # Consider implications: should orders be deleted/anonymized?
@@ -0,0 +1,206 @@
+"""Admission control: per-route-class concurrency limits with a bounded wait queue.
+
+Every request belongs to a class ("read", "write", "auth", "import"...). A
+class runs at most `limit` requests at once in this worker; further requests
+wait in a FIFO queue of at most `queue` entries for up to `max_wait` seconds.
+A request that finds the queue full, or is still queued at its deadline, is
+shed with 503 and a Retry-After estimated from the class's recent service
+time, before routing, so it opens no DB session and takes no threadpool
+thread. Cheap catalog reads thus keep their own capacity while slow imports
+or bcrypt-bound logins pile up.
+
+The slot is held until the response has been sent; limits are per worker.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from .config import settings
+from .metrics import REGISTRY
+
+ADMISSION_IN_FLIGHT = REGISTRY.gauge("admission_in_flight", "Requests holding an admission slot", ["route_class"])
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("admission_queue_depth", "Requests waiting for an admission slot", ["route_class"])
+ADMISSION_SHED = REGISTRY.counter(
+    "admission_shed", "Requests rejected with 503 by admission control", ["route_class", "reason"]
+)
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests spent queued", ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+UNLIMITED = "none" # Route class that bypasses admission control (/metrics, health checks)
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class ClassLimit(NamedTuple):
+    name: str
+    limit: int # Requests running at once
+    queue: int # Requests waiting for a slot
+    max_wait: float # Seconds a request may wait before being shed
+
+class RouteClassRule(NamedTuple):
+    method: str # "*" for any
+    prefix: str # Path prefix, matched on segment boundaries
+    route_class: str
+
+def parse_class_limits(spec: str) -> Dict[str, ClassLimit]:
+    """Parses "class=limit/queue@max_wait" entries separated by ";".
+
+    Example: "read=128/512@2;import=2/4@10"
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        name, _, value = entry.partition("=")
+        sizes, _, max_wait = value.partition("@")
+        limit, _, queue = sizes.partition("/")
+        if int(limit) < 1:
+            raise ValueError(f"Invalid admission limit in {entry!r}")
+        limits[name.strip()] = ClassLimit(name.strip(), int(limit), int(queue or 0), float(max_wait or 0))
+    return limits
+
+def parse_route_classes(spec: str) -> List[RouteClassRule]:
+    """Parses "METHOD /prefix=class" entries separated by ";" (METHOD may be "*").
+
+    Example: "* /auth=auth;POST /clients/import=import;GET /metrics=none"
+    """
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, route_class = entry.partition("=")
+        method, _, prefix = route.strip().partition(" ")
+        rules.append(RouteClassRule(method.upper(), prefix.strip().rstrip("/") or "/", route_class.strip()))
+    return rules
+
+class AdmissionClass:
+    """Slots and FIFO wait queue of one route class, in one worker."""
+
+    def __init__(self, limit: ClassLimit):
+        self.name = limit.name
+        self.limit = limit.limit
+        self.queue = limit.queue
+        self.max_wait = limit.max_wait
+        self.active = 0
+        self.service_time = 0.1 # EWMA of seconds a slot is held, for Retry-After
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Takes a slot. Returns None once admitted, else the reason to shed the request."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            ADMISSION_IN_FLIGHT.set(self.active, route_class=self.name)
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), route_class=self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled(): # Granted just as we gave up
+                if isinstance(exc, asyncio.CancelledError):
+                    self.release(0.0)
+                    raise
+            else:
+                waiter.cancel()
+                self._forget(waiter)
+                if isinstance(exc, asyncio.CancelledError): # Client went away while queued
+                    raise
+                return "timeout"
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start, route_class=self.name)
+        return None
+
+    def release(self, held: float) -> None:
+        """Frees a slot held for `held` seconds, handing it to the oldest waiter if any."""
+        self.service_time += 0.2 * (held - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None) # The slot passes on; active stays the same
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters), route_class=self.name)
+                return
+        ADMISSION_QUEUE_DEPTH.set(0, route_class=self.name)
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.set(self.active, route_class=self.name)
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), route_class=self.name)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        return min(60, max(1, math.ceil(self.service_time * (self.queued + 1) / self.limit)))
+
+class AdmissionController:
+    """Maps requests to route classes; holds the classes used by AdmissionMiddleware."""
+
+    def __init__(self, limits: Dict[str, ClassLimit], routes: List[RouteClassRule], enabled: bool = True):
+        self.enabled = enabled
+        self.routes = routes
+        self.classes = {name: AdmissionClass(limit) for name, limit in limits.items()}
+
+    def class_for(self, method: str, path: str) -> Optional[AdmissionClass]:
+        """The request's class; None when it is not limited."""
+        name = None
+        for rule in self.routes:
+            if rule.method in ("*", method) and (
+                rule.prefix == "/" or path == rule.prefix or path.startswith(rule.prefix + "/")
+            ):
+                name = rule.route_class
+                break
+        if name is None:
+            name = "read" if method in READ_METHODS else "write"
+        return self.classes.get(name)
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        route_class = self.controller.class_for(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await route_class.acquire()
+        if reason is not None:
+            ADMISSION_SHED.inc(route_class=route_class.name, reason=reason)
+            await self._shed(send, route_class.retry_after())
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(time.perf_counter() - start)
+
+    @staticmethod
+    async def _shed(send, retry_after: int) -> None:
+        body = json.dumps({"detail": "Server busy, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+admission_controller = AdmissionController(
+    parse_class_limits(settings.ADMISSION_LIMITS),
+    parse_route_classes(settings.ADMISSION_ROUTE_CLASSES),
+    enabled=settings.ADMISSION_ENABLED,
+)
@@ -0,0 +1,74 @@
+"""Small thread-safe in-process caches."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .metrics import REGISTRY
+
+_MISSING = object()
+
+CACHE_REQUESTS = REGISTRY.counter("cache_requests", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a TTL or at an absolute time.
+
+    `expires_at` is a time.time() timestamp (e.g. a JWT `exp`); `ttl` is relative.
+    Lookups are counted in cache_requests when the cache has a `name`.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    if self.name:
+                        CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return value
+                del self._data[key]
+            self.misses += 1
+            if self.name:
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None:
+            deadline = time.time() + ttl
+            expires_at = deadline if expires_at is None else min(expires_at, deadline)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,136 @@
+"""Response compression: gzip, and brotli when the package is installed.
+
+Only complete bodies are compressed. A response whose first body message
+announces more_body (StreamingResponse, file exports) passes through as is,
+so streams keep flowing chunk by chunk. Also left alone: bodies under the
+minimum size, responses that already have a Content-Encoding, partial (206)
+and bodiless responses, "Cache-Control: no-transform" and media types that
+are not text-like (images, archives, event streams...).
+
+Large bodies are compressed on the threadpool (zlib and brotli release the
+GIL) so they do not stall the event loop.
+"""
+import gzip
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import REGISTRY
+
+try:
+    import brotli
+except ImportError: # Optional: gzip only
+    brotli = None
+
+COMPRESSION_BYTES = REGISTRY.counter(
+    "http_response_compression_bytes", "Response body bytes before (in) and after (out) compression", ["encoding", "stage"]
+)
+COMPRESSION_SECONDS = REGISTRY.histogram(
+    "http_response_compression_seconds", "Time spent compressing one response body", ["encoding"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# encoding -> compress(body, level); preferred first when the client accepts several equally
+ENCODERS: Dict[str, Callable[[bytes, int], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda body, quality: brotli.compress(body, quality=quality)
+ENCODERS["gzip"] = lambda body, level: gzip.compress(body, compresslevel=level, mtime=0)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+NO_BODY_STATUSES = frozenset({204, 206, 304})
+
+def negotiate(accept_encoding: str, available=ENCODERS) -> Optional[str]:
+    """The available encoding the client prefers (by q-value), or None for identity."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def is_compressible(status: int, headers: Headers) -> bool:
+    if status in NO_BODY_STATUSES or "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    if media_type.startswith("text/"):
+        return media_type != "text/event-stream"
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+class CompressionMiddleware:
+    """Compresses complete response bodies of at least `minimum_size` bytes."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        thread_minimum_size: int = 128 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message # Held until the first body message shows what to do
+                return
+            if start_message is not None:
+                if message["type"] == "http.response.body":
+                    message = await self._prepare(start_message, message, encoding)
+                await send(start_message)
+                start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _prepare(self, start_message, message, encoding: Optional[str]):
+        headers = MutableHeaders(raw=start_message["headers"])
+        if not is_compressible(start_message["status"], headers):
+            return message
+        headers.add_vary_header("Accept-Encoding")
+        body = message.get("body", b"")
+        if encoding is None or message.get("more_body", False) or len(body) < self.minimum_size:
+            return message
+        if len(body) >= self.thread_minimum_size:
+            compressed = await run_in_threadpool(self._compress, encoding, body)
+        else:
+            compressed = self._compress(encoding, body)
+        if len(compressed) >= len(body):
+            return message
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        return {**message, "body": compressed}
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        start = time.perf_counter()
+        compressed = ENCODERS[encoding](body, self.levels[encoding])
+        COMPRESSION_SECONDS.observe(time.perf_counter() - start, encoding=encoding)
+        COMPRESSION_BYTES.inc(len(body), encoding=encoding, stage="in")
+        COMPRESSION_BYTES.inc(len(compressed), encoding=encoding, stage="out")
+        return compressed
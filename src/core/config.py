@@ -6,10 +6,115 @@ load_dotenv()
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql+psycopg2://user:password@db:5432/lu_estilo_db")
+    # Async stack (asyncpg/aiosqlite); derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: str | None = os.getenv("ASYNC_DATABASE_URL")
+    # Comma-separated read replicas for GET routes (sync URLs, async driver derived)
+    DATABASE_REPLICA_URLS: str | None = os.getenv("DATABASE_REPLICA_URLS")
+    # How long a failed replica stays out of rotation
+    DB_REPLICA_EJECT_SECONDS: float = float(os.getenv("DB_REPLICA_EJECT_SECONDS", 30))
+    # After a write, the client's reads go to the primary for this long (should exceed replica lag)
+    DB_READ_YOUR_WRITES_SECONDS: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+    # Connection pool (PostgreSQL; SQLite keeps SQLAlchemy's default pool)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    # Recycle connections older than this (seconds, -1 disables) so failovers/idle kills don't leave stale ones
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # LIFO reuses the warmest connections and lets idle extras hit the server timeout
+    DB_POOL_USE_LIFO: bool = os.getenv("DB_POOL_USE_LIFO", "true").lower() == "true"
+    # Lifespan warmup before serving (routes, pools, hot statements, revocation filter; see core.warmup)
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+    # Connections opened per pool at startup (capped at DB_POOL_SIZE)
+    DB_POOL_WARM_CONNECTIONS: int = int(os.getenv("DB_POOL_WARM_CONNECTIONS", 5))
+    # A request running the same SELECT this many times is reported as an N+1 (0 disables)
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+    # Raise instead of logging a warning (the test suite turns this on)
+    SQL_N_PLUS_ONE_RAISE: bool = os.getenv("SQL_N_PLUS_ONE_RAISE", "false").lower() == "true"
+    # Shared directory for multi-worker /metrics; each worker writes its values there (empty it on deploy)
+    METRICS_MULTIPROC_DIR: str | None = os.getenv("METRICS_MULTIPROC_DIR")
+    METRICS_SYNC_SECONDS: float = float(os.getenv("METRICS_SYNC_SECONDS", 1))
+    # Cache for read-mostly GET routes, invalidated by tags on commit (see core.response_cache)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 60))
+    RESPONSE_CACHE_MAX_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_MAX_TTL_SECONDS", 600))
+    # Expired (not invalidated) entries still answer requests for this long while one request refreshes them
+    RESPONSE_CACHE_STALE_SECONDS: float = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", 30))
+    # Per worker; entries larger than MAX_ENTRY_BYTES are not cached
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024))
+    # "memory://" invalidates per worker; "redis://host:6379/0" spreads invalidations to all workers (needs the redis package)
+    RESPONSE_CACHE_STORAGE_URL: str = os.getenv("RESPONSE_CACHE_STORAGE_URL", "memory://")
+    # Response compression (gzip; brotli too when the package is installed); bodies under the minimum stay as is
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    # Levels trade CPU per response for bytes on the wire (see tests/benchmarks/bench_compression.py)
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 5))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "mysecretkey")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14))
     SENTRY_DSN: str | None = os.getenv("SENTRY_DSN")
+    # Trace sampling (see core.tracing): base rate, per-route overrides as "METHOD /route=rate;..."
+    SENTRY_TRACES_SAMPLE_RATE: float = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", 0.01))
+    SENTRY_TRACES_ROUTE_RATES: str = os.getenv(
+        "SENTRY_TRACES_ROUTE_RATES",
+        "GET /products=0.001;GET /products/{product_id}=0.001;GET /clients=0.005;"
+        "POST /orders=0.1;PUT /orders/{order_id}=0.1;POST /clients/import=1.0",
+    )
+    # Routes recently slower than this, or answering 5xx, are sampled at the problem rate
+    SENTRY_TRACES_SLOW_SECONDS: float = float(os.getenv("SENTRY_TRACES_SLOW_SECONDS", 1.0))
+    SENTRY_TRACES_PROBLEM_SAMPLE_RATE: float = float(os.getenv("SENTRY_TRACES_PROBLEM_SAMPLE_RATE", 0.5))
+    # Healthy routes are down-sampled to about this many traces per minute each (0 disables)
+    SENTRY_TRACES_PER_ROUTE_PER_MINUTE: float = float(os.getenv("SENTRY_TRACES_PER_ROUTE_PER_MINUTE", 30))
+    # Fraction of traced requests that are also profiled
+    SENTRY_PROFILES_SAMPLE_RATE: float = float(os.getenv("SENTRY_PROFILES_SAMPLE_RATE", 0.1))
+    # bcrypt runs on its own bounded pool; attempts beyond workers + queue get a 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
+    # How long a worker trusts its cached token_version/is_active for a user
+    AUTH_STATE_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_STATE_CACHE_TTL_SECONDS", 5))
+    AUTH_STATE_CACHE_SIZE: int = int(os.getenv("AUTH_STATE_CACHE_SIZE", 10000))
+    # Verified JWT claims are memoized per token digest until the token's exp (0 disables)
+    JWT_CACHE_SIZE: int = int(os.getenv("JWT_CACHE_SIZE", 10000))
+    # Access token denylist: in-memory Bloom filter synced from revoked_tokens
+    REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", 100000))
+    REVOCATION_BLOOM_ERROR_RATE: float = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", 0.001))
+    REVOCATION_SYNC_SECONDS: float = float(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+    REVOCATION_PURGE_SECONDS: float = float(os.getenv("REVOCATION_PURGE_SECONDS", 3600))
+    # Token-bucket limits as "METHOD /path=capacity/seconds@ip|user" entries separated by ";"
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_RULES: str = os.getenv(
+        "RATE_LIMIT_RULES",
+        "POST /auth/login=10/60@ip;POST /auth/register=5/60@ip;POST /auth/refresh-token=30/60@ip;"
+        "POST /clients=30/60@user;POST /clients/import=5/60@user;"
+        "POST /products=30/60@user;POST /orders=30/60@user;POST /orders=120/60@ip",
+    )
+    # "memory://" keeps buckets per worker; "redis://host:6379/0" shares them (needs the redis package)
+    RATE_LIMIT_STORAGE_URL: str = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+    # Only enable behind a proxy that sets X-Forwarded-For
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+    # Request deadline in seconds (0: none), unless the X-Request-Timeout header asks for less/more (up to MAX).
+    # Applied to DB statements as a statement timeout; requests past it get 504
+    REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 30))
+    REQUEST_TIMEOUT_MAX_SECONDS: float = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", 60))
+    # Per-route defaults as "METHOD /prefix=seconds" entries separated by ";" (METHOD may be *)
+    REQUEST_TIMEOUT_ROUTES: str = os.getenv("REQUEST_TIMEOUT_ROUTES", "GET /orders=10;POST /clients/import=300")
+    # statement_timeout the PostgreSQL server/role already applies, in ms (0: none).
+    # Deadlines longer than it need no SET LOCAL
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+    # Admission control per worker: "class=concurrency/queue@max_wait_seconds" entries separated by ";".
+    # Requests are "read" (GET/HEAD/OPTIONS) or "write" unless ADMISSION_ROUTE_CLASSES says otherwise
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_LIMITS: str = os.getenv(
+        "ADMISSION_LIMITS", "read=128/512@2;write=32/128@5;auth=16/64@5;import=2/4@30"
+    )
+    # "METHOD /prefix=class" entries separated by ";" (METHOD may be *); class "none" is not limited
+    ADMISSION_ROUTE_CLASSES: str = os.getenv(
+        "ADMISSION_ROUTE_CLASSES", "* /auth=auth;POST /clients/import=import;GET /metrics=none"
+    )
 
     class Config:
         env_file = ".env"
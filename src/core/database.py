@@ -1,17 +1,294 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterable, Optional, Union
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.exceptions import HTTPException
 from .config import settings
+from .metrics import REGISTRY
+from .query_stats import instrument_queries
 
-engine = create_engine(settings.DATABASE_URL)
+POOL_CHECKOUT_WAIT = REGISTRY.histogram(
+    "db_pool_checkout_wait_seconds", "Time to obtain a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+POOL_CHECKOUT_TIMEOUTS = REGISTRY.counter("db_pool_checkout_timeouts", "Checkouts that hit the pool timeout", ["pool"])
+POOL_CHECKED_OUT = REGISTRY.gauge("db_pool_checked_out", "Connections currently checked out", ["pool"])
+POOL_OVERFLOW = REGISTRY.gauge("db_pool_overflow", "Overflow connections in use beyond pool_size", ["pool"])
+POOL_SIZE = REGISTRY.gauge("db_pool_size", "Configured pool size", ["pool"])
+POOL_CONNECTS = REGISTRY.counter("db_pool_connects", "New DBAPI connections opened", ["pool"])
+POOL_INVALIDATED = REGISTRY.counter("db_pool_invalidated", "Connections discarded as stale or broken", ["pool"])
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited, labelled by pool_logging_name."""
+
+    def connect(self):
+        name = self.logging_name or "default"
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, pool=name)
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def pool_options(url: Union[str, URL], name: str, is_async: bool = False) -> dict:
+    """Engine keyword arguments applying the DB_POOL_* settings.
+
+    SQLite keeps SQLAlchemy's default pool (in-memory databases cannot use a QueuePool).
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"pool_logging_name": name}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_use_lifo": settings.DB_POOL_USE_LIFO,
+    }
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """Keeps the db_pool_* gauges and counters for `engine`'s pool up to date.
+
+    Listeners are attached to the engine, so they survive engine.dispose().
+    """
+    # "checkin" fires before the pool takes the connection back, so count the events
+    # instead of asking the pool
+    def _checkout(*args):
+        POOL_CHECKED_OUT.inc(pool=name)
+        _update_overflow()
+
+    def _checkin(*args):
+        POOL_CHECKED_OUT.dec(pool=name)
+        _update_overflow()
+
+    def _update_overflow():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size(), pool=name)
+            POOL_OVERFLOW.set(max(POOL_CHECKED_OUT.value(pool=name) - pool.size(), 0), pool=name)
+
+    def _connect(*args):
+        POOL_CONNECTS.inc(pool=name)
+
+    def _invalidate(*args):
+        POOL_INVALIDATED.inc(pool=name)
+
+    event.listen(engine, "checkout", _checkout)
+    event.listen(engine, "checkin", _checkin)
+    event.listen(engine, "connect", _connect)
+    event.listen(engine, "invalidate", _invalidate)
+    event.listen(engine, "soft_invalidate", _invalidate)
+
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL, "primary"))
+instrument_pool(engine, "primary")
+instrument_queries(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers for the sync URL's backend, e.g. postgresql+psycopg2 -> postgresql+asyncpg
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> URL:
+    """Returns `url` rewritten to use the backend's async driver."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.get_driver_name() == driver:
+        return parsed
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}")
+
+_async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **pool_options(_async_url, "primary_async", is_async=True))
+instrument_pool(async_engine.sync_engine, "primary_async")
+instrument_queries(async_engine.sync_engine)
+# Objects stay usable after commit: attribute access must not lazy-load outside the event loop
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+# Prebuilt statements (see product_service) with sample parameters; core.warmup runs
+# each once at startup so their SQL is compiled before the first request needs it
+HOT_STATEMENTS: list = []
+
+def hot_statement(statement, **sample_params):
+    """Registers `statement` for the startup warmup and returns it unchanged."""
+    HOT_STATEMENTS.append((statement, sample_params))
+    return statement
+
+class RequestSession:
+    """Request-scoped stand-in for a Session, with a unit-of-work boundary.
+
+    The real session is only created when an attribute is first used, so
+    requests answered from a cache or rejected early never touch the pool.
+    commit() only flushes (ids, defaults and constraint errors surface as
+    before); the request boundary commits once (see session_scope).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+        self.commit_requested = False
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def commit(self) -> None:
+        self.flush()
+        self.commit_requested = True
+
+    def rollback(self) -> None:
+        if self._session is not None:
+            self._session.rollback()
+        self.commit_requested = False
+
+    def complete(self) -> None:
+        """Commits once if any service asked to; otherwise ends the transaction."""
+        if self._session is not None and self.commit_requested:
+            self._session.commit()
+        self.commit_requested = False
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+
+class AsyncRequestSession(RequestSession):
+    """RequestSession for the async stack (wraps an AsyncSession)."""
+
+    async def commit(self) -> None:
+        await self.flush()
+        self.commit_requested = True
+
+    async def rollback(self) -> None:
+        if self._session is not None:
+            await self._session.rollback()
+        self.commit_requested = False
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """AsyncSession.run_sync, with the sync code's commit() calls deferred as well."""
+        inner = RequestSession(None)
+
+        def call(sync_session, *a, **kw):
+            inner._session = sync_session
+            return fn(inner, *a, **kw)
+
+        result = await self.__getattr__("run_sync")(call, *args, **kwargs)
+        self.commit_requested = self.commit_requested or inner.commit_requested
+        return result
+
+    async def complete(self) -> None:
+        if self._session is not None and self.commit_requested:
+            await self._session.commit()
+        self.commit_requested = False
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+# Routes declare the session dependencies with scope="function" so the boundary
+# runs after the response is serialized but before it is sent: a failed commit
+# becomes a 500 rather than a success response for lost writes.
+
+@contextmanager
+def session_scope(factory):
+    """Unit of work for one request: commit once at the end.
+
+    Requested commits are kept when the route ends with an HTTPException (a
+    deliberate error response); any other exception rolls the request back.
+    """
+    db = RequestSession(factory)
+    try:
+        yield db
+    except HTTPException:
+        db.complete()
+        raise
+    else:
+        db.complete()
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def async_session_scope(factory):
+    """session_scope for the async stack."""
+    db = AsyncRequestSession(factory)
+    try:
+        yield db
+    except HTTPException:
+        await db.complete()
+        raise
+    else:
+        await db.complete()
+    finally:
+        await db.close()
+
 def get_db():
+    with session_scope(SessionLocal) as db:
+        yield db
+
+async def get_async_db():
+    async with async_session_scope(AsyncSessionLocal) as db:
+        yield db
+
+def get_batch_db():
+    """A plain Session whose commit() really commits, for routes that commit in steps.
+
+    Long bulk writes (the client import) use it so each step releases its locks
+    and keeps its rows even if a later step fails; anything uncommitted is rolled
+    back on close.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+class DuplicateEntryError(ValueError):
+    """Raised by services when an INSERT/UPDATE hits a unique constraint."""
+
+    def __init__(self, field: str):
+        super().__init__(f"Duplicate value for '{field}'")
+        self.field = field
+
+def unique_violation_field(exc: IntegrityError, fields: Iterable[str]) -> Optional[str]:
+    """Returns which of `fields` a unique-constraint violation refers to, or None.
+
+    Understands psycopg2 (diag.constraint_name), asyncpg (the driver error
+    behind SQLAlchemy's adapter carries constraint_name and detail),
+    "Key (field)=" details and SQLite ("UNIQUE constraint failed:
+    table.field") error messages.
+    """
+    orig = exc.orig
+    driver_error = getattr(orig, "__cause__", None) # asyncpg: UniqueViolationError
+    diag = getattr(orig, "diag", None)
+    constraint = (
+        getattr(diag, "constraint_name", None) or getattr(driver_error, "constraint_name", None) or ""
+    )
+    message = " ".join(filter(None, (str(orig), getattr(driver_error, "detail", None))))
+    for field in fields:
+        if (
+            constraint.endswith(f"_{field}")
+            or f"({field})" in message
+            or f".{field}" in message
+            or f'_{field}"' in message # Quoted constraint name, e.g. "ix_clients_email"
+        ):
+            return field
+    return None
@@ -0,0 +1,218 @@
+"""Per-request deadlines, propagated to the database as statement timeouts.
+
+DeadlineMiddleware gives each request a deadline: the X-Request-Timeout
+header (seconds, capped at REQUEST_TIMEOUT_MAX_SECONDS) or the route's
+default from REQUEST_TIMEOUT_ROUTES, else REQUEST_TIMEOUT_SECONDS. The
+deadline lives in a ContextVar, which SQLAlchemy's greenlets and
+run_in_threadpool both carry, and is applied to the statements the request
+runs:
+
+- PostgreSQL: SET LOCAL statement_timeout to the time left, before a statement
+  whenever the timeout in force (the last one set in the transaction, else
+  DB_STATEMENT_TIMEOUT_MS) would let it run past the deadline
+- SQLite: a progress handler interrupts the statement once the deadline passes
+
+A statement stopped this way raises DeadlineExceeded, answered with 504; the
+session is closed on the way out and its connection returns to the pool. The
+middleware also stops the request at the deadline if it is still waiting on
+something else (admission queue, pool checkout, an external call), as long as
+the response has not started.
+"""
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, NamedTuple, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from .config import settings
+from .metrics import REGISTRY
+
+DEADLINE_EXCEEDED = REGISTRY.counter(
+    "request_deadline_exceeded", "Requests answered with 504 at their deadline, by where they were stopped", ["stage"]
+)
+
+TIMEOUT_HEADER = b"x-request-timeout"
+_SQLITE_CHECK_EVERY = 1000 # SQLite VM instructions between deadline checks
+_STATEMENT_DEADLINE = "statement_deadline" # Key in the pooled connection's info
+_STATEMENT_TIMEOUT = "statement_timeout_ms" # Key in the pooled connection's info: set in this transaction
+_REARM_SLACK_MS = 100 # Overshoot tolerated before re-arming (well within _BACKSTOP_GRACE)
+_BACKSTOP_GRACE = 0.25 # Seconds the middleware waits past the deadline for the database to stop first
+
+# time.monotonic() by which the current request must be done
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed while the database was running one of its statements."""
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline (None: no deadline)."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Runs the block with a deadline `seconds` from now (kept if an outer one is sooner)."""
+    deadline = None if seconds is None else time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+# Database side
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_deadline(session: Session, transaction, connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.info[_STATEMENT_DEADLINE] = _deadline.get() # Read by the progress handler
+
+@event.listens_for(Engine, "begin")
+def _reset_statement_timeout(connection) -> None:
+    connection.info.pop(_STATEMENT_TIMEOUT, None) # SET LOCAL ended with the previous transaction
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _arm_statement_timeout(connection, cursor, statement, parameters, context, executemany) -> None:
+    deadline = _deadline.get()
+    if deadline is None or connection.dialect.name != "postgresql":
+        return
+    # At least 1 ms: 0 would disable the timeout
+    milliseconds = max(1, int((deadline - time.monotonic()) * 1000))
+    armed = connection.info.get(_STATEMENT_TIMEOUT, settings.DB_STATEMENT_TIMEOUT_MS or None)
+    if armed is not None and milliseconds >= armed - _REARM_SLACK_MS:
+        return # The timeout in force already stops this statement by the deadline
+    cursor.execute(f"SET LOCAL statement_timeout = {milliseconds}") # Same cursor: no event, no recursion
+    connection.info[_STATEMENT_TIMEOUT] = milliseconds
+
+@event.listens_for(Engine, "connect")
+def _install_progress_handler(dbapi_connection, connection_record) -> None:
+    driver_connection = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    if not hasattr(driver_connection, "set_progress_handler"):
+        return
+    info = connection_record.info
+
+    # Runs on the thread executing the statement: reads the connection's info, not the ContextVar
+    def interrupt_when_late() -> int:
+        deadline = info.get(_STATEMENT_DEADLINE)
+        return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+    result = driver_connection.set_progress_handler(interrupt_when_late, _SQLITE_CHECK_EVERY)
+    if asyncio.iscoroutine(result): # aiosqlite
+        await_only(result)
+
+@event.listens_for(Engine, "checkin")
+def _clear_statement_deadline(dbapi_connection, connection_record) -> None:
+    connection_record.info.pop(_STATEMENT_DEADLINE, None)
+    connection_record.info.pop(_STATEMENT_TIMEOUT, None)
+
+def _is_statement_timeout(exc: BaseException) -> bool:
+    for error in (exc, exc.__cause__):
+        if error is None:
+            continue
+        if "57014" in (getattr(error, "sqlstate", None), getattr(error, "pgcode", None)): # query_canceled
+            return True
+        if str(error) == "interrupted": # SQLite progress handler
+            return True
+    return False
+
+@event.listens_for(Engine, "handle_error")
+def _raise_deadline_exceeded(context) -> None:
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() >= deadline and _is_statement_timeout(context.original_exception):
+        DEADLINE_EXCEEDED.inc(stage="statement")
+        raise DeadlineExceeded("Statement stopped at the request deadline") from context.original_exception
+
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded) -> JSONResponse:
+    return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+
+# Request side
+
+class RouteTimeout(NamedTuple):
+    method: str # "*" for any
+    prefix: str # Path prefix, matched on segment boundaries
+    seconds: float
+
+def parse_route_timeouts(spec: str) -> List[RouteTimeout]:
+    """Parses "METHOD /prefix=seconds" entries separated by ";" (METHOD may be "*").
+
+    Example: "GET /orders=10;POST /clients/import=300"
+    """
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, seconds = entry.partition("=")
+        method, _, prefix = route.strip().partition(" ")
+        rules.append(RouteTimeout(method.upper(), prefix.strip().rstrip("/") or "/", float(seconds)))
+    return rules
+
+class DeadlineMiddleware:
+    """Sets the request deadline and answers 504 if it passes before the response starts."""
+
+    def __init__(self, app, default_seconds: float, max_seconds: float, routes: List[RouteTimeout] = ()):
+        self.app = app
+        self.default_seconds = default_seconds
+        self.max_seconds = max_seconds
+        self.routes = routes
+
+    def timeout_for(self, scope) -> float:
+        for name, value in scope.get("headers", []):
+            if name == TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_seconds)
+                break
+        method, path = scope["method"], scope["path"]
+        for rule in self.routes:
+            if rule.method in ("*", method) and (
+                rule.prefix == "/" or path == rule.prefix or path.startswith(rule.prefix + "/")
+            ):
+                return rule.seconds
+        return self.default_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        seconds = self.timeout_for(scope)
+        if seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+        response_started = False
+
+        async def send_until_started(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                timeout.reschedule(None) # Streams may outlive the deadline once started
+            await send(message)
+
+        # The backstop fires just after the deadline, so a running statement is stopped by the
+        # database (connection kept) rather than by cancelling the task (connection discarded)
+        timeout = asyncio.timeout(seconds + _BACKSTOP_GRACE)
+        with deadline_scope(seconds):
+            try:
+                async with timeout:
+                    await self.app(scope, receive, send_until_started)
+            except TimeoutError:
+                if response_started or not timeout.expired():
+                    raise
+                DEADLINE_EXCEEDED.inc(stage="request")
+                body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 504,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
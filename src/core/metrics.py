@@ -0,0 +1,394 @@
+"""Minimal in-process metrics (counters, gauges, histograms) in Prometheus text format.
+
+Counters and histograms are written without locks: each thread updates its own
+shard and readers add the shards up. With several worker processes, each one
+writes a snapshot of its values to a shared directory (see
+MetricsRegistry.enable_multiprocess) and /metrics merges them, so a scrape that
+lands on any worker reports the totals. The merge folds the counters and
+histograms of workers that have exited into one aggregate snapshot and removes
+their files, so the directory does not grow with worker restarts.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[str, ...]
+
+_AGGREGATE_FILE = "metrics_aggregate.json" # Exited workers' counters and histograms, folded together
+_LOCK_FILE = "metrics.lock"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def collect(self) -> Dict[LabelKey, object]:
+        """This process's values by label key."""
+        return dict(self._values)
+
+    def merge(self, into: Dict[LabelKey, object], key: LabelKey, value, pid: int) -> None:
+        """Adds another process's value for `key` to `into`."""
+        raise NotImplementedError
+
+    def samples(self, values: Dict[LabelKey, object]) -> Iterator[Tuple[str, str, float]]:
+        """Yields (sample name, formatted labels, value)."""
+        raise NotImplementedError
+
+    def render(self, values: Optional[Dict[LabelKey, object]] = None) -> List[str]:
+        values = self.collect() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples(values))
+        return lines
+
+class _ShardedMetric(_Metric):
+    """Values live in one dict per thread, so writers never wait on each other."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            shard = self._local.values = {}
+            with self._lock: # Once per thread
+                self._shards.append(shard)
+            return shard
+
+    def _merged(self, key: LabelKey):
+        merged = None
+        for shard in list(self._shards):
+            value = shard.get(key)
+            if value is not None:
+                merged = self._combine(merged, value)
+        return merged
+
+    def collect(self) -> Dict[LabelKey, object]:
+        merged: Dict[LabelKey, object] = {}
+        for shard in list(self._shards):
+            for key, value in shard.copy().items():
+                merged[key] = self._combine(merged.get(key), value)
+        return merged
+
+    def merge(self, into, key, value, pid):
+        into[key] = self._combine(into.get(key), value)
+
+    @staticmethod
+    def _combine(total, value):
+        raise NotImplementedError
+
+class Counter(_ShardedMetric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        shard = self._shard()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._merged(self._key(labels)) or 0.0
+
+    @staticmethod
+    def _combine(total, value):
+        return value if total is None else total + value
+
+    def samples(self, values):
+        sample_name = self.name if self.name.endswith("_total") else f"{self.name}_total"
+        for key, value in values.items():
+            yield sample_name, self._labels(key), value
+
+class Gauge(_Metric):
+    """Last-set value. `multiprocess_mode` says how workers' values combine:
+    "sum" (default), "max", or "all" (one sample per worker, with a pid label).
+    Gauges of workers that have exited are dropped.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), multiprocess_mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in ("sum", "max", "all"):
+            raise ValueError(f"Invalid multiprocess_mode {multiprocess_mode!r}")
+        self.multiprocess_mode = multiprocess_mode
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Reads the (unlabelled) value from `function` at render time."""
+        self._function = function
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self):
+        if self._function is not None:
+            return {(): self._function()}
+        return dict(self._values)
+
+    def merge(self, into, key, value, pid):
+        if self.multiprocess_mode == "all":
+            into[(*key, str(pid))] = value
+        elif self.multiprocess_mode == "max":
+            into[key] = max(into.get(key, value), value)
+        else:
+            into[key] = into.get(key, 0.0) + value
+
+    def samples(self, values):
+        for key, value in values.items():
+            extra = [("pid", key[-1])] if len(key) > len(self.labelnames) else []
+            yield self.name, self._labels(key, extra), value
+
+class Histogram(_ShardedMetric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        shard = self._shard()
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [[0] * len(self.buckets), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def count(self, **labels) -> int:
+        state = self._merged(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    @staticmethod
+    def _combine(total, value):
+        if total is None:
+            return [list(value[0]), value[1]]
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1]]
+
+    def samples(self, values):
+        # _count is the +Inf bucket, so a scrape racing an observe() stays self-consistent
+        for key, (bucket_counts, total) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", self._labels(key, [("le", _format_value(bound))]), cumulative
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), cumulative
+
+class MetricsRegistry:
+    """Holds metrics by name; registering an existing name returns the same metric."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._multiprocess_dir: Optional[str] = None
+        self._sync_seconds = 1.0
+        self._snapshot_path: Optional[str] = None
+        self._snapshot_lock = threading.Lock() # The sync thread and a scrape may write at once
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), multiprocess_mode: str = "sum") -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    # Multi-process aggregation
+
+    def enable_multiprocess(self, directory: str, sync_seconds: float = 1.0) -> None:
+        """Shares this process's values through `directory` (one JSON snapshot per process).
+
+        Every worker must use the same directory, and it should be emptied when
+        the server (not a single worker) starts. Snapshots are rewritten every
+        `sync_seconds` and at exit; the scraped worker writes its own first.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._multiprocess_dir = directory
+        self._sync_seconds = sync_seconds
+        self._start_sync()
+        atexit.register(self._final_snapshot)
+        os.register_at_fork(after_in_child=self._start_sync) # Pre-forking servers (gunicorn --preload)
+
+    def _start_sync(self) -> None:
+        # pid plus a random suffix: a recycled pid must not overwrite a dead worker's counters
+        self._snapshot_path = os.path.join(self._multiprocess_dir, f"metrics_{os.getpid()}_{uuid.uuid4().hex[:8]}.json")
+        self._snapshot_lock = threading.Lock() # A forked child must not inherit it held
+        threading.Thread(target=self._sync_loop, name="metrics-sync", daemon=True).start()
+
+    def _sync_loop(self) -> None:
+        path = self._snapshot_path
+        while path == self._snapshot_path:
+            try:
+                self.write_snapshot()
+            except OSError:
+                pass # Retried on the next tick
+            time.sleep(self._sync_seconds)
+
+    def _final_snapshot(self) -> None:
+        try:
+            self.write_snapshot()
+        except OSError:
+            pass
+
+    def write_snapshot(self) -> None:
+        if self._snapshot_path is None:
+            return
+        metrics = {
+            name: [[list(key), value] for key, value in metric.collect().items()]
+            for name, metric in list(self._metrics.items())
+        }
+        with self._snapshot_lock:
+            tmp_path = f"{self._snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"pid": os.getpid(), "metrics": metrics}, f)
+            os.replace(tmp_path, self._snapshot_path)
+
+    def _merged_values(self) -> Dict[str, Dict[LabelKey, object]]:
+        self.write_snapshot()
+        merged: Dict[str, Dict[LabelKey, object]] = {name: {} for name in self._metrics}
+        with open(os.path.join(self._multiprocess_dir, _LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX) # Compaction rewrites files other scrapes read
+            aggregate = self._read_snapshot(os.path.join(self._multiprocess_dir, _AGGREGATE_FILE)) or {}
+            compacted = set(aggregate.get("compacted", ()))
+            dead = []
+            for entry in os.scandir(self._multiprocess_dir):
+                if not (entry.name.startswith("metrics_") and entry.name.endswith(".json")):
+                    continue
+                if entry.name in compacted: # Folded by a compaction that stopped before removing it
+                    self._remove(entry.path)
+                    continue
+                snapshot = aggregate if entry.name == _AGGREGATE_FILE else self._read_snapshot(entry.path)
+                if not snapshot:
+                    continue
+                pid = snapshot["pid"]
+                alive = entry.name == _AGGREGATE_FILE or _pid_alive(pid)
+                if not alive:
+                    dead.append((entry, snapshot))
+                for name, values in snapshot["metrics"].items():
+                    metric = self._metrics.get(name)
+                    if metric is None or (isinstance(metric, Gauge) and not alive):
+                        continue
+                    for key, value in values:
+                        metric.merge(merged[name], tuple(key), value, pid)
+            if dead:
+                self._compact(aggregate, dead)
+        return merged
+
+    @staticmethod
+    def _read_snapshot(path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None # Removed or half-written by a crashed worker
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _compact(self, aggregate: dict, dead: List[Tuple[os.DirEntry, dict]]) -> None:
+        """Folds exited workers' snapshots into the aggregate file, then removes them.
+
+        Their gauges are dropped, as in the merge. The aggregate lists the files it
+        has absorbed until they are gone, so a crash between the two steps does not
+        count them twice.
+        """
+        folded: Dict[str, Dict[LabelKey, object]] = {
+            name: {tuple(key): value for key, value in values} for name, values in aggregate.get("metrics", {}).items()
+        }
+        for _, snapshot in dead:
+            for name, values in snapshot["metrics"].items():
+                metric = self._metrics.get(name)
+                if not isinstance(metric, _ShardedMetric):
+                    continue
+                into = folded.setdefault(name, {})
+                for key, value in values:
+                    metric.merge(into, tuple(key), value, snapshot["pid"])
+        names = [entry.name for entry, _ in dead]
+        path = os.path.join(self._multiprocess_dir, _AGGREGATE_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({
+                "pid": 0,
+                "compacted": names,
+                "metrics": {name: [[list(key), value] for key, value in values.items()] for name, values in folded.items()},
+            }, f)
+        os.replace(f"{path}.tmp", path)
+        for entry, _ in dead:
+            self._remove(entry.path)
+
+    def render(self) -> str:
+        values = self._merged_values() if self._multiprocess_dir else {}
+        lines: List[str] = []
+        for name, metric in list(self._metrics.items()):
+            lines.extend(metric.render(values.get(name) if self._multiprocess_dir else None))
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
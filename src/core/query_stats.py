@@ -0,0 +1,114 @@
+"""Per-request SQL instrumentation.
+
+Cursor-execute hooks on every engine feed the current request's QueryStats
+(held in a context variable, so sync routes in the threadpool and async
+sessions in their greenlets report to the request that started them).
+QueryStatsMiddleware reports the statement count and database time in a
+Server-Timing header and flags N+1 patterns: the same SELECT (statement text,
+parameters bound separately) run over and over within one request.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_DETECTED = REGISTRY.counter(
+    "db_n_plus_one_detected", "Requests that repeated one SELECT past SQL_N_PLUS_ONE_THRESHOLD"
+)
+
+class NPlusOneError(AssertionError):
+    """Raised instead of logging when SQL_N_PLUS_ONE_RAISE is set (test mode)."""
+
+class QueryStats:
+    """Statements run and time spent in the database for one request."""
+
+    def __init__(self, label: str = "", threshold: Optional[int] = None, strict: Optional[bool] = None):
+        self.label = label
+        self.threshold = settings.SQL_N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        self.strict = settings.SQL_N_PLUS_ONE_RAISE if strict is None else strict
+        self.count = 0
+        self.duration = 0.0
+        self.selects: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.threshold and statement.lstrip()[:6].upper() == "SELECT":
+            seen = self.selects[statement] = self.selects.get(statement, 0) + 1
+            if seen == self.threshold:
+                self._report_n_plus_one(statement, seen)
+
+    def _report_n_plus_one(self, statement: str, seen: int) -> None:
+        N_PLUS_ONE_DETECTED.inc()
+        message = f"N+1 query in {self.label or 'request'}: same SELECT run {seen} times: {' '.join(statement.split())}"
+        if self.strict:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value: db;dur=<ms>;desc="<n> queries"[, app;dur=<ms>]."""
+        value = f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+        if total is not None:
+            value += f", app;dur={total * 1000:.2f}"
+        return value
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+@contextmanager
+def track_queries(label: str = "", **options) -> Iterator[QueryStats]:
+    """Records the statements run in this context (and tasks/threads started from it)."""
+    stats = QueryStats(label, **options)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+def instrument_queries(engine: Engine) -> None:
+    """Feeds `engine`'s statements into the current QueryStats (pass async_engine.sync_engine for async engines)."""
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current_stats.get() is not None:
+            conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        starts = conn.info.get("query_stats_start")
+        if stats is not None and starts:
+            stats.record(statement, time.perf_counter() - starts.pop())
+
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+
+class QueryStatsMiddleware:
+    """Tracks each request's statements and adds a Server-Timing header to the response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        with track_queries(f"{scope['method']} {scope['path']}") as stats:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    header = stats.server_timing(time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,193 @@
+"""Token-bucket rate limiting as pure ASGI middleware.
+
+Buckets are kept with GCRA (generic cell rate algorithm), which is equivalent to
+a token bucket but stores a single float per key: the time at which the bucket
+will be full again. Requests are rejected with 429 before routing, so no DB
+session is opened and no password hashing runs for them.
+"""
+import json
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from .config import settings
+from .metrics import REGISTRY
+from .security import decode_token
+
+RATE_LIMIT_REJECTED = REGISTRY.counter(
+    "rate_limit_rejected", "Requests rejected by the rate limiter", ["rule", "scope"]
+)
+
+class RateLimitRule(NamedTuple):
+    method: str
+    path: str # Exact route path, trailing slash ignored
+    capacity: int # Burst size
+    period: float # Seconds to refill `capacity` tokens
+    scope: str # "ip" or "user"
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+def parse_rate_limit_rules(spec: str) -> List[RateLimitRule]:
+    """Parses "METHOD /path=capacity/seconds@scope" entries separated by ";".
+
+    Example: "POST /auth/login=10/60@ip;POST /orders=30/60@user"
+    """
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, limit = entry.partition("=")
+        method, _, path = route.strip().partition(" ")
+        rate, _, scope = limit.partition("@")
+        capacity, _, period = rate.partition("/")
+        scope = scope.strip() or "ip"
+        if scope not in ("ip", "user"):
+            raise ValueError(f"Invalid rate limit scope in {entry!r}")
+        rules.append(RateLimitRule(method.upper(), path.strip().rstrip("/") or "/", int(capacity), float(period), scope))
+    return rules
+
+class MemoryRateLimitStore:
+    """Per-process bucket store: {key: time the bucket is full again}."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._full_at: Dict[str, float] = {}
+
+    async def consume(self, key: str, capacity: int, period: float) -> float:
+        """Takes one token. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        interval = period / capacity
+        full_at = max(self._full_at.get(key, now), now) + interval
+        if full_at - now > period:
+            return full_at - period - now
+        if len(self._full_at) >= self.max_keys and key not in self._full_at:
+            self._evict(now)
+        self._full_at[key] = full_at
+        return 0.0
+
+    def _evict(self, now: float) -> None:
+        # A bucket that is full again is the same as no entry at all
+        self._full_at = {k: v for k, v in self._full_at.items() if v > now}
+
+    def reset(self) -> None:
+        self._full_at.clear()
+
+class RedisRateLimitStore:
+    """Shared bucket store so limits hold across uvicorn workers (needs the `redis` package)."""
+
+    _SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local period = tonumber(ARGV[3])
+    local full_at = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + interval
+    if full_at - now > period then
+        return tostring(full_at - period - now)
+    end
+    redis.call('SET', KEYS[1], tostring(full_at), 'PX', math.ceil((full_at - now) * 1000))
+    return '0'
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL points to Redis but the 'redis' package is not installed") from exc
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+
+    async def consume(self, key: str, capacity: int, period: float) -> float:
+        # Redis server time would be more precise; wall clock is fine for limits measured in seconds
+        result = await self._script(keys=[f"ratelimit:{key}"], args=[time.time(), period / capacity, period])
+        return float(result)
+
+    def reset(self) -> None:
+        pass
+
+def create_rate_limit_store(url: str):
+    if url.startswith(("redis://", "rediss://")):
+        return RedisRateLimitStore(url)
+    return MemoryRateLimitStore(settings.RATE_LIMIT_MAX_KEYS)
+
+class RateLimiter:
+    """Holds the rules and bucket store used by RateLimitMiddleware."""
+
+    def __init__(self, rules: List[RateLimitRule], store, enabled: bool = True, trust_forwarded: bool = False):
+        self.enabled = enabled
+        self.store = store
+        self.trust_forwarded = trust_forwarded
+        self.set_rules(rules)
+
+    def set_rules(self, rules: List[RateLimitRule]) -> None:
+        by_route: Dict[tuple, List[RateLimitRule]] = {}
+        for rule in rules:
+            by_route.setdefault((rule.method, rule.path), []).append(rule)
+        self._rules = by_route
+
+    def rules_for(self, method: str, path: str) -> List[RateLimitRule]:
+        return self._rules.get((method, path.rstrip("/") or "/"), [])
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _user_id(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    payload = decode_token(token) # Memoized, no DB access
+                    if payload and payload.get("uid") is not None:
+                        return str(payload["uid"])
+        return None
+
+    async def check(self, scope) -> Optional[float]:
+        """Returns None if the request may proceed, else the Retry-After in seconds."""
+        rules = self.rules_for(scope["method"], scope["path"])
+        if not self.enabled or not rules:
+            return None
+        for rule in rules:
+            if rule.scope == "user":
+                identity = self._user_id(scope)
+                if identity is None:
+                    continue # Unauthenticated requests are covered by the ip rules
+            else:
+                identity = self._client_ip(scope)
+            wait = await self.store.consume(f"{rule.name}|{rule.scope}|{identity}", rule.capacity, rule.period)
+            if wait > 0:
+                RATE_LIMIT_REJECTED.inc(rule=rule.name, scope=rule.scope)
+                return wait
+        return None
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            retry_after = await self.limiter.check(scope)
+            if retry_after is not None:
+                body = json.dumps({"detail": "Too many requests"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
+
+rate_limiter = RateLimiter(
+    parse_rate_limit_rules(settings.RATE_LIMIT_RULES),
+    create_rate_limit_store(settings.RATE_LIMIT_STORAGE_URL),
+    enabled=settings.RATE_LIMIT_ENABLED,
+    trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED,
+)
@@ -0,0 +1,138 @@
+"""Read-replica routing for read-only endpoints.
+
+`get_read_db` hands out an AsyncSession on the next healthy replica (round
+robin), falling back to the primary when no replica is configured or healthy,
+or when the client wrote recently (read-your-writes pin cookie).
+"""
+import itertools
+import time
+from typing import List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .config import settings
+from .database import async_database_url, get_async_db, instrument_pool, pool_options
+from .metrics import REGISTRY
+from .query_stats import instrument_queries
+
+REPLICA_EJECTIONS = REGISTRY.counter("db_replica_ejections", "Replicas taken out of rotation after a failure", ["replica"])
+REPLICA_READS = REGISTRY.counter("db_replica_reads", "Read sessions handed out, by target", ["target"])
+
+# Set on successful writes; reads go to the primary until the timestamp it holds
+PIN_COOKIE = "db_read_primary_until"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping ones ejected after a failure."""
+
+    def __init__(self, urls: List[str], eject_seconds: float = 30.0):
+        self.eject_seconds = eject_seconds
+        self.engines = []
+        self._sessionmakers = []
+        for index, url in enumerate(urls):
+            async_url = async_database_url(url)
+            name = f"replica{index}_async"
+            engine = create_async_engine(async_url, **pool_options(async_url, name, is_async=True))
+            instrument_pool(engine.sync_engine, name)
+            instrument_queries(engine.sync_engine)
+            self.engines.append(engine)
+            self._sessionmakers.append(
+                async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            )
+        self._ejected_until = [0.0] * len(urls)
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def candidates(self) -> List[int]:
+        """Healthy replica indexes, starting from the next one in rotation."""
+        if not self.engines:
+            return []
+        start = next(self._counter) % len(self.engines)
+        now = time.monotonic()
+        order = [(start + offset) % len(self.engines) for offset in range(len(self.engines))]
+        return [index for index in order if self._ejected_until[index] <= now]
+
+    def session(self, index: int) -> AsyncSession:
+        return self._sessionmakers[index]()
+
+    def eject(self, index: int) -> None:
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        REPLICA_EJECTIONS.inc(replica=str(index))
+
+    def is_ejected(self, index: int) -> bool:
+        return self._ejected_until[index] > time.monotonic()
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+def _parse_urls(value: Optional[str]) -> List[str]:
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+read_replicas = ReplicaSet(_parse_urls(settings.DATABASE_REPLICA_URLS), settings.DB_REPLICA_EJECT_SECONDS)
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_read_db(request: Request, primary: AsyncSession = Depends(get_async_db, scope="function")):
+    """Read-only session: a healthy replica if any, else the primary.
+
+    The primary session is lazy, so it costs no connection when a replica serves the read.
+    request.state.db_read records where the read went ("primary", "pinned" or "replica").
+    """
+    replicas = read_replicas
+    if not replicas or _pinned_to_primary(request):
+        request.state.db_read = "pinned" if replicas else "primary"
+        REPLICA_READS.inc(target="primary")
+        yield primary
+        return
+    for index in replicas.candidates():
+        session = replicas.session(index)
+        try:
+            await session.connection() # Fail over before the route runs, not halfway through it
+        except (DBAPIError, OSError):
+            await session.close()
+            replicas.eject(index)
+            continue
+        request.state.db_read = "replica"
+        REPLICA_READS.inc(target=f"replica{index}")
+        try:
+            yield session
+        except DBAPIError as exc:
+            if exc.connection_invalidated:
+                replicas.eject(index)
+            raise
+        finally:
+            await session.close()
+        return
+    request.state.db_read = "primary"
+    REPLICA_READS.inc(target="primary")
+    yield primary
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a short while after a successful write."""
+
+    def __init__(self, app, pin_seconds: float):
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or not read_replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + self.pin_seconds
+                cookie = f"{PIN_COOKIE}={until:.3f}; Max-Age={int(self.pin_seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
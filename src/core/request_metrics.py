@@ -0,0 +1,86 @@
+"""Per-route request metrics (count, latency, in-flight requests, DB time).
+
+Routes are labelled by their template (e.g. "/orders/{order_id}"), never the
+raw path, so label cardinality stays bounded; requests that match no route
+share the "unmatched" label.
+"""
+import time
+from typing import Callable, Sequence
+
+from .metrics import REGISTRY
+from .query_stats import current_query_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests", "Requests handled", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to handle a request, until the response is sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = REGISTRY.histogram(
+    "http_request_db_seconds", "Time a request spent in database statements", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "Statements run per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests being handled")
+
+def route_template(scope) -> str:
+    """Full template of the route that handled the request.
+
+    scope["route"] is the route of the (included) router, e.g. "/{order_id}";
+    the include prefix is whatever the concrete path has in front of it.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    if path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + template
+    return template
+
+class RequestMetricsMiddleware:
+    """Records the http_* metrics. Must run inside QueryStatsMiddleware to see the DB time.
+
+    `observers` are called as observer(method, route, duration, status) after each request.
+    """
+
+    def __init__(self, app, observers: Sequence[Callable[[str, str, float, int], None]] = ()):
+        self.app = app
+        self.observers = tuple(observers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500 # If the app raises before responding
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            duration = time.perf_counter() - start
+            method, route = scope["method"], route_template(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+            HTTP_REQUEST_DURATION.observe(duration, method=method, route=route, status=status_code)
+            stats = current_query_stats()
+            if stats is not None:
+                HTTP_REQUEST_DB_SECONDS.observe(stats.duration, method=method, route=route)
+                HTTP_REQUEST_DB_QUERIES.observe(stats.count, method=method, route=route)
+            for observer in self.observers:
+                observer(method, route, duration, status_code)
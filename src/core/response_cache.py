@@ -0,0 +1,461 @@
+"""Response cache for read-mostly GET routes, invalidated by tags.
+
+Routes opt in with a dependency, which runs after the route's auth
+dependency so cached responses are only served to callers the route would
+accept:
+
+    @router.get("/{order_id}", dependencies=[Depends(cache_response(("order:{order_id}",), principal=get_current_active_user))])
+
+Entries are keyed by path, sorted query string and principal scope
+("public", "auth": one entry shared by every authenticated caller, or
+"user": one per user), and kept in a per-process LRU bounded by
+RESPONSE_CACHE_MAX_BYTES. A hit is answered before the route opens a DB
+session.
+
+Each entry carries tags ("order:7", "products"...). The service modules
+register which tags a written ORM object invalidates (cache_tags_for), and
+Core statements add theirs with invalidate_on_commit(); the tags are
+invalidated once the transaction commits, before the writing request's
+response is sent. Invalidations go through a store: in-process by default,
+or Redis (RESPONSE_CACHE_STORAGE_URL=redis://...) so every worker sees
+them. The store keeps a sequence number per tag; an entry is stale when
+one of its tags was invalidated after the entry's lookup began, which also
+covers writes that land while the entry is being computed. Responses read
+from a replica are not stored when a tag was invalidated within the last
+DB_READ_YOUR_WRITES_SECONDS (the replica may not have the write yet), and
+reads pinned to the primary after a write are not stored at all.
+
+Misses are coalesced (single flight): while one request computes an entry,
+identical requests wait for it instead of running the same queries, so an
+invalidated hot page costs one query however many clients ask for it at
+once. An entry past its TTL but not invalidated stays usable for
+RESPONSE_CACHE_STALE_SECONDS more (stale-while-revalidate): the first
+request refreshes it while the others are answered from the stale copy.
+Invalidated entries are never served.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from .cache import CACHE_REQUESTS
+from .config import settings
+from .metrics import REGISTRY
+
+RESPONSE_CACHE_BYTES = REGISTRY.gauge("response_cache_bytes", "Bytes held by the response cache")
+RESPONSE_CACHE_EVICTIONS = REGISTRY.counter("response_cache_evictions", "Entries dropped to stay within the byte budget")
+RESPONSE_CACHE_INVALIDATIONS = REGISTRY.counter("response_cache_invalidations", "Tags invalidated by committed writes")
+RESPONSE_CACHE_FLIGHTS = REGISTRY.gauge("response_cache_flights", "Cache misses being computed, awaited by identical requests")
+
+ALL = "*" # Carried by every entry: invalidate_on_commit(db, ALL) drops everything
+_ENTRY_OVERHEAD = 256 # Rough per-entry bookkeeping, counted against the byte budget
+_STORED_HEADERS_SKIPPED = frozenset({b"content-length", b"set-cookie", b"date", b"server-timing", b"x-cache"})
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    tags: frozenset
+    seq: int # Invalidation sequence when the lookup that produced it began
+    stored_at: float
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers) + _ENTRY_OVERHEAD
+
+class PendingEntry:
+    """A missed lookup: the response to store, once the route has produced it.
+
+    `flight` is set when this request leads the single flight for its key.
+    """
+
+    __slots__ = ("key", "ttl", "tags", "seq", "flight")
+
+    def __init__(self, key: str, ttl: float, tags: Set[str], seq: int, flight: Optional[asyncio.Future] = None):
+        self.key = key
+        self.ttl = ttl
+        self.tags = tags
+        self.seq = seq
+        self.flight = flight
+
+class ResponseCacheHit(Exception):
+    """Raised by the cache_response dependency; the app's handler sends the entry."""
+
+    def __init__(self, entry: CachedResponse, state: str = "HIT"):
+        self.entry = entry
+        self.state = state # X-Cache value: HIT or STALE
+
+class MemoryInvalidationStore:
+    """Tag invalidations for this process only (each worker sees its own writes)."""
+
+    def __init__(self, tag_ttl: float):
+        self.tag_ttl = tag_ttl
+        self._seq = 0
+        self._tags: Dict[str, Tuple[int, float]] = {} # tag -> (seq, wall time)
+        self._lock = threading.Lock()
+
+    async def current_seq(self) -> int:
+        return self._seq
+
+    async def invalidated_since(self, tags: Iterable[str], seq: int, after: Optional[float] = None) -> bool:
+        """Whether a tag was invalidated after `seq` (or after the wall time `after`)."""
+        get = self._tags.get
+        for tag in tags:
+            tag_seq, at = get(tag, (0, 0.0))
+            if tag_seq > seq or (after is not None and at > after):
+                return True
+        return False
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._seq += 1
+            for tag in tags:
+                self._tags[tag] = (self._seq, now)
+            if len(self._tags) > 10_000:
+                # Entries live at most tag_ttl, so older invalidations can no longer matter
+                self._tags = {tag: value for tag, value in self._tags.items() if now - value[1] < self.tag_ttl}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tags.clear()
+
+class RedisInvalidationStore:
+    """Tag invalidations shared by every worker (needs the `redis` package)."""
+
+    _INVALIDATE = """
+    local seq = redis.call('INCR', KEYS[1])
+    for i = 2, #KEYS do
+        redis.call('SET', KEYS[i], seq .. ':' .. ARGV[2], 'EX', ARGV[1])
+    end
+    return seq
+    """
+
+    def __init__(self, url: str, tag_ttl: float):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_STORAGE_URL points to Redis but the 'redis' package is not installed") from exc
+        self.tag_ttl = tag_ttl
+        self._client = redis.from_url(url)
+        self._invalidate = self._client.register_script(self._INVALIDATE)
+
+    async def current_seq(self) -> int:
+        return int(await self._client.get("responsecache:seq") or 0)
+
+    async def invalidated_since(self, tags: Iterable[str], seq: int, after: Optional[float] = None) -> bool:
+        values = await self._client.mget([f"responsecache:tag:{tag}" for tag in tags])
+        for value in values:
+            if value is None:
+                continue
+            tag_seq, _, at = value.partition(b":")
+            if int(tag_seq) > seq or (after is not None and float(at) > after):
+                return True
+        return False
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        keys = ["responsecache:seq", *(f"responsecache:tag:{tag}" for tag in tags)]
+        await self._invalidate(keys=keys, args=[int(self.tag_ttl) + 1, repr(time.time())])
+
+    def reset(self) -> None:
+        pass
+
+def create_invalidation_store(url: str, tag_ttl: float):
+    if url.startswith(("redis://", "rediss://")):
+        return RedisInvalidationStore(url, tag_ttl)
+    return MemoryInvalidationStore(tag_ttl)
+
+# Tags invalidated by commits during the current request; flushed by ResponseCacheMiddleware
+_request_invalidations: ContextVar[Optional[Set[str]]] = ContextVar("response_cache_invalidations", default=None)
+
+class ResponseCache:
+    """Byte-bounded LRU of GET responses, validated against the invalidation store."""
+
+    def __init__(
+        self, store, max_bytes: int, max_entry_bytes: int, default_ttl: float, enabled: bool = True,
+        replica_lag: float = 0.0, stale_ttl: float = 0.0,
+    ):
+        self.store = store
+        self.replica_lag = replica_lag
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str, stale: bool = False) -> Optional[CachedResponse]:
+        """The valid entry for `key`; with stale=True, also one past its TTL but within stale_ttl."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at + self.stale_ttl <= now:
+                    self._discard(key)
+                    entry = None
+                elif entry.expires_at > now or stale:
+                    self._entries.move_to_end(key)
+                else:
+                    entry = None
+        if entry is not None and await self.store.invalidated_since(entry.tags, entry.seq):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._discard(key)
+            entry = None
+        return entry
+
+    async def put(
+        self, pending: PendingEntry, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, from_replica: bool = False,
+    ) -> Optional[CachedResponse]:
+        """Stores the response; returns the entry, or None when it may not be cached."""
+        now = time.monotonic()
+        headers = [(name, value) for name, value in headers if name.lower() not in _STORED_HEADERS_SKIPPED]
+        entry = CachedResponse(status, headers, body, frozenset(pending.tags), pending.seq, now, now + pending.ttl)
+        if entry.size > self.max_entry_bytes:
+            return None
+        # Written while we were computing it, or too recently for a replica to have caught up
+        after = time.time() - self.replica_lag if from_replica else None
+        if await self.store.invalidated_since(entry.tags, entry.seq, after):
+            return None
+        with self._lock:
+            if pending.key in self._entries:
+                self._discard(pending.key)
+            self._entries[pending.key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                RESPONSE_CACHE_EVICTIONS.inc()
+            RESPONSE_CACHE_BYTES.set(self._bytes)
+        return entry
+
+    def flight(self, key: str) -> Optional[asyncio.Future]:
+        """The in-progress computation of `key`, if a request is computing it."""
+        return self._flights.get(key)
+
+    def start_flight(self, key: str) -> asyncio.Future:
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        RESPONSE_CACHE_FLIGHTS.set(len(self._flights))
+        return flight
+
+    def end_flight(self, key: str, flight: asyncio.Future, entry: Optional[CachedResponse]) -> None:
+        """Hands the leader's entry (None: compute it yourselves) to the requests waiting on it."""
+        if not flight.done():
+            flight.set_result(entry)
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            RESPONSE_CACHE_FLIGHTS.set(len(self._flights))
+
+    def _discard(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key).size
+        RESPONSE_CACHE_BYTES.set(self._bytes)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        await self.store.invalidate(tags)
+        RESPONSE_CACHE_INVALIDATIONS.inc(len(tags))
+
+    def invalidate_soon(self, tags: Set[str]) -> None:
+        """Invalidates after a commit: at the end of the current request, else right away."""
+        pending = _request_invalidations.get()
+        if pending is not None:
+            pending.update(tags)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError: # Scripts and direct service calls
+            asyncio.run(self.invalidate(tags))
+        else:
+            task = loop.create_task(self.invalidate(tags))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            RESPONSE_CACHE_BYTES.set(0)
+        self.store.reset()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+response_cache = ResponseCache(
+    # Invalidations are kept as long as an entry can live, stale period included
+    create_invalidation_store(
+        settings.RESPONSE_CACHE_STORAGE_URL, settings.RESPONSE_CACHE_MAX_TTL_SECONDS + settings.RESPONSE_CACHE_STALE_SECONDS
+    ),
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    default_ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    replica_lag=settings.DB_READ_YOUR_WRITES_SECONDS,
+    stale_ttl=settings.RESPONSE_CACHE_STALE_SECONDS,
+)
+
+# Write side
+
+_SESSION_TAGS = "response_cache_tags"
+_tag_functions: Dict[type, Callable[[object], Iterable[str]]] = {}
+
+def cache_tags_for(model: type, tags: Callable[[object], Iterable[str]]) -> None:
+    """Registers the tags invalidated when an instance of `model` is inserted, updated or deleted."""
+    _tag_functions[model] = tags
+
+def invalidate_on_commit(db, *tags: str) -> None:
+    """Tags to invalidate when `db`'s transaction commits (for writes the ORM does not track, e.g. Core UPDATEs)."""
+    db.info.setdefault(_SESSION_TAGS, set()).update(tags)
+
+@event.listens_for(Session, "after_flush")
+def _tag_flushed_objects(session: Session, flush_context) -> None:
+    tags = set()
+    for obj in (*session.new, *session.deleted, *(o for o in session.dirty if session.is_modified(o))):
+        tags_of = _tag_functions.get(type(obj))
+        if tags_of is not None:
+            tags.update(tags_of(obj))
+    if tags:
+        session.info.setdefault(_SESSION_TAGS, set()).update(tags)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    tags = session.info.pop(_SESSION_TAGS, None)
+    if tags:
+        response_cache.invalidate_soon(tags)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop(_SESSION_TAGS, None)
+
+# Read side
+
+def _scope_key(scope: str, principal) -> str:
+    if scope == "user":
+        return f"user:{principal.id}"
+    return scope
+
+async def _lookup(request: Request, tags: Sequence[str], ttl: Optional[float], scope: str, principal=None) -> None:
+    cache = response_cache
+    if not cache.enabled or request.method != "GET":
+        return
+    query = urlencode(sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+    key = f"{_scope_key(scope, principal)}|{request.url.path}?{query}"
+    seq = await cache.store.current_seq() # Before the route reads anything
+    entry = await cache.get(key, stale=True)
+    if entry is not None and entry.expires_at > time.monotonic():
+        CACHE_REQUESTS.inc(cache="response", result="hit")
+        raise ResponseCacheHit(entry)
+    flight = cache.flight(key)
+    if flight is not None:
+        if entry is not None: # Another request is refreshing it
+            CACHE_REQUESTS.inc(cache="response", result="stale")
+            raise ResponseCacheHit(entry, "STALE")
+        entry = await asyncio.shield(flight)
+        if entry is not None:
+            CACHE_REQUESTS.inc(cache="response", result="coalesced")
+            raise ResponseCacheHit(entry)
+        flight = None # The leader's response was not cacheable: compute our own
+    else:
+        flight = cache.start_flight(key)
+    CACHE_REQUESTS.inc(cache="response", result="miss")
+    entry_tags = {ALL, *(tag.format(**request.path_params) for tag in tags)}
+    ttl = min(cache.default_ttl if ttl is None else ttl, cache.store.tag_ttl - cache.stale_ttl)
+    request.scope["response_cache"] = PendingEntry(key, ttl, entry_tags, seq, flight)
+
+def cache_response(tags: Sequence[str] = (), ttl: Optional[float] = None, principal: Optional[Callable] = None, per_user: bool = False):
+    """Route dependency caching the GET response.
+
+    `tags` may use the path parameters ("order:{order_id}"). Without `principal`
+    the entry is public; with it (the route's auth dependency) it is shared by
+    all authenticated callers, or kept per user with per_user=True.
+    """
+    if principal is None:
+        async def dependency(request: Request) -> None:
+            await _lookup(request, tags, ttl, "public")
+    else:
+        async def dependency(request: Request, current_principal=Depends(principal)) -> None:
+            await _lookup(request, tags, ttl, "user" if per_user else "auth", current_principal)
+    return dependency
+
+def add_cache_tags(request: Request, *tags: str) -> None:
+    """Tags only known from the response content (e.g. the products inside an order)."""
+    pending = request.scope.get("response_cache")
+    if pending is not None:
+        pending.tags.update(tags)
+
+async def cached_response_handler(request: Request, exc: ResponseCacheHit) -> Response:
+    entry = exc.entry
+    response = Response(entry.body, status_code=entry.status)
+    response.raw_headers.extend(entry.headers)
+    response.raw_headers.append((b"x-cache", exc.state.encode()))
+    response.raw_headers.append((b"age", str(int(time.monotonic() - entry.stored_at)).encode()))
+    return response
+
+class ResponseCacheMiddleware:
+    """Stores the responses cache_response marked, and flushes the request's invalidations.
+
+    Invalidations from commits during the request are applied before its
+    response starts, so a client that wrote something reads it back fresh.
+    When the request leads a single flight, the requests waiting on it get the
+    stored entry, or None (compute it yourselves) if nothing was stored.
+    """
+
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        invalidations: Set[str] = set()
+        token = _request_invalidations.set(invalidations)
+        start_message = None
+
+        async def flush_invalidations():
+            if invalidations:
+                tags = set(invalidations)
+                invalidations.clear()
+                await self.cache.invalidate(tags)
+
+        async def send_and_store(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                await flush_invalidations()
+                if scope.get("response_cache") is not None and message["status"] == 200:
+                    message["headers"] = [*message.get("headers", []), (b"x-cache", b"MISS")]
+                    start_message = message
+            elif message["type"] == "http.response.body" and start_message is not None:
+                read_from = scope.get("state", {}).get("db_read") # Set by replicas.get_read_db
+                # Streamed bodies are not cached, nor reads pinned to the primary: they may be
+                # ahead of what the replicas serve everyone else
+                if not message.get("more_body", False) and read_from != "pinned":
+                    pending = scope["response_cache"]
+                    entry = await self.cache.put(
+                        pending, start_message["status"], start_message["headers"],
+                        message.get("body", b""), from_replica=read_from == "replica",
+                    )
+                    if pending.flight is not None: # Release the waiting requests before sending
+                        self.cache.end_flight(pending.key, pending.flight, entry)
+                start_message = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_store)
+        finally:
+            _request_invalidations.reset(token)
+            pending = scope.get("response_cache")
+            if pending is not None and pending.flight is not None: # Not stored: errors, other statuses, streams
+                self.cache.end_flight(pending.key, pending.flight, None)
+            await flush_invalidations() # The app failed after committing
@@ -0,0 +1,101 @@
+"""Fast JSON path for hot read routes.
+
+With a response_model, FastAPI validates the returned ORM objects into
+Pydantic models (from_attributes) and only then serializes them. Rows read
+from our own database were validated on the way in, so list routes can opt
+out of the second validation:
+
+    return FastJSONResponse(dump_rows(schemas.OrderRead, orders))
+
+dump_rows() reads each row once into plain dicts/lists shaped like the
+schema (nested models included), and FastJSONResponse encodes them with
+orjson when it is installed (stdlib json otherwise). The output matches what
+the response_model would have produced; keep response_model on the route
+for the docs.
+"""
+import datetime
+import enum
+import json
+import types
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Union, get_args, get_origin
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError: # Optional: falls back to the stdlib encoder
+    orjson = None
+
+_MISSING = object()
+
+def _encoder(annotation) -> Optional[Callable[[Any], Any]]:
+    """Converter from a row value to what Pydantic would emit for `annotation` (None: use as is)."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _encoder(args[0]) if len(args) == 1 else None
+    if origin in (list, List):
+        item = _encoder(get_args(annotation)[0])
+        return (lambda values: [item(value) for value in values]) if item else list
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return row_serializer(annotation)
+    if annotation is float: # Integer and Decimal columns still render as floats
+        return float
+    return None
+
+@lru_cache(maxsize=None)
+def row_serializer(model: type) -> Callable[[Any], dict]:
+    """Function turning one row (ORM object or model instance) into `model`'s JSON shape."""
+    fields = [
+        (
+            name,
+            info.serialization_alias or info.alias or name,
+            _encoder(info.annotation),
+            _MISSING if info.is_required() else info.get_default(call_default_factory=True),
+        )
+        for name, info in model.model_fields.items()
+    ]
+
+    def serialize(row) -> dict:
+        # Loaded ORM attributes live in the instance __dict__; reading them there skips
+        # the attribute descriptors. Anything else (unloaded, properties) goes through getattr.
+        loaded = getattr(row, "__dict__", {})
+        data = {}
+        for name, key, encode, default in fields:
+            value = loaded.get(name, _MISSING)
+            if value is _MISSING:
+                value = getattr(row, name) if default is _MISSING else getattr(row, name, default)
+            data[key] = value if encode is None or value is None else encode(value)
+        return data
+    return serialize
+
+def dump_rows(model: type, rows: Iterable[Any]) -> List[dict]:
+    """Rows shaped like List[model], without validating them."""
+    serialize = row_serializer(model)
+    return [serialize(row) for row in rows]
+
+def _default(value):
+    """Stdlib fallback for the types orjson handles natively."""
+    if isinstance(value, datetime.datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson when available, with Pydantic's datetime format (UTC as "Z")."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+        ).encode("utf-8")
@@ -1,12 +1,44 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Optional
 from jose import JWTError, jwt
+from .cache import TTLCache
 from .config import settings
+from .metrics import REGISTRY
 
 # Password Hashing Context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# user_id -> UserAuthState, so get_current_user does not query users on every request
+user_auth_state_cache = TTLCache(settings.AUTH_STATE_CACHE_SIZE, ttl=settings.AUTH_STATE_CACHE_TTL_SECONDS, name="auth_state")
+
+# sha256(token) -> verified claims; entries expire at the token's exp
+jwt_claims_cache = TTLCache(settings.JWT_CACHE_SIZE, name="jwt_claims")
+REGISTRY.gauge("jwt_cache_entries", "Verified JWTs held in the claims cache").set_function(lambda: len(jwt_claims_cache))
+# Per worker; cache_requests{cache="jwt_claims"} gives the fleet-wide rate
+REGISTRY.gauge(
+    "jwt_cache_hit_ratio", "Hit ratio of the verified JWT claims cache", multiprocess_mode="all"
+).set_function(lambda: jwt_claims_cache.hit_rate)
+
+PASSWORD_HASH_SECONDS = REGISTRY.histogram(
+    "password_hash_seconds", "Time spent hashing/verifying passwords", ["op"]
+)
+PASSWORD_HASH_WAIT_SECONDS = REGISTRY.histogram(
+    "password_hash_wait_seconds", "Time password operations waited for a hashing worker", ["op"]
+)
+PASSWORD_HASH_QUEUE_DEPTH = REGISTRY.gauge(
+    "password_hash_queue_depth", "Password operations running or waiting for a hashing worker"
+)
+PASSWORD_HASH_REJECTED = REGISTRY.counter(
+    "password_hash_rejected", "Password operations shed because the hashing queue was full", ["op"]
+)
+
 # Verify password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -15,6 +47,79 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing queue is full; callers should answer 503."""
+
+class PasswordHashExecutor:
+    """Dedicated, size-limited thread pool for bcrypt.
+
+    bcrypt releases the GIL, so threads give real parallelism here while keeping
+    the shared request threadpool free. At most `workers + max_queue` operations
+    are admitted; the rest are rejected immediately with PasswordHashingBusy.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._capacity = workers + max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, op: str, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._pending >= self._capacity:
+                PASSWORD_HASH_REJECTED.inc(op=op)
+                raise PasswordHashingBusy()
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            PASSWORD_HASH_WAIT_SECONDS.observe(started - submitted, op=op)
+            try:
+                return fn(*args)
+            finally:
+                PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started, op=op)
+
+        future = self._executor.submit(run)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_password_hasher: Optional[PasswordHashExecutor] = None
+_password_hasher_lock = threading.Lock()
+
+def get_password_hasher() -> PasswordHashExecutor:
+    """Returns the process-wide hashing executor, creating it on first use."""
+    global _password_hasher
+    if _password_hasher is None:
+        with _password_hasher_lock:
+            if _password_hasher is None:
+                _password_hasher = PasswordHashExecutor(
+                    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE
+                )
+                PASSWORD_HASH_QUEUE_DEPTH.set_function(lambda: _password_hasher.pending)
+    return _password_hasher
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing executor. Raises PasswordHashingBusy when saturated."""
+    future = get_password_hasher().submit("verify", verify_password, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing executor. Raises PasswordHashingBusy when saturated."""
+    future = get_password_hasher().submit("hash", get_password_hash, password)
+    return await asyncio.wrap_future(future)
+
 # Create JWT Access Token
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -23,14 +128,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex) # Lets a single token be revoked
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 # Decode JWT Token (can be expanded to verify claims, etc.)
 def decode_token(token: str) -> Optional[dict]:
+    """Verifies the token and returns its claims, or None if invalid/expired.
+
+    Successful verifications are memoized by token digest until `exp`, so a
+    session reusing its token skips the HMAC check and JSON parsing.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = jwt_claims_cache.get(key)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
-
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        jwt_claims_cache.set(key, payload, expires_at=exp)
+    return dict(payload)
@@ -0,0 +1,142 @@
+"""Adaptive Sentry trace sampling.
+
+Sentry decides whether to trace a request when it starts, so slow or failed
+requests cannot be kept after the fact. Instead the sampler keeps a short
+health window per route (fed by RequestMetricsMiddleware) and:
+
+- samples a route at its configured base rate (SENTRY_TRACES_ROUTE_RATES,
+  else SENTRY_TRACES_SAMPLE_RATE);
+- raises it to SENTRY_TRACES_PROBLEM_SAMPLE_RATE while the route has recently
+  been slow (>= SENTRY_TRACES_SLOW_SECONDS) or answered 5xx;
+- caps healthy routes at about SENTRY_TRACES_PER_ROUTE_PER_MINUTE traces, so
+  hot endpoints are down-sampled as their traffic grows.
+
+Errors are reported by Sentry independently of trace sampling.
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+
+RouteKey = Tuple[str, str] # (method, template without trailing slash)
+
+def _normalize(path: str) -> str:
+    return path.rstrip("/") or "/"
+
+def parse_trace_rates(spec: str) -> Dict[RouteKey, float]:
+    """Parses "METHOD /route/{param}=rate" entries separated by ";".
+
+    Example: "GET /products=0.001;POST /orders=0.2"
+    """
+    rates = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, rate = entry.partition("=")
+        method, _, path = route.strip().partition(" ")
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"Invalid trace sample rate in {entry!r}")
+        rates[(method.upper(), _normalize(path.strip()))] = value
+    return rates
+
+class _RouteHealth:
+    """Request and problem counts for the current and the previous window."""
+
+    __slots__ = ("started", "requests", "problems", "last_requests", "last_problems")
+
+    def __init__(self, now: float):
+        self.started = now
+        self.requests = self.problems = self.last_requests = self.last_problems = 0
+
+    def roll(self, now: float, window: float) -> None:
+        if now - self.started >= window:
+            stale = now - self.started >= 2 * window # Idle for a whole window: nothing recent
+            self.last_requests = 0 if stale else self.requests
+            self.last_problems = 0 if stale else self.problems
+            self.requests = self.problems = 0
+            self.started = now
+
+class AdaptiveTraceSampler:
+    """traces_sampler for sentry_sdk.init; call observe() after each request."""
+
+    def __init__(
+        self,
+        default_rate: float,
+        route_rates: Optional[Dict[RouteKey, float]] = None,
+        slow_seconds: float = 1.0,
+        problem_rate: float = 1.0,
+        per_route_per_minute: float = 0.0,
+        window: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+        self.slow_seconds = slow_seconds
+        self.problem_rate = problem_rate
+        self.per_route_per_minute = per_route_per_minute
+        self.window = window
+        self._clock = clock
+        self._health: Dict[RouteKey, _RouteHealth] = {}
+        # Templates seen by observe(), compiled for matching raw paths at sampling time;
+        # literal segments sort before parameters, so /clients/import wins over /clients/{client_id}
+        self._patterns: Dict[str, List[Tuple[re.Pattern, str]]] = {}
+
+    def observe(self, method: str, route: str, duration: float, status: int) -> None:
+        if route == "unmatched":
+            return
+        key = (method, _normalize(route))
+        now = self._clock()
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = _RouteHealth(now)
+            self._learn(*key)
+        health.roll(now, self.window)
+        health.requests += 1
+        if status >= 500 or duration >= self.slow_seconds:
+            health.problems += 1
+
+    def _learn(self, method: str, template: str) -> None:
+        segments = ("[^/]+" if segment.startswith("{") else re.escape(segment) for segment in template.split("/"))
+        regex = re.compile("^" + "/".join(segments) + "$")
+        patterns = self._patterns.setdefault(method, [])
+        patterns.append((regex, template))
+        patterns.sort(key=lambda item: [segment.startswith("{") for segment in item[1].split("/")])
+
+    def match(self, method: str, path: str) -> Optional[str]:
+        path = _normalize(path)
+        for regex, template in self._patterns.get(method, ()):
+            if regex.match(path):
+                return template
+        return None
+
+    def rate_for(self, method: str, path: str) -> float:
+        template = self.match(method, path)
+        key = (method, template if template is not None else _normalize(path))
+        base = self.route_rates.get(key, self.default_rate)
+        health = self._health.get(key)
+        if health is None:
+            return base
+        health.roll(self._clock(), self.window)
+        if health.problems or health.last_problems:
+            return max(base, self.problem_rate)
+        per_minute = max(health.requests, health.last_requests) * 60.0 / self.window
+        if self.per_route_per_minute and per_minute > self.per_route_per_minute:
+            return min(base, self.per_route_per_minute / per_minute)
+        return base
+
+    def __call__(self, sampling_context: dict) -> float:
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None: # Keep distributed traces whole
+            return float(parent_sampled)
+        scope = sampling_context.get("asgi_scope") or {}
+        if scope.get("type") != "http":
+            return self.default_rate
+        return self.rate_for(scope["method"], scope["path"])
+
+trace_sampler = AdaptiveTraceSampler(
+    settings.SENTRY_TRACES_SAMPLE_RATE,
+    parse_trace_rates(settings.SENTRY_TRACES_ROUTE_RATES),
+    slow_seconds=settings.SENTRY_TRACES_SLOW_SECONDS,
+    problem_rate=settings.SENTRY_TRACES_PROBLEM_SAMPLE_RATE,
+    per_route_per_minute=settings.SENTRY_TRACES_PER_ROUTE_PER_MINUTE,
+)
@@ -0,0 +1,108 @@
+"""Startup warmup, run from the app's lifespan before it accepts requests.
+
+Work that would otherwise land on the first requests after a deploy:
+
+- routes: FastAPI builds each route's dependant and response-model
+  validators/serializers on first use; app.openapi() builds them all (and
+  the schema served by /api/docs);
+- pool: opens connections in the sync and async pools (and replicas);
+- statements: runs every HOT_STATEMENTS entry once per stack, so their SQL
+  is compiled and cached;
+- revocation: builds the token revocation Bloom filter.
+
+A failing step is logged and skipped: a database that is down at boot must
+not keep the app from starting (requests then fail or recover as before).
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from .database import HOT_STATEMENTS, AsyncSessionLocal, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def _pool_size(engine: Engine, connections: int) -> int:
+    """`connections`, capped so overflow connections are not opened only to be closed."""
+    pool = engine.pool
+    return min(connections, pool.size()) if isinstance(pool, QueuePool) else min(connections, 1)
+
+def warm_pool(engine: Engine, connections: int) -> int:
+    """Checks out up to `connections` connections at once and returns them to the pool."""
+    opened = [engine.connect() for _ in range(_pool_size(engine, connections))]
+    for connection in opened:
+        connection.close()
+    return len(opened)
+
+async def warm_async_pool(engine: AsyncEngine, connections: int) -> int:
+    """warm_pool for an AsyncEngine; the connections are opened concurrently."""
+    opened = [engine.connect() for _ in range(_pool_size(engine.sync_engine, connections))]
+    try:
+        await asyncio.gather(*(connection.start() for connection in opened))
+    finally:
+        for connection in opened:
+            await connection.close()
+    return len(opened)
+
+def prime_statements(session_factory) -> int:
+    with session_factory() as db:
+        for statement, params in HOT_STATEMENTS:
+            db.execute(statement, params).all()
+        db.rollback()
+    return len(HOT_STATEMENTS)
+
+async def prime_statements_async(session_factory) -> int:
+    async with session_factory() as db:
+        for statement, params in HOT_STATEMENTS:
+            (await db.execute(statement, params)).all()
+        await db.rollback()
+    return len(HOT_STATEMENTS)
+
+def rebuild_revocation_filter(session_factory) -> None:
+    from ..services.token_revocation_service import token_revocation_store
+    with session_factory() as db:
+        token_revocation_store.rebuild(db)
+
+async def warm_up(
+    app,
+    connections: int,
+    session_factory=SessionLocal,
+    async_session_factory=AsyncSessionLocal,
+    replica_engines: Iterable[AsyncEngine] = (),
+) -> Dict[str, Optional[float]]:
+    """Runs the warmup steps; returns each step's seconds (None if it failed)."""
+    engine = session_factory.kw["bind"]
+    async_engine = async_session_factory.kw["bind"]
+
+    async def replicas():
+        for replica in replica_engines:
+            await warm_async_pool(replica, connections)
+
+    steps = {
+        "routes": lambda: asyncio.to_thread(app.openapi),
+        "pool": lambda: asyncio.to_thread(warm_pool, engine, connections),
+        "async pool": lambda: warm_async_pool(async_engine, connections),
+        "replica pools": replicas,
+        "statements": lambda: asyncio.to_thread(prime_statements, session_factory),
+        "async statements": lambda: prime_statements_async(async_session_factory),
+        "revocation": lambda: asyncio.to_thread(rebuild_revocation_filter, session_factory),
+    }
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception as exc:
+            logger.warning("Startup warmup step %r failed: %s", name, exc)
+            timings[name] = None
+        else:
+            timings[name] = time.perf_counter() - start
+    logger.info(
+        "Startup warmup: %s",
+        ", ".join(f"{name} {'failed' if seconds is None else f'{seconds * 1000:.0f} ms'}" for name, seconds in timings.items()),
+    )
+    return timings
@@ -1,27 +1,39 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-import sentry_sdk
 
 from .auth import router as auth_router
 from .clients import router as clients_router
 from .products import router as products_router
 from .orders import router as orders_router
+from .core.admission import AdmissionMiddleware, admission_controller
 from .core.config import settings
-from .core.database import engine # Import engine to potentially create tables (optional)
+from .core.deadlines import DeadlineExceeded, DeadlineMiddleware, deadline_exceeded_handler, parse_route_timeouts
+from .core.database import async_engine, engine # Import engine to potentially create tables (optional)
+from .core.compression import CompressionMiddleware
+from .core.metrics import REGISTRY
+from .core.query_stats import QueryStatsMiddleware
+from .core.request_metrics import RequestMetricsMiddleware
+from .core.response_cache import ResponseCacheHit, ResponseCacheMiddleware, cached_response_handler
+from .core.tracing import trace_sampler
+from .core.rate_limit import RateLimitMiddleware, rate_limiter
+from .core.replicas import ReadYourWritesMiddleware, read_replicas
+from .core.warmup import warm_up
 # from .models import Base # Import Base if using create_all
 
-# Initialize Sentry if DSN is provided
+# Initialize Sentry if DSN is provided (imported here: sentry_sdk is slow to import)
 if settings.SENTRY_DSN:
+    import sentry_sdk
     sentry_sdk.init(
         dsn=settings.SENTRY_DSN,
-        # Set traces_sample_rate to 1.0 to capture 100%
-        # of transactions for performance monitoring.
-        traces_sample_rate=1.0,
-        # Set profiles_sample_rate to 1.0 to profile 100%
-        # of sampled transactions.
-        profiles_sample_rate=1.0,
+        # Per-route rates, boosted for slow/failing routes and capped for hot ones (core.tracing)
+        traces_sampler=trace_sampler,
+        # Relative to traced requests
+        profiles_sample_rate=settings.SENTRY_PROFILES_SAMPLE_RATE,
     )
 
 # Optional: Create database tables on startup if not using Alembic migrations
@@ -30,7 +42,22 @@ if settings.SENTRY_DSN:
 # from .models import Base
 # Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown; the app accepts requests once the warmup is done."""
+    # With several workers, each shares its metrics through this directory so /metrics reports totals
+    if settings.METRICS_MULTIPROC_DIR:
+        REGISTRY.enable_multiprocess(settings.METRICS_MULTIPROC_DIR, settings.METRICS_SYNC_SECONDS)
+    os.makedirs(products_router.IMAGE_DIR, exist_ok=True)
+    if settings.STARTUP_WARMUP:
+        await warm_up(app, settings.DB_POOL_WARM_CONNECTIONS, replica_engines=read_replicas.engines)
+    yield
+    await read_replicas.dispose()
+    await async_engine.dispose()
+    engine.dispose()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Lu Estilo API",
     description="API para gerenciamento comercial da Lu Estilo Confecções.",
     version="0.1.0",
@@ -39,6 +66,41 @@ app = FastAPI(
     redoc_url="/api/redoc" # Customize ReDoc URL
 )
 
+# Stores the GET responses routes cache with cache_response (uncompressed: inside compression)
+# and applies the request's cache invalidations before its response goes out
+app.add_middleware(ResponseCacheMiddleware)
+app.add_exception_handler(ResponseCacheHit, cached_response_handler)
+
+# Inside the metrics and Server-Timing middlewares, so they count the compression time
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# Pins a client's reads to the primary right after it writes (no-op without replicas)
+app.add_middleware(ReadYourWritesMiddleware, pin_seconds=settings.DB_READ_YOUR_WRITES_SECONDS)
+
+# Sheds load with 503 once a route class's concurrency limit and wait queue are full.
+# Inside the rate limiter, so requests over their rate never wait for a slot.
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Request deadline (X-Request-Timeout or per-route default), applied to DB statements; 504 once it passes.
+# Outside admission control, so time spent queued for a slot counts against it.
+app.add_middleware(
+    DeadlineMiddleware,
+    default_seconds=settings.REQUEST_TIMEOUT_SECONDS,
+    max_seconds=settings.REQUEST_TIMEOUT_MAX_SECONDS,
+    routes=parse_route_timeouts(settings.REQUEST_TIMEOUT_ROUTES),
+)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+
+# Rate limiting runs before routing, so rejected requests never open a DB session.
+# Added before CORS so 429 responses still carry CORS headers.
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # CORS Middleware Configuration
 # Adjust origins as needed for your frontend application
 app.add_middleware(
@@ -49,6 +111,13 @@ app.add_middleware(
     allow_headers=["*"], # Allow all headers
 )
 
+# Per-route http_* metrics; inside QueryStatsMiddleware so it can read the request's DB time.
+# Also feeds the trace sampler's per-route health when Sentry is on.
+app.add_middleware(RequestMetricsMiddleware, observers=[trace_sampler.observe] if settings.SENTRY_DSN else [])
+
+# Outermost, so the app time in Server-Timing covers the other middleware too
+app.add_middleware(QueryStatsMiddleware)
+
 # Include Routers
 app.include_router(auth_router.router, prefix="/auth", tags=["Authentication"])
 app.include_router(clients_router.router, prefix="/clients", tags=["Clients"])
@@ -70,6 +139,11 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def read_root():
     return {"message": "Bem-vindo à API Lu Estilo! Acesse /api/docs para a documentação."}
 
+# Metrics in Prometheus text exposition format
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Placeholder for WhatsApp integration endpoint/webhook if needed
 # @app.post("/whatsapp/webhook", tags=["WhatsApp"])
 # async def whatsapp_webhook(request: Request):
@@ -3,6 +3,8 @@ from .user import User
 from .client import Client
 from .product import Product
 from .order import Order, OrderItem, OrderStatus
+from .refresh_token import RefreshToken
+from .revoked_token import RevokedToken
 
-__all__ = ["Base", "User", "Client", "Product", "Order", "OrderItem", "OrderStatus"]
+__all__ = ["Base", "User", "Client", "Product", "Order", "OrderItem", "OrderStatus", "RefreshToken", "RevokedToken"]
 
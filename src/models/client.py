@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, DDL, event
 from sqlalchemy.sql import func
 from ..core.database import Base
 
@@ -14,6 +14,65 @@ class Client(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Denormalized order stats (non-cancelled orders), maintained by order_service.
+    # Rebuild with: python -m src.services.client_stats_service
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+    lifetime_value = Column(Float, nullable=False, default=0.0, server_default="0")
+    last_order_at = Column(DateTime(timezone=True), nullable=True)
+
     # Relationships (if needed later, e.g., orders placed by client)
     # orders = relationship("Order", back_populates="client")
 
+# Indexes matching get_clients(sort_by=...) ordering, id as the tie-breaker
+Index("ix_clients_order_count", Client.order_count, Client.id)
+Index("ix_clients_lifetime_value", Client.lifetime_value, Client.id)
+Index(
+    "ix_clients_last_order_at_pg", Client.last_order_at.desc().nulls_last(), Client.id.desc()
+).ddl_if(dialect="postgresql")
+# Elsewhere (SQLite) NULLs already sort last under DESC and NULLS LAST is not allowed in indexes
+Index("ix_clients_last_order_at", Client.last_order_at, Client.id).ddl_if(
+    callable_=lambda ddl, target, bind, **kw: kw["dialect"].name != "postgresql"
+)
+
+# Trigram GIN indexes backing client_service.search_clients on PostgreSQL.
+# They serve both ILIKE '%term%' and the pg_trgm similarity operator.
+for _column in ("name", "email", "cpf", "phone"):
+    Index(
+        f"ix_clients_{_column}_trgm",
+        getattr(Client, _column),
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+event.listen(
+    Client.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# SQLite equivalent: an external-content FTS5 table with the trigram tokenizer,
+# kept in sync with `clients` by triggers. The update trigger only fires for the
+# indexed columns: order stats are rewritten on every order and must not reindex.
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5("
+    "name, email, cpf, phone, content='clients', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN "
+    "INSERT INTO clients_fts(rowid, name, email, cpf, phone) "
+    "VALUES (new.id, new.name, new.email, new.cpf, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN "
+    "INSERT INTO clients_fts(clients_fts, rowid, name, email, cpf, phone) "
+    "VALUES ('delete', old.id, old.name, old.email, old.cpf, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE OF name, email, cpf, phone ON clients BEGIN "
+    "INSERT INTO clients_fts(clients_fts, rowid, name, email, cpf, phone) "
+    "VALUES ('delete', old.id, old.name, old.email, old.cpf, old.phone); "
+    "INSERT INTO clients_fts(rowid, name, email, cpf, phone) "
+    "VALUES (new.id, new.name, new.email, new.cpf, new.phone); END",
+]
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(Client.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    Client.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS clients_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from ..core.database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # All tokens rotated from one login share a family; reuse of a rotated token revokes it
+    family = Column(String(32), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False) # sha256 hex, the token itself is never stored
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True) # Set when rotated
+    # users.token_version at login; a later bump (password change, demotion, revoke) ends the family
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+Index("ix_refresh_tokens_family_expires_at", RefreshToken.family, RefreshToken.expires_at)
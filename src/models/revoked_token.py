@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from ..core.database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    # Ids must never be reused: workers sync incrementally with "id > last seen id - lookback"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String(32), unique=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True) # Purged once past the token's exp
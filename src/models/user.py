@@ -10,6 +10,8 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    # Embedded in access tokens as "ver"; bumping it invalidates every token issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships (if needed later, e.g., orders placed by user)
     # orders = relationship("Order", back_populates="owner")
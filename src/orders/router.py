@@ -1,21 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from .. import schemas, services
-from ..core.database import get_db
+from .. import schemas
+from ..services import client_service, order_service
+from ..core.database import get_async_db
+from ..core.replicas import get_read_db
+from ..core.responses import FastJSONResponse, dump_rows
+from ..core.response_cache import add_cache_tags, cache_response
 from ..auth.dependencies import get_current_active_user, get_current_admin_user # Use admin for delete?
-from ..models.user import User # To use User model for dependency
 from ..models.order import OrderStatus # Import Enum
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.OrderRead, status_code=status.HTTP_201_CREATED)
-def create_order(
+async def create_order(
     order: schemas.OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user) # Any authenticated user can create an order
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_active_user) # Any authenticated user can create an order
 ):
     """Creates a new order. Requires authentication.
 
@@ -24,11 +27,11 @@ def create_order(
     """
     try:
         # Validate client exists
-        client = services.client_service.get_client(db, order.client_id)
+        client = await client_service.get_client_async(db, order.client_id)
         if not client:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Client with ID {order.client_id} not found.")
 
-        created_order = services.order_service.create_order(db=db, order=order)
+        created_order = await order_service.create_order_async(db=db, order=order)
         # Trigger WhatsApp notification (placeholder)
         # services.whatsapp_service.send_order_confirmation(client.phone, created_order.id)
         return created_order
@@ -41,8 +44,9 @@ def create_order(
         print(f"Error creating order: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An internal error occurred while creating the order.")
 
-@router.get("/", response_model=List[schemas.OrderRead])
-def read_orders(
+# Order pages embed clients and products, so any write to those also refreshes them
+@router.get("/", response_model=List[schemas.OrderRead], dependencies=[Depends(cache_response(("orders", "clients", "products"), principal=get_current_active_user))])
+async def read_orders(
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[datetime] = Query(None, description="Filter by start date (YYYY-MM-DDTHH:MM:SS)"),
@@ -51,43 +55,45 @@ def read_orders(
     order_id: Optional[int] = Query(None, description="Filter by specific order ID"),
     status: Optional[OrderStatus] = Query(None, description="Filter by order status"),
     client_id: Optional[int] = Query(None, description="Filter by client ID"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user) # Or admin only?
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
+    current_user: schemas.Principal = Depends(get_current_active_user) # Or admin only?
 ):
     """Retrieves a list of orders with pagination and filtering. Requires authentication."""
     # Add logic to restrict access? Regular users see their orders, admins see all?
     # For now, any authenticated user can see all orders.
-    orders = services.order_service.get_orders(
+    orders = await order_service.get_orders_async(
         db, skip=skip, limit=limit,
         start_date=start_date, end_date=end_date, section=section,
         order_id=order_id, status=status, client_id=client_id
     )
-    return orders
+    return FastJSONResponse(dump_rows(schemas.OrderRead, orders)) # Skips re-validating up to 100 nested orders
 
-@router.get("/{order_id}", response_model=schemas.OrderRead)
-def read_order(
+@router.get("/{order_id}", response_model=schemas.OrderRead, dependencies=[Depends(cache_response(("order:{order_id}",), principal=get_current_active_user))])
+async def read_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
+    current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Retrieves a specific order by ID. Requires authentication."""
     # Add logic: Check if user owns the order or is admin?
-    db_order = services.order_service.get_order(db, order_id=order_id)
+    db_order = await order_service.get_order_async(db, order_id=order_id)
     if db_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
     # if not current_user.is_admin and db_order.client_id != current_user.client_id: # Assuming user linked to client
     #     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this order")
+    add_cache_tags(request, f"client:{db_order.client_id}", *(f"product:{item.product_id}" for item in db_order.items))
     return db_order
 
 @router.put("/{order_id}", response_model=schemas.OrderRead)
-def update_order(
+async def update_order(
     order_id: int,
     order: schemas.OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user) # Only admins can update order status
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Only admins can update order status
 ):
     """Updates a specific order by ID (currently only status). Requires admin authentication."""
-    updated_order = services.order_service.update_order(db=db, order_id=order_id, order_update=order)
+    updated_order = await order_service.update_order_async(db=db, order_id=order_id, order_update=order)
     if updated_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
@@ -100,16 +106,16 @@ def update_order(
     return updated_order
 
 @router.delete("/{order_id}", response_model=schemas.OrderRead)
-def delete_order(
+async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user) # Only admins can delete orders
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Only admins can delete orders
 ):
     """Deletes a specific order by ID. Requires admin authentication.
 
     Note: Consider using a 'soft delete' or 'cancel' status instead of hard delete.
     """
-    deleted_order = services.order_service.delete_order(db=db, order_id=order_id)
+    deleted_order = await order_service.delete_order_async(db=db, order_id=order_id)
     if deleted_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
     return deleted_order
@@ -1,27 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import shutil
 import os
 
 from .. import schemas, services
-from ..core.database import get_db
+from ..core.database import get_async_db
+from ..core.replicas import get_read_db
+from ..core.responses import FastJSONResponse, dump_rows
+from ..core.response_cache import cache_response
 from ..auth.dependencies import get_current_active_user, get_current_admin_user # Admin for create/update/delete
-from ..models.user import User # To use User model for dependency
 
 # Define a directory to store product images (adjust path as needed)
+# Created by the app's lifespan at startup (see main.py)
 IMAGE_DIR = "/home/ubuntu/lu_estilo_api/static/images/products"
-# Ensure the directory exists
-os.makedirs(IMAGE_DIR, exist_ok=True)
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.ProductRead, status_code=status.HTTP_201_CREATED)
-def create_product(
+async def create_product(
     product: schemas.ProductCreate, # Changed Depends() to expect body
     # files: List[UploadFile] = File(None, description="Optional product images"), # Handle file uploads separately if needed
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user) # Only admins can create products
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Only admins can create products
 ):
     """Creates a new product. Requires admin authentication."""
     # Handle image uploads here if using the File parameter
@@ -39,62 +40,62 @@ def create_product(
 
     # Simplified version without direct file upload handling in this step
     # Image URLs are expected in the product schema directly for now
-    db_product = services.product_service.create_product(db=db, product=product)
+    db_product = await services.product_service.create_product_async(db=db, product=product)
     return db_product
 
-@router.get("/", response_model=List[schemas.ProductRead])
-def read_products(
+@router.get("/", response_model=List[schemas.ProductRead], dependencies=[Depends(cache_response(("products",)))])
+async def read_products(
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = Query(None, description="Filter by product section/category (case-insensitive)"),
     min_price: Optional[float] = Query(None, description="Filter by minimum sale price"),
     max_price: Optional[float] = Query(None, description="Filter by maximum sale price"),
     # available: Optional[bool] = Query(None, description="Filter by availability (stock > 0)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
     # No auth required for listing products, as per common practice, but can be added
-    # current_user: User = Depends(get_current_active_user)
+    # current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Retrieves a list of products with pagination and filtering."""
-    products = services.product_service.get_products(
+    products = await services.product_service.get_products_async(
         db, skip=skip, limit=limit, category=category, min_price=min_price, max_price=max_price #, available=available
     )
-    return products
+    return FastJSONResponse(dump_rows(schemas.ProductRead, products))
 
-@router.get("/{product_id}", response_model=schemas.ProductRead)
-def read_product(
+@router.get("/{product_id}", response_model=schemas.ProductRead, dependencies=[Depends(cache_response(("product:{product_id}",)))])
+async def read_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db, scope="function"), # Replica when configured
     # No auth required for viewing a specific product
-    # current_user: User = Depends(get_current_active_user)
+    # current_user: schemas.Principal = Depends(get_current_active_user)
 ):
     """Retrieves a specific product by ID."""
-    db_product = services.product_service.get_product(db, product_id=product_id)
+    db_product = await services.product_service.get_product_async(db, product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return db_product
 
 @router.put("/{product_id}", response_model=schemas.ProductRead)
-def update_product(
+async def update_product(
     product_id: int,
     product: schemas.ProductUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user) # Only admins can update products
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Only admins can update products
 ):
     """Updates a specific product by ID. Requires admin authentication."""
-    updated_product = services.product_service.update_product(db=db, product_id=product_id, product_update=product)
+    updated_product = await services.product_service.update_product_async(db=db, product_id=product_id, product_update=product)
     if updated_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return updated_product
 
 @router.delete("/{product_id}", response_model=schemas.ProductRead)
-def delete_product(
+async def delete_product(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user) # Only admins can delete products
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user: schemas.Principal = Depends(get_current_admin_user) # Only admins can delete products
 ):
     """Deletes a specific product by ID. Requires admin authentication."""
     # Add check: prevent deletion if product is in active orders?
-    deleted_product = services.product_service.delete_product(db=db, product_id=product_id)
+    deleted_product = await services.product_service.delete_product_async(db=db, product_id=product_id)
     if deleted_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return deleted_product
@@ -104,8 +105,8 @@ def delete_product(
 # async def upload_product_image(
 #     product_id: int,
 #     file: UploadFile = File(...),
-#     db: Session = Depends(get_db),
-#     current_user: User = Depends(get_current_admin_user)
+#     db: Session = Depends(get_db, scope="function"),
+#     current_user: schemas.Principal = Depends(get_current_admin_user)
 # ):
 #     db_product = services.product_service.get_product(db, product_id=product_id)
 #     if not db_product:
@@ -1,15 +1,15 @@
 from .user import UserCreate, UserRead, UserUpdate, UserLogin
-from .client import ClientCreate, ClientRead, ClientUpdate, ClientBase
+from .client import ClientCreate, ClientRead, ClientUpdate, ClientBase, ClientImportRow, ClientImportReport, ClientStats, client_read_with_stats
 from .product import ProductCreate, ProductRead, ProductUpdate, ProductBase
 from .order import OrderCreate, OrderRead, OrderUpdate, OrderBase, OrderItemCreate, OrderItemRead, OrderItemBase
-from .token import Token, TokenData
+from .token import Token, TokenData, Principal, RefreshTokenRequest, LogoutRequest, TokenRevokeRequest
 
 __all__ = [
     "UserCreate", "UserRead", "UserUpdate", "UserLogin",
-    "ClientCreate", "ClientRead", "ClientUpdate", "ClientBase",
+    "ClientCreate", "ClientRead", "ClientUpdate", "ClientBase", "ClientImportRow", "ClientImportReport", "ClientStats", "client_read_with_stats",
     "ProductCreate", "ProductRead", "ProductUpdate", "ProductBase",
     "OrderCreate", "OrderRead", "OrderUpdate", "OrderBase",
     "OrderItemCreate", "OrderItemRead", "OrderItemBase",
-    "Token", "TokenData"
+    "Token", "TokenData", "Principal", "RefreshTokenRequest", "LogoutRequest", "TokenRevokeRequest"
 ]
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # Base schema for Client data
@@ -23,12 +23,40 @@ class ClientUpdate(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
 
+# Denormalized order stats (output, only when requested with include_stats)
+class ClientStats(BaseModel):
+    order_count: int
+    lifetime_value: float
+    last_order_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Schema for Client reading (output)
 class ClientRead(ClientBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    stats: Optional[ClientStats] = None
 
     class Config:
         from_attributes = True
 
+
+# Schemas for bulk import results (output)
+class ClientImportRow(BaseModel):
+    row: int # 1-based row number in the uploaded file (header excluded)
+    status: Literal["inserted", "duplicate", "rejected"]
+    reason: Optional[str] = None
+
+class ClientImportReport(BaseModel):
+    inserted: int
+    duplicates: int
+    rejected: int
+    rows: List[ClientImportRow]
+
+def client_read_with_stats(db_client) -> ClientRead:
+    """Builds a ClientRead including the denormalized order stats."""
+    return ClientRead.model_validate(db_client).model_copy(
+        update={"stats": ClientStats.model_validate(db_client)}
+    )
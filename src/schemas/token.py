@@ -4,10 +4,26 @@ from typing import Optional
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None # Also end the refresh token's session
+
+class TokenRevokeRequest(BaseModel):
+    token: str # Access token to revoke
 
 class TokenData(BaseModel):
     email: Optional[str] = None
-    # Add other relevant claims like user_id, roles if needed
-    # user_id: Optional[int] = None
-    # is_admin: Optional[bool] = None
+    user_id: Optional[int] = None # "uid" claim
+    is_admin: bool = False
+    token_version: Optional[int] = None # "ver" claim, checked against users.token_version
 
+# Authenticated user as resolved from the access token (returned by get_current_user)
+class Principal(BaseModel):
+    id: int
+    email: str
+    is_admin: bool = False
+    is_active: bool = True
@@ -0,0 +1,160 @@
+import re
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..core.database import unique_violation_field
+from ..core.response_cache import invalidate_on_commit
+from ..models.client import Client
+from ..schemas.client import ClientImportReport, ClientImportRow
+
+DEFAULT_CHUNK_SIZE = 2000
+
+_NON_DIGITS = re.compile(r"\D")
+# Check digit weights, precomputed once instead of per row
+_CPF_WEIGHTS_1 = tuple(range(10, 1, -1))
+_CPF_WEIGHTS_2 = tuple(range(11, 1, -1))
+
+def normalize_cpf(value: str) -> str:
+    """Strips punctuation such as '123.456.789-09'."""
+    return _NON_DIGITS.sub("", value or "")
+
+def is_valid_cpf(cpf: str) -> bool:
+    """Validates an 11-digit CPF, including both check digits."""
+    if len(cpf) != 11 or not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    digits = [ord(c) - 48 for c in cpf]
+    first = sum(d * w for d, w in zip(digits, _CPF_WEIGHTS_1)) * 10 % 11 % 10
+    if first != digits[9]:
+        return False
+    second = sum(d * w for d, w in zip(digits, _CPF_WEIGHTS_2)) * 10 % 11 % 10
+    return second == digits[10]
+
+def normalize_email(value: str) -> str:
+    """Returns the email as EmailStr normalizes it; raises ValueError with the reason if invalid.
+
+    Uses the same validator as ClientCreate, so the import accepts exactly what
+    the single-create route accepts.
+    """
+    try:
+        return validate_email((value or "").strip())[1]
+    except PydanticCustomError as exc:
+        raise ValueError(exc.message()) from None
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def _validate_chunk(
+    chunk: List[Tuple[int, dict]],
+    seen_emails: set,
+    seen_cpfs: set,
+    report: List[ClientImportRow],
+) -> List[Tuple[int, dict]]:
+    """Validates and dedupes a chunk within the file; returns the candidate rows."""
+    candidates = []
+    for row_number, raw in chunk:
+        name = (raw.get("name") or "").strip()
+        cpf = normalize_cpf(raw.get("cpf"))
+        reason = None
+        try:
+            email = normalize_email(raw.get("email"))
+        except ValueError as exc:
+            email, email_error = None, str(exc)
+        if not name:
+            reason = "Missing name"
+        elif email is None:
+            reason = email_error
+        elif not is_valid_cpf(cpf):
+            reason = "Invalid CPF"
+        if reason:
+            report.append(ClientImportRow(row=row_number, status="rejected", reason=reason))
+            continue
+        if email in seen_emails or cpf in seen_cpfs:
+            report.append(ClientImportRow(row=row_number, status="duplicate", reason="Duplicate within file"))
+            continue
+        seen_emails.add(email)
+        seen_cpfs.add(cpf)
+        candidates.append((row_number, {
+            "name": name,
+            "email": email,
+            "cpf": cpf,
+            "phone": (raw.get("phone") or "").strip() or None,
+            "address": (raw.get("address") or "").strip() or None,
+        }))
+    return candidates
+
+def _insert_rows_one_by_one(db: Session, rows: List[Tuple[int, dict]], report: List[ClientImportRow]) -> None:
+    """Fallback when a concurrent writer inserted a duplicate after the chunk lookup."""
+    for row_number, values in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Client.__table__), [values])
+        except IntegrityError as exc:
+            field = unique_violation_field(exc, ("email", "cpf")) or "email"
+            report.append(ClientImportRow(row=row_number, status="duplicate", reason=f"{field} already registered"))
+        else:
+            report.append(ClientImportRow(row=row_number, status="inserted"))
+
+def import_clients(db: Session, rows: Iterable[dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> ClientImportReport:
+    """Bulk-imports clients from an iterable of dicts (e.g. a csv.DictReader).
+
+    Each chunk is validated in one pass, checked against the database with a
+    single set-based lookup, inserted with one executemany INSERT and
+    committed; a RequestSession defers those commits to its request boundary.
+    Rows are numbered from 1 in input order.
+    """
+    report: List[ClientImportRow] = []
+    seen_emails: set = set()
+    seen_cpfs: set = set()
+    numbered = enumerate(rows, start=1)
+
+    for chunk in _chunks(numbered, chunk_size):
+        candidates = _validate_chunk(chunk, seen_emails, seen_cpfs, report)
+        if not candidates:
+            continue
+
+        emails = [values["email"] for _, values in candidates]
+        cpfs = [values["cpf"] for _, values in candidates]
+        existing = db.query(Client.email, Client.cpf).filter(
+            or_(Client.email.in_(emails), Client.cpf.in_(cpfs))
+        ).all()
+        existing_emails = {email for email, _ in existing}
+        existing_cpfs = {cpf for _, cpf in existing}
+
+        to_insert = []
+        for row_number, values in candidates:
+            if values["email"] in existing_emails:
+                report.append(ClientImportRow(row=row_number, status="duplicate", reason="email already registered"))
+            elif values["cpf"] in existing_cpfs:
+                report.append(ClientImportRow(row=row_number, status="duplicate", reason="cpf already registered"))
+            else:
+                to_insert.append((row_number, values))
+        if not to_insert:
+            continue
+
+        invalidate_on_commit(db, "clients") # Core INSERT: not seen by the ORM flush
+        # A savepoint per chunk, so a conflicting chunk never undoes earlier ones
+        try:
+            with db.begin_nested():
+                db.execute(insert(Client.__table__), [values for _, values in to_insert])
+        except IntegrityError:
+            _insert_rows_one_by_one(db, to_insert, report)
+        else:
+            report.extend(ClientImportRow(row=row_number, status="inserted") for row_number, _ in to_insert)
+        db.commit() # Per chunk (the route uses get_batch_db): releases locks, keeps earlier chunks if a later one fails
+
+    report.sort(key=lambda r: r.row)
+    counts: Dict[str, int] = {"inserted": 0, "duplicate": 0, "rejected": 0}
+    for entry in report:
+        counts[entry.status] += 1
+    return ClientImportReport(
+        inserted=counts["inserted"],
+        duplicates=counts["duplicate"],
+        rejected=counts["rejected"],
+        rows=report,
+    )
@@ -1,35 +1,176 @@
+import re
+from sqlalchemy import bindparam, func, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from ..core.database import DuplicateEntryError, hot_statement, unique_violation_field
+from ..core.response_cache import cache_tags_for
 from ..models.client import Client
 from ..schemas.client import ClientCreate, ClientUpdate
-from typing import List, Optional
+from typing import List, Literal, Optional
 
+# Trigram indexes cannot match terms shorter than this
+MIN_TRIGRAM_LENGTH = 3
+
+ClientSortField = Literal["order_count", "lifetime_value", "last_order_at"]
+
+
+cache_tags_for(Client, lambda client: ("clients", f"client:{client.id}"))
+
+# Hot lookups are built once at import (see product_service)
+_CLIENT_BY_ID = hot_statement(select(Client).where(Client.id == bindparam("client_id")), client_id=0)
+_CLIENT_BY_EMAIL = hot_statement(select(Client).where(Client.email == bindparam("email")).limit(1), email="")
+_CLIENT_BY_CPF = hot_statement(select(Client).where(Client.cpf == bindparam("cpf")).limit(1), cpf="")
 
 def get_client(db: Session, client_id: int) -> Optional[Client]:
     """Fetches a single client by ID."""
-    return db.query(Client).filter(Client.id == client_id).first()
+    return db.scalars(_CLIENT_BY_ID, {"client_id": client_id}).first()
 
-def get_clients(db: Session, skip: int = 0, limit: int = 100, name: Optional[str] = None, email: Optional[str] = None) -> List[Client]:
-    """Fetches a list of clients with optional filtering and pagination."""
-    query = db.query(Client)
+def _clients_query(
+    skip: int = 0,
+    limit: int = 100,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    sort_by: Optional[ClientSortField] = None,
+):
+    """Builds the client listing statement shared by the sync and async services."""
+    query = select(Client)
     if name:
-        query = query.filter(Client.name.ilike(f"%{name}%")) # Case-insensitive search
+        query = query.where(Client.name.ilike(f"%{name}%")) # Case-insensitive search
     if email:
-        query = query.filter(Client.email.ilike(f"%{email}%"))
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Client.email.ilike(f"%{email}%"))
+    if sort_by == "last_order_at":
+        query = query.order_by(Client.last_order_at.desc().nulls_last(), Client.id.desc())
+    elif sort_by:
+        query = query.order_by(getattr(Client, sort_by).desc(), Client.id.desc())
+    return query.offset(skip).limit(limit)
+
+def get_clients(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    sort_by: Optional[ClientSortField] = None,
+) -> List[Client]:
+    """Fetches a list of clients with optional filtering, sorting and pagination.
+
+    sort_by orders by a denormalized stat, highest/latest first (indexed).
+    """
+    return db.scalars(_clients_query(skip, limit, name, email, sort_by)).all()
+
+def _search_strategy(dialect: str, term: str) -> str:
+    if dialect == "postgresql":
+        return "trgm"
+    if dialect == "sqlite" and _fts_match(term):
+        return "fts"
+    return "prefix"
+
+def search_clients(db: Session, q: str, limit: int = 20) -> List[Client]:
+    """Searches clients by name, email prefix, phone or CPF digits, best matches first.
+
+    Uses the pg_trgm GIN indexes on PostgreSQL and the clients_fts trigram table on SQLite.
+    """
+    term = q.strip()
+    if not term:
+        return []
+    strategy = _search_strategy(db.get_bind().dialect.name, term)
+    if strategy == "fts":
+        ids = db.execute(_fts_ids_query(term, limit)).scalars().all()
+        if not ids:
+            return []
+        return _in_rank_order(ids, db.scalars(select(Client).where(Client.id.in_(ids))).all())
+    query = _trgm_search_query(term, limit) if strategy == "trgm" else _prefix_search_query(term, limit)
+    return db.scalars(query).all()
+
+def _search_filter(term: str):
+    """Shared match condition: name substring, email prefix, phone/CPF digits."""
+    digits = re.sub(r"\D", "", term)
+    conditions = [
+        Client.name.icontains(term, autoescape=True),
+        Client.email.istartswith(term, autoescape=True),
+    ]
+    if digits:
+        conditions.append(Client.cpf.contains(digits, autoescape=True))
+        conditions.append(Client.phone.contains(digits, autoescape=True))
+    return or_(*conditions)
+
+def _trgm_search_query(term: str, limit: int):
+    """PostgreSQL: trigram-indexed match, ranked by similarity."""
+    score = func.greatest(
+        func.similarity(Client.name, term),
+        func.similarity(Client.email, term),
+        func.similarity(Client.cpf, term),
+        func.coalesce(func.similarity(Client.phone, term), 0),
+    )
+    return (
+        select(Client)
+        .where(or_(_search_filter(term), Client.name.op("%")(term)))
+        .order_by(score.desc(), Client.id)
+        .limit(limit)
+    )
+
+def _fts_phrase(value: str) -> str:
+    return '"{}"'.format(value.replace('"', '""'))
+
+def _fts_match(term: str) -> Optional[str]:
+    """FTS5 MATCH expression mirroring _search_filter, or None if no word is long enough for trigrams.
+
+    Name: every word of the term, in any order; email: prefix; CPF/phone: the
+    term's digits. Digit runs shorter than a trigram are not matched here.
+    """
+    words = [w for w in term.split() if len(w) >= MIN_TRIGRAM_LENGTH]
+    if not words:
+        return None
+    parts = [
+        "{name} : (%s)" % " ".join(_fts_phrase(w) for w in words),
+        "email : ^" + _fts_phrase(term),
+    ]
+    digits = re.sub(r"\D", "", term)
+    if len(digits) >= MIN_TRIGRAM_LENGTH:
+        parts.append("{cpf phone} : " + _fts_phrase(digits))
+    return " OR ".join(parts)
+
+def _fts_ids_query(term: str, limit: int):
+    """SQLite: trigram FTS5 match, client ids ranked by bm25."""
+    return text(
+        "SELECT rowid FROM clients_fts WHERE clients_fts MATCH :match "
+        "ORDER BY bm25(clients_fts) LIMIT :limit"
+    ).bindparams(match=_fts_match(term), limit=limit)
+
+def _in_rank_order(ids: List[int], clients: List[Client]) -> List[Client]:
+    by_id = {c.id: c for c in clients}
+    return [by_id[i] for i in ids if i in by_id]
+
+def _prefix_search_query(term: str, limit: int):
+    """Fallback for short terms and other databases: prefix/substring match, ordered by name."""
+    return select(Client).where(_search_filter(term)).order_by(Client.name, Client.id).limit(limit)
 
 def get_client_by_email(db: Session, email: str) -> Optional[Client]:
     """Fetches a client by email."""
-    return db.query(Client).filter(Client.email == email).first()
+    return db.scalars(_CLIENT_BY_EMAIL, {"email": email}).first()
 
 def get_client_by_cpf(db: Session, cpf: str) -> Optional[Client]:
     """Fetches a client by CPF."""
-    return db.query(Client).filter(Client.cpf == cpf).first()
+    return db.scalars(_CLIENT_BY_CPF, {"cpf": cpf}).first()
 
 def create_client(db: Session, client: ClientCreate) -> Client:
-    """Creates a new client."""
+    """Creates a new client.
+
+    Duplicates are detected by the unique indexes on email/CPF rather than by
+    pre-checking, so concurrent inserts cannot slip through.
+    Raises DuplicateEntryError with the offending field.
+    """
     db_client = Client(**client.model_dump())
     db.add(db_client)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        field = unique_violation_field(exc, ("email", "cpf"))
+        if field is None:
+            raise
+        raise DuplicateEntryError(field) from exc
     db.refresh(db_client)
     return db_client
 
@@ -57,3 +198,73 @@ def delete_client(db: Session, client_id: int) -> Optional[Client]:
     db.commit()
     return db_client
 
+
+# Async versions for the AsyncSession stack (see core.database.get_async_db)
+
+async def get_client_async(db: AsyncSession, client_id: int) -> Optional[Client]:
+    """Fetches a single client by ID."""
+    return (await db.scalars(_CLIENT_BY_ID, {"client_id": client_id})).first()
+
+async def get_clients_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    sort_by: Optional[ClientSortField] = None,
+) -> List[Client]:
+    """Fetches a list of clients with optional filtering, sorting and pagination."""
+    return (await db.scalars(_clients_query(skip, limit, name, email, sort_by))).all()
+
+async def search_clients_async(db: AsyncSession, q: str, limit: int = 20) -> List[Client]:
+    """Async search_clients."""
+    term = q.strip()
+    if not term:
+        return []
+    strategy = _search_strategy(db.get_bind().dialect.name, term)
+    if strategy == "fts":
+        ids = (await db.execute(_fts_ids_query(term, limit))).scalars().all()
+        if not ids:
+            return []
+        return _in_rank_order(ids, (await db.scalars(select(Client).where(Client.id.in_(ids)))).all())
+    query = _trgm_search_query(term, limit) if strategy == "trgm" else _prefix_search_query(term, limit)
+    return (await db.scalars(query)).all()
+
+async def get_client_by_email_async(db: AsyncSession, email: str) -> Optional[Client]:
+    """Fetches a client by email."""
+    return (await db.scalars(_CLIENT_BY_EMAIL, {"email": email})).first()
+
+async def create_client_async(db: AsyncSession, client: ClientCreate) -> Client:
+    """Creates a new client. Raises DuplicateEntryError with the offending field."""
+    db_client = Client(**client.model_dump())
+    db.add(db_client)
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        field = unique_violation_field(exc, ("email", "cpf"))
+        if field is None:
+            raise
+        raise DuplicateEntryError(field) from exc
+    await db.refresh(db_client)
+    return db_client
+
+async def update_client_async(db: AsyncSession, client_id: int, client_update: ClientUpdate) -> Optional[Client]:
+    """Updates an existing client."""
+    db_client = await get_client_async(db, client_id)
+    if not db_client:
+        return None
+    for key, value in client_update.model_dump(exclude_unset=True).items():
+        setattr(db_client, key, value)
+    await db.commit()
+    await db.refresh(db_client)
+    return db_client
+
+async def delete_client_async(db: AsyncSession, client_id: int) -> Optional[Client]:
+    """Deletes a client."""
+    db_client = await get_client_async(db, client_id)
+    if not db_client:
+        return None
+    await db.delete(db_client)
+    await db.commit()
+    return db_client
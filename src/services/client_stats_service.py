@@ -0,0 +1,76 @@
+from typing import Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from ..core.response_cache import ALL, invalidate_on_commit
+from ..models.client import Client
+from ..models.order import Order, OrderStatus
+
+# These helpers run inside the caller's transaction and do NOT commit,
+# like product_service._update_product_stock_no_commit.
+
+def _last_order_at(client_id: int, include_order_id: Optional[int] = None, exclude_order_id: Optional[int] = None):
+    """Scalar subquery: latest non-cancelled order date for a client."""
+    counted = Order.status != OrderStatus.CANCELLED
+    if include_order_id is not None:
+        counted = or_(counted, Order.id == include_order_id)
+    condition = and_(Order.client_id == client_id, counted)
+    if exclude_order_id is not None:
+        condition = and_(condition, Order.id != exclude_order_id)
+    return select(func.max(Order.created_at)).where(condition).scalar_subquery()
+
+def _update_client(db: Session, client_id: int, **values) -> None:
+    # Keep updated_at as-is: stats changes are not edits to the client record
+    invalidate_on_commit(db, "clients", f"client:{client_id}") # Core UPDATE: not seen by the ORM flush
+    db.execute(
+        update(Client).where(Client.id == client_id).values(updated_at=Client.updated_at, **values),
+        execution_options={"synchronize_session": False},
+    )
+
+def record_order_created(db: Session, client_id: int, total_value: float) -> None:
+    """Counts a newly placed order."""
+    _update_client(
+        db, client_id,
+        order_count=Client.order_count + 1,
+        lifetime_value=Client.lifetime_value + total_value,
+        last_order_at=func.now(),
+    )
+
+def record_order_removed(db: Session, order: Order) -> None:
+    """Uncounts an order that is being deleted or cancelled (call before flushing the change)."""
+    _update_client(
+        db, order.client_id,
+        order_count=Client.order_count - 1,
+        lifetime_value=Client.lifetime_value - (order.total_value or 0.0),
+        last_order_at=_last_order_at(order.client_id, exclude_order_id=order.id),
+    )
+
+def record_order_restored(db: Session, order: Order) -> None:
+    """Counts a cancelled order again when it moves back to an active status."""
+    _update_client(
+        db, order.client_id,
+        order_count=Client.order_count + 1,
+        lifetime_value=Client.lifetime_value + (order.total_value or 0.0),
+        last_order_at=_last_order_at(order.client_id, include_order_id=order.id),
+    )
+
+def rebuild_client_stats(db: Session) -> int:
+    """Recomputes the stats of every client from `orders` in one UPDATE. Returns rows updated."""
+    counted = and_(Order.client_id == Client.id, Order.status != OrderStatus.CANCELLED)
+    invalidate_on_commit(db, ALL)
+    result = db.execute(
+        update(Client).values(
+            updated_at=Client.updated_at,
+            order_count=select(func.count(Order.id)).where(counted).scalar_subquery(),
+            lifetime_value=select(func.coalesce(func.sum(Order.total_value), 0.0)).where(counted).scalar_subquery(),
+            last_order_at=select(func.max(Order.created_at)).where(counted).scalar_subquery(),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    return result.rowcount
+
+if __name__ == "__main__":
+    from ..core.database import SessionLocal
+
+    with SessionLocal() as session:
+        print(f"Rebuilt stats for {rebuild_client_stats(session)} clients.")
@@ -1,26 +1,28 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, and_, bindparam, select
+from ..core.database import hot_statement
+from ..core.response_cache import cache_tags_for
 from ..models.order import Order, OrderItem, OrderStatus
 from ..models.product import Product
 from ..schemas.order import OrderCreate, OrderUpdate, OrderItemCreate
-from .product_service import get_product, _update_product_stock_no_commit # Import product service
+from .product_service import _apply_stock_change # Import product service
+from . import client_stats_service
 from typing import List, Optional
 from datetime import datetime
 from .. import schemas # Add import for schemas
 
+cache_tags_for(Order, lambda order: ("orders", f"order:{order.id}"))
+cache_tags_for(OrderItem, lambda item: ("orders", f"order:{item.order_id}"))
+
+# Hot lookup built once at import (see product_service)
+_ORDER_BY_ID = hot_statement(select(Order).where(Order.id == bindparam("order_id")), order_id=0)
+
 def get_order(db: Session, order_id: int) -> Optional[Order]:
-    """Fetches a single order by ID, loading related items and client."""
-    return db.query(Order).options(
-        # Eager load related data to avoid N+1 queries
-        # selectinload(Order.client),
-        # selectinload(Order.items).selectinload(OrderItem.product)
-    ).filter(Order.id == order_id).first()
-    # Note: Eager loading might be complex to set up correctly with Alembic/SQLAlchemy versions.
-    # Default lazy loading will work but might be less performant for lists.
-    # For simplicity here, relying on lazy loading or explicit joins in get_orders.
+    """Fetches a single order by ID (client and items load lazily)."""
+    return db.scalars(_ORDER_BY_ID, {"order_id": order_id}).first()
 
-def get_orders(
-    db: Session,
+def _orders_query(
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[datetime] = None,
@@ -29,30 +31,42 @@ def get_orders(
     order_id: Optional[int] = None,
     status: Optional[OrderStatus] = None,
     client_id: Optional[int] = None
-) -> List[Order]:
-    """Fetches a list of orders with optional filtering and pagination."""
-    query = db.query(Order)
+):
+    """Builds the filtered order listing statement shared by the sync and async services."""
+    query = select(Order)
 
     if order_id is not None:
-        query = query.filter(Order.id == order_id)
+        query = query.where(Order.id == order_id)
     if client_id is not None:
-        query = query.filter(Order.client_id == client_id)
+        query = query.where(Order.client_id == client_id)
     if status is not None:
-        query = query.filter(Order.status == status)
+        query = query.where(Order.status == status)
     if start_date is not None:
-        query = query.filter(Order.created_at >= start_date)
+        query = query.where(Order.created_at >= start_date)
     if end_date is not None:
-        # Add 1 day to end_date to include the whole day
-        # end_date_inclusive = end_date + timedelta(days=1)
-        # query = query.filter(Order.created_at < end_date_inclusive)
-        # Simpler approach: filter up to the end of the given day
-        query = query.filter(func.date(Order.created_at) <= end_date.date())
+        # Filter up to the end of the given day
+        query = query.where(func.date(Order.created_at) <= end_date.date())
 
     if section:
         # Filter orders containing at least one product from the specified section
-        query = query.join(OrderItem).join(Product).filter(Product.section.ilike(f"%{section}%")).distinct()
+        query = query.join(OrderItem).join(Product).where(Product.section.ilike(f"%{section}%")).distinct()
 
-    return query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    return query.order_by(Order.created_at.desc()).offset(skip).limit(limit)
+
+def get_orders(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    section: Optional[str] = None,
+    order_id: Optional[int] = None,
+    status: Optional[OrderStatus] = None,
+    client_id: Optional[int] = None
+) -> List[Order]:
+    """Fetches a list of orders with optional filtering and pagination."""
+    query = _orders_query(skip, limit, start_date, end_date, section, order_id, status, client_id)
+    return db.scalars(query).all()
 
 def create_order(db: Session, order: OrderCreate) -> Order:
     """Creates a new order, validates stock, updates stock, and calculates total value."""
@@ -60,9 +74,12 @@ def create_order(db: Session, order: OrderCreate) -> Order:
     db_items = []
 
     # 1. Validate stock and calculate total value for all items first
+    # (one query for all the products, not one per item)
+    product_ids = {item_data.product_id for item_data in order.items}
+    products = {p.id: p for p in db.scalars(select(Product).where(Product.id.in_(product_ids)))}
     product_stock_updates = {}
     for item_data in order.items:
-        db_product = get_product(db, item_data.product_id)
+        db_product = products.get(item_data.product_id)
         if not db_product:
             raise ValueError(f"Product with ID {item_data.product_id} not found.")
         if db_product.current_stock < item_data.quantity:
@@ -94,10 +111,9 @@ def create_order(db: Session, order: OrderCreate) -> Order:
     # 3. Update stock for all products involved in the order
     try:
         for product_id, quantity_change in product_stock_updates.items():
-            updated_product = _update_product_stock_no_commit(db, product_id, quantity_change)
-            if updated_product is None: # Should not happen if validation passed, but check anyway
-                 raise ValueError(f"Failed to update stock for product ID {product_id}")
+            _apply_stock_change(products[product_id], quantity_change)
 
+        client_stats_service.record_order_created(db, order.client_id, total_value)
         db.commit() # Commit order creation and stock updates together
         db.refresh(db_order)
         # Eager load items after creation if needed
@@ -129,16 +145,18 @@ def update_order_status(db: Session, order_id: int, status: OrderStatus) -> Opti
         except ValueError:
             print(f"Status inválido: {status}", flush=True)
             raise ValueError(f"Status inválido: {status}")
+
+    # Keep the client's denormalized stats in step with cancellation
+    if status == OrderStatus.CANCELLED and db_order.status != OrderStatus.CANCELLED:
+        client_stats_service.record_order_removed(db, db_order)
+    elif status != OrderStatus.CANCELLED and db_order.status == OrderStatus.CANCELLED:
+        client_stats_service.record_order_restored(db, db_order)
     
     # Atualizar o status e garantir que seja persistido
     db_order.status = status
     db.add(db_order)
     db.commit()
-    db.refresh(db_order)
-    
-    # Verificar se o status foi atualizado corretamente
-    db.expire_all()  # Forçar refresh de todos os objetos na sessão
-    db_order = get_order(db, order_id)  # Buscar novamente para garantir
+    db.refresh(db_order) # Reloads server-side values such as updated_at
     
     print(f"Order {order_id} status after refresh: {db_order.status}", flush=True) # Add another debug print
     return db_order
@@ -180,7 +198,66 @@ def delete_order(db: Session, order_id: int) -> Optional[schemas.OrderRead]:
     #     # Potentially return stock
     #     pass
 
+    if db_order.status != OrderStatus.CANCELLED:
+        client_stats_service.record_order_removed(db, db_order)
     db.delete(db_order)
     db.commit()
     return order_data_before_delete # Return the captured data
 
+
+# Async versions for the AsyncSession stack (see core.database.get_async_db).
+# OrderRead nests the client and each item's product; lazy loads cannot run
+# outside the event loop, so everything it renders is loaded up front.
+_ORDER_READ_LOADS = (
+    selectinload(Order.client),
+    selectinload(Order.items).selectinload(OrderItem.product),
+)
+
+_ORDER_READ_BY_ID = hot_statement(
+    select(Order)
+    .options(*_ORDER_READ_LOADS)
+    .where(Order.id == bindparam("order_id"))
+    .execution_options(populate_existing=True),
+    order_id=0,
+)
+
+async def get_order_async(db: AsyncSession, order_id: int) -> Optional[Order]:
+    """Fetches a single order by ID with its client and items loaded."""
+    return (await db.scalars(_ORDER_READ_BY_ID, {"order_id": order_id})).first()
+
+async def get_orders_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    section: Optional[str] = None,
+    order_id: Optional[int] = None,
+    status: Optional[OrderStatus] = None,
+    client_id: Optional[int] = None
+) -> List[Order]:
+    """Fetches a list of orders with optional filtering and pagination."""
+    query = _orders_query(skip, limit, start_date, end_date, section, order_id, status, client_id)
+    return (await db.scalars(query.options(*_ORDER_READ_LOADS))).all()
+
+# The write paths (stock checks, client stats) reuse the sync implementations
+# through run_sync: they run in the session's greenlet on the async driver,
+# so they still do not hold a threadpool thread while waiting on the database.
+
+async def create_order_async(db: AsyncSession, order: OrderCreate) -> Order:
+    """Async create_order; raises ValueError on unknown products or insufficient stock."""
+    db_order = await db.run_sync(create_order, order)
+    return await get_order_async(db, db_order.id)
+
+async def update_order_async(db: AsyncSession, order_id: int, order_update: OrderUpdate) -> Optional[Order]:
+    """Async update_order."""
+    db_order = await db.run_sync(update_order, order_id, order_update)
+    if db_order is None:
+        return None
+    return await get_order_async(db, order_id)
+
+async def delete_order_async(db: AsyncSession, order_id: int) -> Optional[schemas.OrderRead]:
+    """Async delete_order; returns the order's data as it was before deletion."""
+    if await get_order_async(db, order_id) is None: # Loads what OrderRead needs
+        return None
+    return await db.run_sync(delete_order, order_id)
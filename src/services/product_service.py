@@ -1,43 +1,62 @@
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from ..core.database import hot_statement
+from ..core.response_cache import cache_tags_for
 from ..models.product import Product
 from ..schemas.product import ProductCreate, ProductUpdate
 from typing import List, Optional
 from .. import schemas # Add import for schemas
 
+# Cached responses showing a product (lists, the product, orders containing it) go stale on any write to it
+cache_tags_for(Product, lambda product: ("products", f"product:{product.id}"))
+
+# Hot lookups are built once at import: each call skips statement construction
+# and cache-key generation and goes straight to the compiled-SQL cache
+_PRODUCT_BY_ID = hot_statement(select(Product).where(Product.id == bindparam("product_id")), product_id=0)
+
 def get_product(db: Session, product_id: int) -> Optional[Product]:
     """Fetches a single product by ID."""
-    return db.query(Product).filter(Product.id == product_id).first()
+    return db.scalars(_PRODUCT_BY_ID, {"product_id": product_id}).first()
 
-def get_products(
-    db: Session,
+def _products_query(
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    # availability filter might depend on current_stock > 0
-    # available: Optional[bool] = None
-) -> List[Product]:
-    """Fetches a list of products with optional filtering and pagination."""
-    query = db.query(Product)
+):
+    """Builds the filtered product listing statement shared by the sync and async services."""
+    query = select(Product)
     if category:
-        query = query.filter(Product.section.ilike(f"%{category}%"))
+        query = query.where(Product.section.ilike(f"%{category}%"))
     if min_price is not None:
-        query = query.filter(Product.sale_value >= min_price)
+        query = query.where(Product.sale_value >= min_price)
     if max_price is not None:
-        query = query.filter(Product.sale_value <= max_price)
+        query = query.where(Product.sale_value <= max_price)
     # if available is not None:
     #     if available:
-    #         query = query.filter(Product.current_stock > 0)
+    #         query = query.where(Product.current_stock > 0)
     #     else:
-    #         query = query.filter(Product.current_stock <= 0)
+    #         query = query.where(Product.current_stock <= 0)
+    return query.offset(skip).limit(limit)
 
-    return query.offset(skip).limit(limit).all()
+def get_products(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    # availability filter might depend on current_stock > 0
+    # available: Optional[bool] = None
+) -> List[Product]:
+    """Fetches a list of products with optional filtering and pagination."""
+    return db.scalars(_products_query(skip, limit, category, min_price, max_price)).all()
 
-def create_product(db: Session, product: ProductCreate) -> Product:
-    """Creates a new product, setting current_stock equal to initial_stock."""
+def _new_product(product: ProductCreate) -> Product:
     # Pydantic handles validation based on ProductCreate schema
-    db_product = Product(
+    return Product(
         description=product.description,
         sale_value=product.sale_value,
         barcode=product.barcode,
@@ -47,6 +66,10 @@ def create_product(db: Session, product: ProductCreate) -> Product:
         validity_date=product.validity_date,
         image_urls=product.image_urls
     )
+
+def create_product(db: Session, product: ProductCreate) -> Product:
+    """Creates a new product, setting current_stock equal to initial_stock."""
+    db_product = _new_product(product)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
@@ -88,15 +111,62 @@ def _update_product_stock_no_commit(db: Session, product_id: int, quantity_chang
     db_product = get_product(db, product_id)
     if not db_product:
         return None # Indicate product not found
+    _apply_stock_change(db_product, quantity_change)
+    db.add(db_product) # Add to session to track changes
+    # NO COMMIT HERE - managed by the calling function (e.g., create_order)
+    return db_product
 
+def _apply_stock_change(db_product: Product, quantity_change: int) -> None:
+    """Applies a stock change to an already loaded product (no query, no commit)."""
     if db_product.current_stock + quantity_change < 0:
         # Depending on requirements, either raise error or clamp to 0
-        raise ValueError(f"Insufficient stock for product ID {product_id}. Available: {db_product.current_stock}, Change: {quantity_change}")
+        raise ValueError(f"Insufficient stock for product ID {db_product.id}. Available: {db_product.current_stock}, Change: {quantity_change}")
         # db_product.current_stock = 0
-    else:
-        db_product.current_stock += quantity_change
+    db_product.current_stock += quantity_change
 
-    db.add(db_product) # Add to session to track changes
-    # NO COMMIT HERE - managed by the calling function (e.g., create_order)
+
+# Async versions for the AsyncSession stack (see core.database.get_async_db)
+
+async def get_product_async(db: AsyncSession, product_id: int) -> Optional[Product]:
+    """Fetches a single product by ID."""
+    return (await db.scalars(_PRODUCT_BY_ID, {"product_id": product_id})).first()
+
+async def get_products_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> List[Product]:
+    """Fetches a list of products with optional filtering and pagination."""
+    return (await db.scalars(_products_query(skip, limit, category, min_price, max_price))).all()
+
+async def create_product_async(db: AsyncSession, product: ProductCreate) -> Product:
+    """Creates a new product, setting current_stock equal to initial_stock."""
+    db_product = _new_product(product)
+    db.add(db_product)
+    await db.commit()
+    await db.refresh(db_product)
     return db_product
 
+async def update_product_async(db: AsyncSession, product_id: int, product_update: ProductUpdate) -> Optional[Product]:
+    """Updates an existing product."""
+    db_product = await get_product_async(db, product_id)
+    if not db_product:
+        return None
+    for key, value in product_update.model_dump(exclude_unset=True).items():
+        setattr(db_product, key, value)
+    await db.commit()
+    await db.refresh(db_product)
+    return db_product
+
+async def delete_product_async(db: AsyncSession, product_id: int) -> Optional[schemas.ProductRead]:
+    """Deletes a product, returning its data as it was before deletion."""
+    db_product = await get_product_async(db, product_id)
+    if not db_product:
+        return None
+    product_data_before_delete = schemas.ProductRead.model_validate(db_product)
+    await db.delete(db_product)
+    await db.commit()
+    return product_data_before_delete
@@ -0,0 +1,89 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.refresh_token import RefreshToken
+from ..models.user import User
+
+def _hash_token(token: str) -> str:
+    # Refresh tokens are 256-bit random values, so a fast hash is enough (no bcrypt)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def issue_refresh_token(db: Session, user_id: int, token_version: int, family: Optional[str] = None) -> str:
+    """Creates and stores a new opaque refresh token. Returns the raw token (shown once).
+
+    `token_version` is the user's current users.token_version.
+    """
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family=family or uuid.uuid4().hex,
+        token_version=token_version,
+        token_hash=_hash_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    db.commit()
+    return token
+
+def revoke_family(db: Session, family: str) -> None:
+    """Deletes every refresh token of a login session."""
+    db.query(RefreshToken).filter(RefreshToken.family == family).delete(synchronize_session=False)
+    db.commit()
+
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    """Revokes the login session a refresh token belongs to. Returns False if unknown."""
+    stored = db.query(RefreshToken.family).filter(RefreshToken.token_hash == _hash_token(token)).first()
+    if stored is None:
+        return False
+    revoke_family(db, stored.family)
+    return True
+
+def rotate_refresh_token(db: Session, token: str) -> Optional[Tuple[User, str]]:
+    """Exchanges a refresh token for a new one in the same family.
+
+    Returns (user, new_token), or None if the token is unknown, expired, or the
+    user is inactive. Presenting an already rotated token is treated as theft:
+    the whole family is revoked. So is a token issued before the user's
+    token_version was bumped, which revokes refresh tokens along with the
+    access tokens.
+    """
+    now = datetime.now(timezone.utc)
+    row = (
+        db.query(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .filter(RefreshToken.token_hash == _hash_token(token))
+        .first()
+    )
+    if row is None:
+        return None
+    stored, user = row
+    if _as_aware(stored.expires_at) <= now or not user.is_active:
+        return None
+    if stored.token_version != user.token_version:
+        revoke_family(db, stored.family)
+        return None
+
+    # Conditional update so two concurrent refreshes with the same token cannot both win
+    claimed = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.id == stored.id, RefreshToken.used_at.is_(None))
+        .update({RefreshToken.used_at: now}, synchronize_session=False)
+    )
+    if not claimed:
+        db.rollback()
+        revoke_family(db, stored.family)
+        return None
+
+    db.expunge(user) # Keep the loaded columns; the commit below would otherwise expire them
+    # Drop this family's expired rows while we are here (served by the family/expires_at index)
+    db.query(RefreshToken).filter(
+        RefreshToken.family == stored.family, RefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    return user, issue_refresh_token(db, user.id, user.token_version, family=stored.family)
@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..core.bloom import BloomFilter
+from ..core.config import settings
+from ..core.metrics import REGISTRY
+from ..models.revoked_token import RevokedToken
+
+# Ids re-read behind the highest one seen: on PostgreSQL a sequence hands out ids at INSERT,
+# so a lower id can commit after a higher one the last sync already saw
+SYNC_LOOKBACK_IDS = 1000
+
+REVOCATION_BLOOM_POSITIVES = REGISTRY.counter(
+    "token_revocation_bloom_positives", "Token checks that passed the Bloom filter and hit the table", ["revoked"]
+)
+
+class TokenRevocationStore:
+    """Denylist of access token ids (jti) with an in-memory Bloom filter in front.
+
+    Most tokens are not revoked and are answered by the filter alone; only
+    Bloom-positive ids are confirmed against revoked_tokens. Each worker builds
+    the filter from the table on first use, then pulls new rows every
+    `sync_seconds` and purges expired rows (rebuilding the filter) every
+    `purge_seconds`.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_seconds: float, purge_seconds: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.purge_seconds = purge_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets all state; the next check rebuilds from the table."""
+        self._bloom = None
+        self._last_id = 0
+        self._next_sync = 0.0
+        self._next_purge = 0.0
+
+    def rebuild(self, db: Session) -> None:
+        """Purges expired rows and rebuilds the filter from what is left."""
+        with self._lock:
+            self._rebuild(db)
+
+    def _rebuild(self, db: Session) -> None:
+        # Housekeeping commits in its own short session, not in the caller's unit of work
+        with Session(bind=db.get_bind()) as purge:
+            purge.query(RevokedToken).filter(
+                RevokedToken.expires_at < datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            purge.commit()
+        rows = db.query(RevokedToken.id, RevokedToken.jti).all()
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, jti in rows:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._last_id = max((row_id for row_id, _ in rows), default=self._last_id)
+        now = time.monotonic()
+        self._next_sync = now + self.sync_seconds
+        self._next_purge = now + self.purge_seconds
+
+    def _sync(self, db: Session) -> None:
+        now = time.monotonic()
+        if self._bloom is not None and now < self._next_sync:
+            return
+        # Only one thread syncs; the others keep using the current filter
+        if not self._lock.acquire(blocking=self._bloom is None):
+            return
+        try:
+            if self._bloom is None or now >= self._next_purge or self._bloom.count > self._bloom.capacity:
+                self._rebuild(db)
+            elif now >= self._next_sync:
+                since = self._last_id - SYNC_LOOKBACK_IDS # Re-adding a jti to the filter is harmless
+                for row_id, jti in db.query(RevokedToken.id, RevokedToken.jti).filter(RevokedToken.id > since):
+                    self._bloom.add(jti)
+                    self._last_id = max(self._last_id, row_id)
+                self._next_sync = now + self.sync_seconds
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        self._sync(db)
+        if jti not in self._bloom:
+            return False
+        revoked = db.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is not None
+        REVOCATION_BLOOM_POSITIVES.inc(revoked=str(revoked).lower())
+        return revoked
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime) -> None:
+        """Adds a token id to the denylist until `expires_at` (the token's exp)."""
+        db.add(RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback() # Already revoked
+        self._sync(db)
+        self._bloom.add(jti)
+
+token_revocation_store = TokenRevocationStore(
+    settings.REVOCATION_BLOOM_CAPACITY,
+    settings.REVOCATION_BLOOM_ERROR_RATE,
+    settings.REVOCATION_SYNC_SECONDS,
+    settings.REVOCATION_PURGE_SECONDS,
+)
+
+def revoke_token_payload(db: Session, payload: dict) -> bool:
+    """Revokes the access token described by decoded claims. Returns False if it has no jti/exp."""
+    jti, exp = payload.get("jti"), payload.get("exp")
+    if not jti or not isinstance(exp, (int, float)):
+        return False
+    token_revocation_store.revoke(db, jti, datetime.fromtimestamp(exp, tz=timezone.utc))
+    return True
@@ -1,23 +1,65 @@
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from ..core.database import DuplicateEntryError, hot_statement, unique_violation_field
 from ..models.user import User
-from ..schemas.user import UserCreate
-from ..core.security import get_password_hash, verify_password
-from typing import Optional
+from ..schemas.user import UserCreate, UserUpdate
+from ..core.security import get_password_hash, verify_password, verify_password_async, user_auth_state_cache
+from fastapi.concurrency import run_in_threadpool
+from typing import NamedTuple, Optional
+
+class UserAuthState(NamedTuple):
+    """The user fields an access token is validated against."""
+    token_version: int
+    is_active: bool
+
+# Hot lookups are built once at import (see product_service)
+_USER_BY_ID = hot_statement(select(User).where(User.id == bindparam("user_id")), user_id=0)
+_USER_BY_EMAIL = hot_statement(select(User).where(User.email == bindparam("email")).limit(1), email="")
+_USER_AUTH_STATE = hot_statement(
+    select(User.token_version, User.is_active).where(User.id == bindparam("user_id")), user_id=0
+)
+
+def get_user(db: Session, user_id: int) -> Optional[User]:
+    """Fetches a user by ID."""
+    return db.scalars(_USER_BY_ID, {"user_id": user_id}).first()
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Fetches a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(_USER_BY_EMAIL, {"email": email}).first()
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Creates a new user in the database."""
-    hashed_password = get_password_hash(user.password)
+def get_user_auth_state(db: Session, user_id: int) -> Optional[UserAuthState]:
+    """Returns the user's token version and active flag, cached for AUTH_STATE_CACHE_TTL_SECONDS."""
+    state = user_auth_state_cache.get(user_id)
+    if state is None:
+        row = db.execute(_USER_AUTH_STATE, {"user_id": user_id}).first()
+        if row is None:
+            return None
+        state = UserAuthState(row.token_version, bool(row.is_active))
+        user_auth_state_cache.set(user_id, state)
+    return state
+
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> User:
+    """Creates a new user in the database.
+
+    Pass `hashed_password` when the hash was already computed (e.g. on the hashing executor).
+    Raises DuplicateEntryError if the email is already registered.
+    """
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
         is_admin=user.is_admin if user.is_admin is not None else False # Ensure default is False
     )
     db.add(db_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if unique_violation_field(exc, ("email",)) is None:
+            raise
+        raise DuplicateEntryError("email") from exc
     db.refresh(db_user)
     return db_user
 
@@ -30,3 +72,49 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
+def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
+    """Updates an existing user.
+
+    Changing the password, active flag or admin flag revokes the user's
+    existing access tokens by bumping token_version.
+    """
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return None
+
+    update_data = user_update.model_dump(exclude_unset=True)
+    password = update_data.pop("password", None)
+    revoke = password is not None
+    if password is not None:
+        db_user.hashed_password = get_password_hash(password)
+    for key, value in update_data.items():
+        if key in ("is_active", "is_admin") and getattr(db_user, key) != value:
+            revoke = True
+        setattr(db_user, key, value)
+    if revoke:
+        db_user.token_version = User.token_version + 1
+
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    user_auth_state_cache.delete(user_id)
+    return db_user
+
+def revoke_user_tokens(db: Session, user_id: int) -> bool:
+    """Invalidates every access token issued to the user. Returns False if the user does not exist."""
+    updated = db.query(User).filter(User.id == user_id).update(
+        {User.token_version: User.token_version + 1}, synchronize_session=False
+    )
+    db.commit()
+    user_auth_state_cache.delete(user_id)
+    return bool(updated)
+
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """authenticate_user for async routes: the lookup runs on the threadpool and
+    bcrypt on the dedicated hashing executor (may raise PasswordHashingBusy)."""
+    user = await run_in_threadpool(get_user_by_email, db, email)
+    if not user:
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
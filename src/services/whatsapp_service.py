@@ -1,15 +1,16 @@
 # Placeholder for WhatsApp Integration Service
 # This would contain functions to interact with a WhatsApp API provider (e.g., Twilio, Meta)
 
-import requests
 import os
-from requests.auth import HTTPBasicAuth
 
 # Example using a hypothetical WhatsApp API endpoint
 # Replace with actual provider API details
 
 def send_whatsapp_message(to_phone_number: str, message: str):
     """Sends a message to a WhatsApp number via a Twilio API."""
+    # Imported on first send: requests is slow to import and unused by the API itself
+    import requests
+    from requests.auth import HTTPBasicAuth
 
     twilio_account_sid = os.getenv("TWILIO_ACCOUNT_SID")
     twilio_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
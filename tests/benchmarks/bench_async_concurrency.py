@@ -0,0 +1,131 @@
+"""Load test: GET /products/{id} on a sync route vs the async stack under concurrency.
+
+Every statement waits --latency seconds inside the database driver (SQLite trace
+callback), standing in for network/database time. The sync route holds one
+threadpool thread per in-flight request for that wait, so its throughput stops
+growing at the threadpool size; the async route only waits on the driver.
+
+    python -m tests.benchmarks.bench_async_concurrency --threads 40 --latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import anyio.to_thread
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src import schemas
+from src.core.database import Base, get_async_db
+from src.models.product import Product
+from src.products import router as products_router
+from src.services import product_service
+
+class InFlight:
+    """Tracks how many statements are waiting on the database at once."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, statement: str) -> None:
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(self.latency)
+        with self._lock:
+            self.current -= 1
+
+def build_app(path: str, pool_size: int, in_flight: InFlight) -> FastAPI:
+    sync_engine = create_engine(
+        f"sqlite:///{path}", pool_size=pool_size, max_overflow=0, connect_args={"check_same_thread": False}
+    )
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", pool_size=pool_size, max_overflow=0, connect_args={"check_same_thread": False}
+    )
+
+    @event.listens_for(sync_engine, "connect")
+    def _sync_latency(dbapi_connection, record):
+        dbapi_connection.set_trace_callback(in_flight)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_latency(dbapi_connection, record):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(in_flight))
+
+    Base.metadata.create_all(bind=sync_engine)
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    with SyncSession() as db:
+        db.add(Product(description="Camisa", sale_value=59.9, initial_stock=10, current_stock=10))
+        db.commit()
+
+    def get_sync_db():
+        with SyncSession() as db:
+            yield db
+
+    async def get_bench_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    # The products route as it was before the async stack
+    @app.get("/sync/products/{product_id}", response_model=schemas.ProductRead)
+    def read_product_sync(product_id: int, db: Session = Depends(get_sync_db)):
+        db_product = product_service.get_product(db, product_id=product_id)
+        if db_product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return db_product
+
+    app.include_router(products_router.router, prefix="/async/products")
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+    return app
+
+async def run(app: FastAPI, url: str, concurrency: int, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get(url)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=40, help="threadpool size (Starlette default: 40)")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds each statement waits")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 160, 320])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    in_flight = InFlight(args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, "bench.db"), max(args.concurrency), in_flight)
+        print(f"threadpool={args.threads} latency={args.latency * 1000:.0f}ms requests={args.requests}")
+        print(f"{'concurrency':>12}{'sync req/s':>12}{'peak':>6}{'async req/s':>13}{'peak':>6}")
+        for concurrency in args.concurrency:
+            results = []
+            for url in ("/sync/products/1", "/async/products/1"):
+                in_flight.peak = 0
+                await run(app, url, concurrency, min(args.requests, concurrency * 2)) # Warm the pool
+                in_flight.peak = 0
+                results.append((await run(app, url, concurrency, args.requests), in_flight.peak))
+            (sync_rps, sync_peak), (async_rps, async_peak) = results
+            print(f"{concurrency:>12}{sync_rps:>12.0f}{sync_peak:>6}{async_rps:>13.0f}{async_peak:>6}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
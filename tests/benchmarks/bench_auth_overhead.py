@@ -0,0 +1,49 @@
+"""Microbenchmark: per-request auth overhead with and without the JWT claims cache.
+
+    python -m tests.benchmarks.bench_auth_overhead --iterations 20000
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.auth.dependencies import get_current_user
+from src.core.database import Base
+from src.core import security
+from src.services.user_service import UserAuthState
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    token = security.create_access_token({"sub": "bench@example.com", "uid": 1, "is_admin": False, "ver": 0})
+    # Auth state cached as in the steady state; the db only backs the (empty) revocation list
+    security.user_auth_state_cache.set(1, UserAuthState(token_version=0, is_active=True), ttl=3600)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    cases = {
+        "decode_token": lambda: security.decode_token(token),
+        "get_current_user": lambda: get_current_user(token=token, db=db),
+    }
+    original_size = security.jwt_claims_cache.maxsize
+    print(f"{'step':<20}{'uncached (us)':>16}{'cached (us)':>14}")
+    for name, fn in cases.items():
+        security.jwt_claims_cache.maxsize = 0
+        security.jwt_claims_cache.clear()
+        uncached = per_call_us(fn, args.iterations)
+        security.jwt_claims_cache.maxsize = original_size
+        cached = per_call_us(fn, args.iterations)
+        print(f"{name:<20}{uncached:>16.1f}{cached:>14.1f}")
+
+if __name__ == "__main__":
+    main()
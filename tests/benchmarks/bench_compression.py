@@ -0,0 +1,98 @@
+"""Microbenchmark: CPU cost vs. size of compressing a list page, per level.
+
+Builds the JSON body of GET /orders?limit=N (orders with their client and
+items/products) and compresses it with each gzip level and, when the brotli
+package is installed, each brotli quality. Reports the compressed size, the
+CPU time per response and the estimated transfer time on a slow mobile link
+(--link-kbps), which is what the level trades CPU for. Then times a request
+through CompressionMiddleware with the configured defaults.
+
+    python -m tests.benchmarks.bench_compression --page 100 --items 3
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from src import schemas
+from src.core import compression
+from src.core.config import settings
+from src.core.database import Base
+from src.core.responses import FastJSONResponse, dump_rows
+from src.models import Order, OrderItem
+from tests.benchmarks.bench_serialization import seed
+
+def order_page(page: int, items: int) -> bytes:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, page, items)
+        orders = db.scalars(
+            select(Order).options(selectinload(Order.client), selectinload(Order.items).selectinload(OrderItem.product))
+            .limit(page)
+        ).all()
+        return FastJSONResponse(dump_rows(schemas.OrderRead, orders)).body
+
+def per_call_ms(fn, body: bytes, iterations: int) -> float:
+    fn(body)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(body)
+    return (time.perf_counter() - start) / iterations * 1000
+
+def middleware_ms(body: bytes, accept_encoding: str, iterations: int) -> float:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    middleware = compression.CompressionMiddleware(
+        app, minimum_size=settings.COMPRESSION_MIN_SIZE, gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+    scope = {"type": "http", "method": "GET", "path": "/orders/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+
+    async def run():
+        async def send(message):
+            pass
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await middleware(scope, None, send)
+        return (time.perf_counter() - start) / iterations * 1000
+    return asyncio.run(run())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=100, help="orders in the page")
+    parser.add_argument("--items", type=int, default=3, help="items per order")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--link-kbps", type=float, default=1500, help="link speed for the transfer estimate")
+    args = parser.parse_args()
+
+    body = order_page(args.page, args.items)
+    link_bytes_per_ms = args.link_kbps * 1000 / 8 / 1000
+
+    def report(name: str, fn) -> None:
+        size = len(fn(body))
+        ms = per_call_ms(fn, body, args.iterations)
+        print(f"  {name:<14}{size / 1024:>9.1f} KiB{len(body) / size:>7.1f}x{ms:>9.2f} ms{size / link_bytes_per_ms:>11.0f} ms")
+
+    print(f"GET /orders?limit={args.page}: {len(body) / 1024:.1f} KiB of JSON ({args.link_kbps:.0f} kbps link)")
+    print(f"  {'encoding':<14}{'size':>13}{'ratio':>8}{'cpu':>12}{'transfer':>14}")
+    report("identity", lambda data: data)
+    for level in range(1, 10):
+        report(f"gzip {level}", lambda data, level=level: compression.ENCODERS["gzip"](data, level))
+    if "br" in compression.ENCODERS:
+        for quality in range(0, 12):
+            report(f"br {quality}", lambda data, quality=quality: compression.ENCODERS["br"](data, quality))
+    else:
+        print("  (brotli not installed)")
+
+    print("\nThrough CompressionMiddleware (configured defaults):")
+    for accept_encoding in ("identity", "gzip", "br, gzip"):
+        print(f"  Accept-Encoding: {accept_encoding:<12}{middleware_ms(body, accept_encoding, args.iterations):>8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Microbenchmark: per-call latency of the hot single-row lookups.
+
+Each lookup runs in its previous form (a `db.query(...).filter(...)` built per
+call) and through the service function (statement prebuilt at import). The
+identity map is cleared between calls so every call loads the row, as a fresh
+request would. --profile prints the top functions for one lookup.
+
+    python -m tests.benchmarks.bench_lookups --iterations 5000
+    python -m tests.benchmarks.bench_lookups --profile get_user_by_email
+"""
+import argparse
+import asyncio
+import cProfile
+import pstats
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.core.database import Base
+from src.models import Client, Order, OrderItem, Product, User
+from src.services import client_service, order_service, product_service, user_service
+
+def per_call_us(fn, db, iterations: int) -> float:
+    fn() # Warm the compiled cache
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+        db.expunge_all()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+async def per_call_us_async(fn, db, iterations: int) -> float:
+    await fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+        db.expunge_all()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def seed(db) -> None:
+    client = Client(name="Maria", email="maria@example.com", cpf="52998224725")
+    product = Product(description="Camisa", sale_value=59.9, initial_stock=10, current_stock=10)
+    db.add_all([User(email="bench@example.com", hashed_password="x"), client, product])
+    db.flush()
+    order = Order(client_id=client.id, total_value=59.9)
+    order.items.append(OrderItem(product_id=product.id, quantity=1, unit_price=59.9))
+    db.add(order)
+    db.commit()
+
+def sync_cases(db) -> dict:
+    """{name: (previous form, service function)}"""
+    return {
+        "get_product": (
+            lambda: db.query(Product).filter(Product.id == 1).first(),
+            lambda: product_service.get_product(db, 1),
+        ),
+        "get_client": (
+            lambda: db.query(Client).filter(Client.id == 1).first(),
+            lambda: client_service.get_client(db, 1),
+        ),
+        "get_user_by_email": (
+            lambda: db.query(User).filter(User.email == "bench@example.com").first(),
+            lambda: user_service.get_user_by_email(db, "bench@example.com"),
+        ),
+        "get_order": (
+            lambda: db.query(Order).filter(Order.id == 1).first(),
+            lambda: order_service.get_order(db, 1),
+        ),
+    }
+
+async def async_rows(iterations: int) -> list:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        await db.run_sync(seed)
+        cases = {
+            "get_product_async": (
+                lambda: db.get(Product, 1),
+                lambda: product_service.get_product_async(db, 1),
+            ),
+            "get_client_async": (
+                lambda: db.get(Client, 1),
+                lambda: client_service.get_client_async(db, 1),
+            ),
+            "get_order_async": (
+                lambda: db.scalar(
+                    select(Order).options(*order_service._ORDER_READ_LOADS).where(Order.id == 1)
+                    .execution_options(populate_existing=True)
+                ),
+                lambda: order_service.get_order_async(db, 1),
+            ),
+        }
+        rows = []
+        for name, (before, after) in cases.items():
+            rows.append((name, await per_call_us_async(before, db, iterations), await per_call_us_async(after, db, iterations)))
+    await engine.dispose()
+    return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5_000)
+    parser.add_argument("--profile", metavar="LOOKUP", help="profile the previous and current form of one sync lookup")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db)
+    cases = sync_cases(db)
+
+    if args.profile:
+        for label, fn in zip(("previous", "current"), cases[args.profile]):
+            print(f"--- {args.profile} ({label})")
+            profiler = cProfile.Profile()
+            profiler.runcall(per_call_us, fn, db, args.iterations)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(12)
+        return
+
+    rows = [(name, per_call_us(before, db, args.iterations), per_call_us(after, db, args.iterations))
+            for name, (before, after) in cases.items()]
+    rows += asyncio.run(async_rows(args.iterations))
+    print(f"{'lookup':<22}{'previous (us)':>15}{'current (us)':>14}{'speedup':>9}")
+    for name, before, after in rows:
+        print(f"{name:<22}{before:>15.1f}{after:>14.1f}{before / after:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
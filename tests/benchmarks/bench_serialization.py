@@ -0,0 +1,95 @@
+"""Microbenchmark: time to turn one list page of ORM rows into the JSON response body.
+
+Loads a page of orders (each with its client and items/products, as
+GET /orders/ does) and of products, then times:
+
+- response_model: FastAPI's path, validating the rows into the schema
+  (from_attributes) and dumping the models with Pydantic
+- dump_rows+orjson: dump_rows() + FastJSONResponse (the routes' fast path)
+- dump_rows+json: the same with the stdlib fallback (orjson not installed)
+
+    python -m tests.benchmarks.bench_serialization --page 100 --items 3
+"""
+import argparse
+import time
+from datetime import date
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from src import schemas
+from src.core import responses
+from src.core.database import Base
+from src.models import Client, Order, OrderItem, Product
+
+def seed(db: Session, page: int, items: int) -> None:
+    products = [
+        Product(description=f"Produto {i}", sale_value=19.9 + i, section="Camisas", barcode=f"789{i:010d}",
+                initial_stock=100, current_stock=90, validity_date=date(2030, 1, 1))
+        for i in range(max(items, page))
+    ]
+    clients = [Client(name=f"Cliente {i}", email=f"c{i}@example.com", cpf=f"{i:011d}", phone="11999998888") for i in range(10)]
+    db.add_all(products + clients)
+    db.flush()
+    for i in range(page):
+        order = Order(client_id=clients[i % len(clients)].id, total_value=100.0)
+        for j in range(items):
+            order.items.append(OrderItem(product_id=products[(i + j) % len(products)].id, quantity=2, unit_price=20.0))
+        db.add(order)
+    db.commit()
+
+def per_page_us(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def cases(model, rows) -> dict:
+    adapter = TypeAdapter(List[model])
+    orjson = responses.orjson
+
+    def stdlib():
+        responses.orjson = None
+        try:
+            return responses.FastJSONResponse(responses.dump_rows(model, rows)).body
+        finally:
+            responses.orjson = orjson
+
+    result = {
+        "response_model": lambda: adapter.dump_json(adapter.validate_python(rows)),
+        "dump_rows+json": stdlib,
+    }
+    if orjson is not None:
+        result["dump_rows+orjson"] = lambda: responses.FastJSONResponse(responses.dump_rows(model, rows)).body
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=100, help="rows per page")
+    parser.add_argument("--items", type=int, default=3, help="items per order")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, args.page, args.items)
+        orders = db.scalars(
+            select(Order).options(selectinload(Order.client), selectinload(Order.items).selectinload(OrderItem.product))
+            .limit(args.page)
+        ).all()
+        products = db.scalars(select(Product).limit(args.page)).all()
+
+        for label, model, rows in (("orders", schemas.OrderRead, orders), ("products", schemas.ProductRead, products)):
+            timings = {name: per_page_us(fn, args.iterations) for name, fn in cases(model, rows).items()}
+            base = timings["response_model"]
+            print(f"{label} page ({len(rows)} rows):")
+            for name, us in timings.items():
+                print(f"  {name:<20}{us / 1000:>8.2f} ms{base / us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Startup benchmark: import time, time-to-first-200 and cold vs warm request latency.
+
+Starts `uvicorn src.main:app` on a temporary SQLite database (with and without
+the lifespan warmup) and reports:
+
+- import: seconds to `import src.main` in a fresh interpreter (median of --imports runs)
+- listening: seconds from spawning the server until it accepts connections (after the lifespan)
+- first 200: seconds from spawning the server to the first 200 from GET /products/{id}
+- cold/warm: latency of the first request to each route vs the median of later ones
+
+    python -m tests.benchmarks.bench_startup --runs 3
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.core.database import Base
+from src.models import Product
+
+ROUTES = ("/products/1", "/products/", "/api/v1/openapi.json")
+
+def import_seconds(runs: int) -> float:
+    code = "import time; t = time.perf_counter(); import src.main; print(time.perf_counter() - t)"
+    samples = [float(subprocess.check_output([sys.executable, "-c", code], env=_env({}))) for _ in range(runs)]
+    return statistics.median(samples)
+
+def _env(extra: dict) -> dict:
+    env = {**os.environ, "PYTHONPATH": os.getcwd(), **extra}
+    env.pop("SENTRY_DSN", None)
+    return env
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+def _timed_get(url: str) -> float:
+    start = time.perf_counter()
+    _get(url)
+    return time.perf_counter() - start
+
+def serve_once(database_url: str, warmup: bool) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = _env({"DATABASE_URL": database_url, "STARTUP_WARMUP": str(warmup).lower(), "RATE_LIMIT_ENABLED": "false"})
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.005) # Not listening yet
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+        result = {"listening": time.perf_counter() - start}
+        result[f"cold {ROUTES[0]}"] = _timed_get(base + ROUTES[0])
+        result["first 200"] = time.perf_counter() - start
+        for route in ROUTES[1:]:
+            result[f"cold {route}"] = _timed_get(base + route)
+        for route in ROUTES:
+            result[f"warm {route}"] = statistics.median(_timed_get(base + route) for _ in range(20))
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="server starts per configuration")
+    parser.add_argument("--imports", type=int, default=5, help="fresh interpreters for the import timing")
+    args = parser.parse_args()
+
+    print(f"import src.main: {import_seconds(args.imports) * 1000:.0f} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        engine = create_engine(database_url)
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            db.add(Product(description="Camisa", sale_value=59.9, initial_stock=10, current_stock=10))
+            db.commit()
+        engine.dispose()
+
+        for warmup in (False, True):
+            runs = [serve_once(database_url, warmup) for _ in range(args.runs)]
+            print(f"\nSTARTUP_WARMUP={str(warmup).lower()} (median of {args.runs} starts)")
+            for name in runs[0]:
+                print(f"  {name:<28}{statistics.median(run[name] for run in runs) * 1000:>9.1f} ms")
+
+if __name__ == "__main__":
+    main()
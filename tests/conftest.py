@@ -1,34 +1,73 @@
+import sqlite3
+from contextlib import contextmanager
+
+import aiosqlite
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
 from src.main import app
-from src.core.database import Base, get_db
+from src.core.config import settings
+from src.core.database import Base, async_session_scope, get_async_db, get_batch_db, get_db, session_scope
 from src.models import User # Import User model
-from src.core.security import get_password_hash # Import hashing function
+from src.core.security import get_password_hash, user_auth_state_cache # Import hashing function
+from src.services.token_revocation_service import token_revocation_store
+from src.core.rate_limit import rate_limiter
+from src.core.query_stats import instrument_queries
+from src.core.response_cache import response_cache
+
+# Repeated SELECTs within one request fail the test instead of logging a warning
+settings.SQL_N_PLUS_ONE_RAISE = True
+# The lifespan would warm the configured (unreachable) database; tests use their own engines
+settings.STARTUP_WARMUP = False
 
 # Use an in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
+# The sync and async engines wrap the same connection, so both stacks (and the
+# db_session fixture) see one database and one transaction state
+_connection = sqlite3.connect(":memory:", check_same_thread=False)
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}, # Needed only for SQLite
+    creator=lambda: _connection,
     poolclass=StaticPool, # Use StaticPool for SQLite in-memory
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async def _async_connect():
+    return await aiosqlite.Connection(lambda: _connection, iter_chunk_size=64)
+
+async_engine = create_async_engine("sqlite+aiosqlite://", async_creator=_async_connect, poolclass=StaticPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+instrument_queries(engine)
+instrument_queries(async_engine.sync_engine)
+
 # Dependency override for testing database
 def override_get_db():
     """Override get_db dependency to use the testing database session."""
+    with session_scope(TestingSessionLocal) as db:
+        yield db
+
+async def override_get_async_db():
+    """Override get_async_db dependency to use the testing database."""
+    async with async_session_scope(TestingAsyncSessionLocal) as db:
+        yield db
+
+def override_get_batch_db():
+    """Override get_batch_db dependency to use the testing database session."""
+    db = TestingSessionLocal()
     try:
-        db = TestingSessionLocal()
         yield db
     finally:
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_batch_db] = override_get_batch_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
@@ -53,7 +92,37 @@ def clean_db_tables():
         for table in table_names:
             connection.execute(text(f"DELETE FROM {table.name}"))
         transaction.commit()
+    # SQLite reuses user ids, so cached auth state must not outlive the test
+    user_auth_state_cache.clear()
+    token_revocation_store.reset()
+    rate_limiter.store.reset()
+    response_cache.clear() # Rows were deleted behind the ORM's back
+
+
+@pytest.fixture
+def query_budget():
+    """Fails the test if a block runs more than `max_queries` statements on the test database.
 
+        with query_budget(3):
+            client.get("/orders/1", headers=auth_headers)
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        statements = []
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+        targets = (engine, async_engine.sync_engine)
+        for target in targets:
+            event.listen(target, "after_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            for target in targets:
+                event.remove(target, "after_cursor_execute", listener)
+        assert len(statements) <= max_queries, (
+            f"{len(statements)} queries, budget {max_queries}:\n" + "\n".join(" ".join(s.split()) for s in statements)
+        )
+    return budget
 
 @pytest.fixture(scope="module")
 def client() -> TestClient:
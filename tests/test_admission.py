@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.core import admission
+
+def test_parse_admission_settings():
+    """Test the ADMISSION_LIMITS / ADMISSION_ROUTE_CLASSES formats and route classification."""
+    limits = admission.parse_class_limits("read=8/16@2; import=1/0@30")
+    assert limits["read"] == admission.ClassLimit("read", 8, 16, 2.0)
+    assert limits["import"] == admission.ClassLimit("import", 1, 0, 30.0)
+    with pytest.raises(ValueError):
+        admission.parse_class_limits("read=0/1@1")
+
+    controller = admission.AdmissionController(
+        limits, admission.parse_route_classes("* /auth=import;GET /metrics=none")
+    )
+    assert controller.class_for("POST", "/auth/login").name == "import"
+    assert controller.class_for("GET", "/authors").name == "read" # Prefixes match whole segments
+    assert controller.class_for("GET", "/products/1").name == "read"
+    assert controller.class_for("GET", "/metrics") is None
+    assert controller.class_for("PUT", "/products/1") is None # No "write" class configured
+
+def _limited_app(limit: str):
+    """App whose /slow requests block until `release` is set, behind AdmissionMiddleware."""
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return JSONResponse({"ok": True})
+
+    controller = admission.AdmissionController(admission.parse_class_limits(limit), [])
+    app = admission.AdmissionMiddleware(Starlette(routes=[Route("/slow", slow)]), controller)
+    return app, controller.classes["read"], release
+
+def test_excess_requests_shed_with_retry_after():
+    """Test that requests beyond the slots and the queue get 503 + Retry-After, and queued ones run."""
+    async def run():
+        app, read, release = _limited_app("read=2/2@5")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            requests = [asyncio.create_task(client.get("/slow")) for _ in range(4)]
+            while read.queued < 2:
+                await asyncio.sleep(0.001)
+            assert read.active == 2
+            assert admission.ADMISSION_QUEUE_DEPTH.value(route_class="read") == 2
+
+            shed = await client.get("/slow")
+            assert shed.status_code == 503
+            assert int(shed.headers["retry-after"]) >= 1
+
+            release.set()
+            assert [response.status_code for response in await asyncio.gather(*requests)] == [200] * 4
+        assert (read.active, read.queued) == (0, 0)
+
+    before = admission.ADMISSION_SHED.value(route_class="read", reason="queue_full")
+    asyncio.run(run())
+    assert admission.ADMISSION_SHED.value(route_class="read", reason="queue_full") == before + 1
+
+def test_queued_request_shed_at_deadline():
+    """Test that a request still queued after max_wait is shed and leaves the queue."""
+    async def run():
+        app, read, release = _limited_app("read=1/4@0.05")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            running = asyncio.create_task(client.get("/slow"))
+            while read.active < 1:
+                await asyncio.sleep(0.001)
+            response = await client.get("/slow")
+            assert response.status_code == 503
+            assert read.queued == 0
+            release.set()
+            assert (await running).status_code == 200
+        assert read.active == 0
+
+    before = admission.ADMISSION_SHED.value(route_class="read", reason="timeout")
+    asyncio.run(run())
+    assert admission.ADMISSION_SHED.value(route_class="read", reason="timeout") == before + 1
+
+def test_metrics_exposed(client: TestClient):
+    """Test that the app is behind admission control and reports it on /metrics."""
+    assert client.get("/products/").status_code == 200
+    text = client.get("/metrics").text
+    assert 'admission_in_flight{route_class="read"} 0' in text
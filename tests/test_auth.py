@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from src import schemas
 from src.services import user_service
 from src.models import User
+from src.core import security
 
 # Test user registration
 def test_register_user(client: TestClient, db_session: Session):
@@ -58,12 +59,259 @@ def test_login_nonexistent_user(client: TestClient):
     assert response.status_code == 401
     assert "Incorrect email or password" in response.json()["detail"]
 
-# Test refresh token endpoint (currently placeholder)
-def test_refresh_token_not_implemented(client: TestClient):
-    """Test the refresh token endpoint which is not implemented."""
-    # This test assumes no valid refresh token mechanism is in place yet
-    response = client.post("/auth/refresh-token")
-    assert response.status_code == 501 # Or 404 if route doesn't exist, but we defined it
-    assert "not fully implemented" in response.json()["detail"]
+# Test claims-based principal resolution
+def test_authenticated_request_skips_user_query(client: TestClient, auth_headers: dict):
+    """Test that a cached principal needs no users-table query."""
+    from sqlalchemy import event
+    from tests.conftest import async_engine, engine
+    client.get("/clients/", headers=auth_headers) # Warm the auth state cache
 
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        response = client.get("/clients/?limit=50", headers=auth_headers) # Not in the response cache
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert statements and not any("users" in s for s in statements)
+
+def test_deactivated_user_rejected(client: TestClient, db_session: Session, test_user: User, auth_headers: dict):
+    """Test that deactivating a user takes effect for existing tokens."""
+    assert client.get("/clients/", headers=auth_headers).status_code == 200
+    user_service.update_user(db_session, test_user.id, schemas.UserUpdate(is_active=False))
+    response = client.get("/clients/", headers=auth_headers)
+    assert response.status_code in (400, 401)
+
+def test_revoked_tokens_rejected(client: TestClient, db_session: Session, test_user: User, auth_headers: dict):
+    """Test that bumping the token version invalidates previously issued tokens."""
+    assert user_service.revoke_user_tokens(db_session, test_user.id)
+    response = client.get("/clients/", headers=auth_headers)
+    assert response.status_code == 401
+
+    login_data = {"username": test_user.email, "password": "testpassword"}
+    token = client.post("/auth/login", data=login_data).json()["access_token"]
+    assert client.get("/clients/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+def test_decode_token_memoized():
+    """Test that verified claims are cached by token digest and expired tokens are not served."""
+    from datetime import timedelta
+    security.jwt_claims_cache.clear()
+    token = security.create_access_token({"sub": "cache@example.com"})
+    assert security.decode_token(token)["sub"] == "cache@example.com"
+    payload = security.decode_token(token)
+    payload["sub"] = "tampered" # Callers get a copy, not the cached dict
+    assert security.decode_token(token)["sub"] == "cache@example.com"
+    assert security.jwt_claims_cache.hits == 2
+
+    expired = security.create_access_token({"sub": "cache@example.com"}, expires_delta=timedelta(seconds=-1))
+    assert security.decode_token(expired) is None
+    assert security.decode_token(token + "x") is None
+
+def test_login_shed_when_hashing_saturated(client: TestClient, test_user: User, monkeypatch):
+    """Test that logins beyond the hashing executor's capacity get a 503 with Retry-After."""
+    import threading
+    hasher = security.PasswordHashExecutor(workers=1, max_queue=0)
+    monkeypatch.setattr(security, "_password_hasher", hasher)
+    release = threading.Event()
+    blocker = hasher.submit("verify", release.wait) # Occupies the only worker
+    try:
+        response = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert security.PASSWORD_HASH_REJECTED.value(op="verify") >= 1
+    finally:
+        release.set()
+        blocker.result()
+    response = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"})
+    assert response.status_code == 200
+    hasher.shutdown()
+
+def test_password_hash_metrics(client: TestClient, test_user: User):
+    """Test that hashing latency and queue depth are exposed on /metrics."""
+    client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'password_hash_seconds_count{op="verify"}' in response.text
+    assert "password_hash_queue_depth 0" in response.text
+
+def test_login_rate_limited_before_hashing(client: TestClient, test_user: User, monkeypatch):
+    """Test that logins over the per-IP bucket get a 429 without running bcrypt."""
+    for _ in range(10):
+        client.post("/auth/login", data={"username": test_user.email, "password": "wrong"})
+    calls = []
+    monkeypatch.setattr(security, "verify_password", lambda *args: calls.append(args) or True)
+    response = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert calls == []
+
+def test_rate_limit_per_user(client: TestClient, auth_headers: dict, admin_auth_headers: dict, monkeypatch):
+    """Test that user-scoped buckets are keyed by the token's user, not shared."""
+    from src.core.rate_limit import parse_rate_limit_rules, rate_limiter
+    monkeypatch.setattr(rate_limiter, "_rules", rate_limiter._rules)
+    rate_limiter.set_rules(parse_rate_limit_rules("GET /clients/=2/60@user"))
+    assert client.get("/clients/", headers=auth_headers).status_code == 200
+    assert client.get("/clients/", headers=auth_headers).status_code == 200
+    assert client.get("/clients/", headers=auth_headers).status_code == 429
+    assert client.get("/clients/", headers=admin_auth_headers).status_code == 200
+
+def test_parse_rate_limit_rules():
+    from src.core.rate_limit import RateLimitRule, parse_rate_limit_rules
+    assert parse_rate_limit_rules("post /orders/=30/60@user; POST /auth/login=10/60") == [
+        RateLimitRule("POST", "/orders", 30, 60.0, "user"),
+        RateLimitRule("POST", "/auth/login", 10, 60.0, "ip"),
+    ]
+    with pytest.raises(ValueError):
+        parse_rate_limit_rules("POST /orders=1/1@tenant")
+
+# Test refresh tokens
+def test_refresh_token_rotation(client: TestClient, test_user: User):
+    """Test exchanging a refresh token for a new access token and rotated refresh token."""
+    login = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"}).json()
+    assert login["refresh_token"]
+
+    response = client.post("/auth/refresh-token", json={"refresh_token": login["refresh_token"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refresh_token"] != login["refresh_token"]
+    assert client.get("/clients/", headers={"Authorization": f"Bearer {data['access_token']}"}).status_code == 200
+
+    # The rotated token can be used once more in turn
+    response = client.post("/auth/refresh-token", json={"refresh_token": data["refresh_token"]})
+    assert response.status_code == 200
+
+def test_refresh_token_reuse_revokes_family(client: TestClient, test_user: User):
+    """Test that presenting an already rotated refresh token revokes the session."""
+    login = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"}).json()
+    rotated = client.post("/auth/refresh-token", json={"refresh_token": login["refresh_token"]}).json()
+
+    reuse = client.post("/auth/refresh-token", json={"refresh_token": login["refresh_token"]})
+    assert reuse.status_code == 401
+    # The legitimate latest token is revoked too
+    response = client.post("/auth/refresh-token", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+def test_token_version_bump_ends_refresh_sessions(client: TestClient, db_session: Session, test_user: User):
+    """Test that revoking a user's tokens or changing the password also ends their refresh tokens."""
+    first = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"}).json()
+    second = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"}).json()
+
+    assert user_service.revoke_user_tokens(db_session, test_user.id)
+    response = client.post("/auth/refresh-token", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 401
+
+    user_service.update_user(db_session, test_user.id, schemas.UserUpdate(password="newpassword"))
+    response = client.post("/auth/refresh-token", json={"refresh_token": second["refresh_token"]})
+    assert response.status_code == 401
+
+    # A login after the bump gets a working refresh token
+    login = client.post("/auth/login", data={"username": test_user.email, "password": "newpassword"}).json()
+    assert client.post("/auth/refresh-token", json={"refresh_token": login["refresh_token"]}).status_code == 200
+
+def test_refresh_token_invalid(client: TestClient):
+    """Test refreshing with an unknown token."""
+    response = client.post("/auth/refresh-token", json={"refresh_token": "not-a-real-token"})
+    assert response.status_code == 401
+    assert "Invalid or expired refresh token" in response.json()["detail"]
+
+# Test token revocation
+def test_logout_revokes_tokens(client: TestClient, test_user: User):
+    """Test that logout revokes the access token and the refresh token's session."""
+    login = client.post("/auth/login", data={"username": test_user.email, "password": "testpassword"}).json()
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert client.get("/clients/", headers=headers).status_code == 200
+
+    response = client.post("/auth/logout", json={"refresh_token": login["refresh_token"]}, headers=headers)
+    assert response.status_code == 204
+    assert client.get("/clients/", headers=headers).status_code == 401
+    assert client.post("/auth/refresh-token", json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+def test_admin_revokes_token(client: TestClient, auth_headers: dict, admin_auth_headers: dict):
+    """Test revoking another user's access token as an admin."""
+    token = auth_headers["Authorization"].split()[1]
+    assert client.post("/auth/revoke", json={"token": token}, headers=auth_headers).status_code == 403
+
+    response = client.post("/auth/revoke", json={"token": token}, headers=admin_auth_headers)
+    assert response.status_code == 204
+    assert client.get("/clients/", headers=auth_headers).status_code == 401
+    assert client.get("/clients/", headers=admin_auth_headers).status_code == 200
+
+def test_revocation_synced_from_table(client: TestClient, db_session: Session, auth_headers: dict):
+    """Test that revocations written by another worker are picked up on the next sync."""
+    from datetime import datetime, timedelta, timezone
+    from src.core.security import decode_token
+    from src.models import RevokedToken
+    from src.services.token_revocation_service import token_revocation_store
+    assert client.get("/clients/", headers=auth_headers).status_code == 200 # Builds the filter
+
+    jti = decode_token(auth_headers["Authorization"].split()[1])["jti"]
+    db_session.add(RevokedToken(jti=jti, expires_at=datetime.now(timezone.utc) + timedelta(minutes=5)))
+    db_session.commit()
+    token_revocation_store._next_sync = 0 # Sync interval elapsed
+    assert client.get("/clients/", headers=auth_headers).status_code == 401
+
+def test_revocation_committed_out_of_id_order(client: TestClient, db_session: Session, auth_headers: dict):
+    """Test that a row whose lower id commits after a higher one is still picked up by the sync."""
+    from datetime import datetime, timedelta, timezone
+    from src.core.security import decode_token
+    from src.models import RevokedToken
+    from src.services.token_revocation_service import token_revocation_store
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    db_session.add(RevokedToken(id=50, jti="f" * 32, expires_at=expires_at)) # Committed first
+    db_session.commit()
+    assert client.get("/clients/", headers=auth_headers).status_code == 200 # Filter built, last id 50
+
+    jti = decode_token(auth_headers["Authorization"].split()[1])["jti"]
+    db_session.add(RevokedToken(id=40, jti=jti, expires_at=expires_at)) # Id allocated earlier, committed later
+    db_session.commit()
+    token_revocation_store._next_sync = 0
+    assert client.get("/clients/", headers=auth_headers).status_code == 401
+
+def test_revocation_purge_outside_request_unit_of_work(db_session: Session):
+    """Test that purging expired revocations does not ask the caller's session to commit."""
+    from datetime import datetime, timedelta, timezone
+    from src.core.database import RequestSession
+    from src.models import RevokedToken
+    from src.services.token_revocation_service import token_revocation_store
+    from tests.conftest import TestingSessionLocal
+    db_session.add(RevokedToken(jti="e" * 32, expires_at=datetime.now(timezone.utc) - timedelta(minutes=5)))
+    db_session.commit()
+
+    request_db = RequestSession(TestingSessionLocal)
+    try:
+        assert not token_revocation_store.is_revoked(request_db, "0" * 32) # First use: rebuild + purge
+        assert not request_db.commit_requested
+    finally:
+        request_db.close()
+    assert db_session.query(RevokedToken).count() == 0
+
+def test_unrevoked_token_skips_revocation_table(client: TestClient, auth_headers: dict):
+    """Test that Bloom-negative tokens are answered without querying revoked_tokens."""
+    from sqlalchemy import event
+    from tests.conftest import engine
+    client.get("/clients/", headers=auth_headers)
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/clients/", headers=auth_headers).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert not any("revoked_tokens" in s for s in statements)
 
+def test_bloom_filter():
+    """Test Bloom filter membership and its false-positive rate."""
+    from src.core.bloom import BloomFilter
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"token-{i}")
+    assert all(f"token-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300 # ~1% expected
@@ -1,9 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, text
 from sqlalchemy.orm import Session
 
 from src import schemas
 from src.services import client_service
+from src.core.database import DuplicateEntryError
 from src.models import Client, User # Import User for auth dependency
 
 # Test client creation
@@ -51,6 +53,40 @@ def test_create_client_duplicate_cpf(client: TestClient, db_session: Session, au
     assert response.status_code == 400
     assert "CPF already registered" in response.json()["detail"]
 
+def test_create_client_duplicate_detected_by_constraint(db_session: Session):
+    """Test that the service maps unique-constraint violations and leaves the session usable."""
+    client_service.create_client(db_session, schemas.ClientCreate(name="First", email="first@example.com", cpf="13131313131"))
+    with pytest.raises(DuplicateEntryError) as exc_info:
+        client_service.create_client(db_session, schemas.ClientCreate(name="Second", email="second@example.com", cpf="13131313131"))
+    assert exc_info.value.field == "cpf"
+    assert client_service.get_client_by_email(db_session, "first@example.com") is not None
+
+def test_unique_violation_field_from_asyncpg_error():
+    """Test that asyncpg-shaped errors (no .diag, driver error as __cause__) are mapped too."""
+    from sqlalchemy.exc import IntegrityError
+    from src.core.database import unique_violation_field
+
+    class UniqueViolationError(Exception): # asyncpg.exceptions.UniqueViolationError's attributes
+        def __init__(self, constraint_name, detail):
+            super().__init__(f'duplicate key value violates unique constraint "{constraint_name}"')
+            self.constraint_name = constraint_name
+            self.detail = detail
+            self.sqlstate = "23505"
+
+    def adapted(driver_error, with_attributes=True):
+        if not with_attributes: # Only the message survives
+            driver_error.constraint_name = driver_error.detail = None
+        orig = Exception(f"<class 'asyncpg.exceptions.UniqueViolationError'>: {driver_error}")
+        orig.__cause__ = driver_error
+        return IntegrityError("INSERT INTO clients ...", {}, orig)
+
+    email = UniqueViolationError("ix_clients_email", "Key (email)=(a@example.com) already exists.")
+    assert unique_violation_field(adapted(email), ("email", "cpf")) == "email"
+    cpf = UniqueViolationError("ix_clients_cpf", "Key (cpf)=(13131313131) already exists.")
+    assert unique_violation_field(adapted(cpf), ("email", "cpf")) == "cpf"
+    cpf = UniqueViolationError("ix_clients_cpf", None)
+    assert unique_violation_field(adapted(cpf, with_attributes=False), ("email", "cpf")) == "cpf"
+
 def test_create_client_invalid_cpf_format(client: TestClient, auth_headers: dict):
     """Test creating a client with an invalid CPF format."""
     client_data = {"name": "Invalid CPF Client", "email": "invalidcpf@example.com", "cpf": "12345"}
@@ -93,6 +129,23 @@ def test_read_clients_filtered(client: TestClient, db_session: Session, auth_hea
     assert len(data_email) == 1
     assert data_email[0]["email"] == "david@filter.com"
 
+def test_read_clients_sorted_by_stats(client: TestClient, db_session: Session, auth_headers: dict):
+    """Test sorting clients by a denormalized stat and including the stats."""
+    low = client_service.create_client(db_session, schemas.ClientCreate(name="Low Spender", email="low@example.com", cpf="21212121212"))
+    high = client_service.create_client(db_session, schemas.ClientCreate(name="High Spender", email="high@example.com", cpf="31313131313"))
+    low.lifetime_value, high.lifetime_value = 10.0, 500.0
+    db_session.commit()
+
+    response = client.get("/clients/?sort_by=lifetime_value&include_stats=true", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["id"] for c in data] == [high.id, low.id]
+    assert data[0]["stats"]["lifetime_value"] == 500.0
+
+    response = client.get("/clients/", headers=auth_headers) # Stats are opt-in
+    assert all(c["stats"] is None for c in response.json())
+    assert client.get("/clients/?sort_by=name", headers=auth_headers).status_code == 422
+
 def test_read_specific_client(client: TestClient, db_session: Session, auth_headers: dict):
     """Test reading a specific client by ID."""
     created_client = client_service.create_client(db_session, schemas.ClientCreate(name="Specific Client", email="specific@example.com", cpf="50505050505"))
@@ -168,3 +221,164 @@ def test_delete_nonexistent_client(client: TestClient, auth_headers: dict):
     assert response.status_code == 404
     assert "Client not found" in response.json()["detail"]
 
+
+# Test client search
+def test_search_clients(client: TestClient, db_session: Session, auth_headers: dict):
+    """Test searching clients by name, email prefix, CPF digits and phone."""
+    client_service.create_client(db_session, schemas.ClientCreate(name="Mariana Souza", email="mariana@search.com", cpf="12312312312", phone="11987654321"))
+    client_service.create_client(db_session, schemas.ClientCreate(name="Marcos Lima", email="marcos@search.com", cpf="45645645645"))
+
+    response = client.get("/clients/search?q=souza", headers=auth_headers)
+    assert response.status_code == 200
+    assert [c["name"] for c in response.json()] == ["Mariana Souza"]
+
+    response = client.get("/clients/search?q=mar", headers=auth_headers)
+    assert {c["name"] for c in response.json()} == {"Mariana Souza", "Marcos Lima"}
+
+    response = client.get("/clients/search?q=ma", headers=auth_headers) # Too short for trigrams
+    assert len(response.json()) == 2
+
+    response = client.get("/clients/search?q=4564564", headers=auth_headers)
+    assert [c["name"] for c in response.json()] == ["Marcos Lima"]
+
+    response = client.get("/clients/search?q=98765", headers=auth_headers)
+    assert [c["name"] for c in response.json()] == ["Mariana Souza"]
+
+    response = client.get("/clients/search?q=nobody", headers=auth_headers)
+    assert response.json() == []
+
+def test_search_fts_matches_shared_filter(db_session: Session):
+    """Test that the SQLite FTS path matches what _search_filter (the PostgreSQL condition) matches."""
+    client_service.create_client(db_session, schemas.ClientCreate(name="Mariana Souza", email="mariana@search.com", cpf="12312312312", phone="11987654321"))
+    client_service.create_client(db_session, schemas.ClientCreate(name="Marcos Lima", email="marcos@search.com", cpf="45645645645"))
+    for term, expected in [
+        ("search", set()), # Email matches by prefix only
+        ("marcos@sea", {"Marcos Lima"}),
+        ("987-654-321", {"Mariana Souza"}), # Phone and CPF match by digits
+        ("456.456", {"Marcos Lima"}),
+        ("souza", {"Mariana Souza"}),
+    ]:
+        assert client_service._search_strategy("sqlite", term) == "fts"
+        fts = {c.name for c in client_service.search_clients(db_session, term)}
+        shared = {c.name for c in db_session.scalars(client_service._prefix_search_query(term, 20))}
+        assert fts == shared == expected, term
+
+def test_search_clients_after_update(client: TestClient, db_session: Session, auth_headers: dict):
+    """Test that the search index follows client updates."""
+    created = client_service.create_client(db_session, schemas.ClientCreate(name="Old Name", email="rename@search.com", cpf="78978978978"))
+    client_service.update_client(db_session, created.id, schemas.ClientUpdate(name="Brand New"))
+
+    assert client.get("/clients/search?q=old name", headers=auth_headers).json() == []
+    response = client.get("/clients/search?q=brand", headers=auth_headers)
+    assert [c["id"] for c in response.json()] == [created.id]
+
+def test_stat_update_skips_search_index(db_session: Session):
+    """Test that updating the order stats does not rewrite the client's search index entry."""
+    created = client_service.create_client(db_session, schemas.ClientCreate(name="Stats Only", email="stats@search.com", cpf="32132132132"))
+    def rows_changed(statement: str) -> int:
+        before = db_session.execute(text("SELECT total_changes()")).scalar()
+        db_session.execute(text(statement), {"id": created.id})
+        return db_session.execute(text("SELECT total_changes()")).scalar() - before # Trigger writes included
+
+    assert rows_changed("UPDATE clients SET order_count = order_count + 1, lifetime_value = 10 WHERE id = :id") == 1
+    assert rows_changed("UPDATE clients SET phone = '11900001111' WHERE id = :id") > 1
+    db_session.rollback()
+
+# Test bulk import (requires admin)
+def test_import_clients(client: TestClient, db_session: Session, admin_auth_headers: dict):
+    """Test bulk import with valid, invalid and duplicate rows."""
+    client_service.create_client(db_session, schemas.ClientCreate(name="Existing", email="existing@example.com", cpf="98765432100"))
+    csv_content = (
+        "name,email,cpf,phone\n"
+        "Ana Import,ana@import.com,529.982.247-25,11911112222\n"  # Valid, punctuated CPF
+        "Bad Cpf,badcpf@import.com,12345678901,\n"                 # Checksum fails
+        "Bad Email,not-an-email,11144477735,\n"
+        "Ana Again,ana2@import.com,52998224725,\n"                 # Same CPF as row 1
+        "Existing Again,existing@example.com,12345678909,\n"       # Already in the database
+        "Bruno Import,bruno@IMPORT.com,11144477735,\n"
+    )
+    response = client.post(
+        "/clients/import",
+        files={"file": ("clients.csv", csv_content, "text/csv")},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["inserted"], data["duplicates"], data["rejected"]) == (2, 2, 2)
+    assert [r["status"] for r in data["rows"]] == ["inserted", "rejected", "rejected", "duplicate", "duplicate", "inserted"]
+    assert data["rows"][1]["reason"] == "Invalid CPF"
+
+    imported = client_service.get_client_by_cpf(db_session, "52998224725")
+    assert imported is not None and imported.phone == "11911112222"
+    assert client_service.get_client_by_email(db_session, "bruno@import.com") is not None
+
+def test_import_clients_email_rules_match_single_create(client: TestClient, db_session: Session, admin_auth_headers: dict):
+    """Test that an email EmailStr rejects is reported as rejected by the import and not inserted."""
+    with pytest.raises(ValueError):
+        schemas.ClientCreate(name="Ana", email="a..b@ex.com", cpf="52998224725")
+    response = client.post(
+        "/clients/import",
+        files={"file": ("clients.csv", "name,email,cpf\nAna,a..b@ex.com,52998224725\n", "text/csv")},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == 200
+    row, = response.json()["rows"]
+    assert row["status"] == "rejected"
+    assert "two periods in a row" in row["reason"]
+    assert client_service.get_client_by_cpf(db_session, "52998224725") is None
+
+def test_import_clients_missing_columns(client: TestClient, admin_auth_headers: dict):
+    """Test bulk import with a CSV lacking required columns."""
+    response = client.post(
+        "/clients/import",
+        files={"file": ("clients.csv", "name,email\nAna,ana@import.com\n", "text/csv")},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == 400
+    assert "cpf" in response.json()["detail"]
+
+def test_import_clients_undecodable_or_malformed(client: TestClient, admin_auth_headers: dict):
+    """Test that a non-UTF-8 or malformed CSV gets a 400 naming the offending line."""
+    latin1 = "name,email,cpf\nAna,ana@import.com,52998224725\nJo\xe3o,joao@import.com,11144477735\n".encode("latin-1")
+    response = client.post("/clients/import", files={"file": ("clients.csv", latin1, "text/csv")}, headers=admin_auth_headers)
+    assert response.status_code == 400
+    assert "line 3" in response.json()["detail"]
+
+    oversized = "name,email,cpf\nAna,ana@import.com,52998224725\n" + "A" * 200_000 + ",x@import.com,1\n"
+    response = client.post("/clients/import", files={"file": ("clients.csv", oversized, "text/csv")}, headers=admin_auth_headers)
+    assert response.status_code == 400
+    assert "line 3" in response.json()["detail"]
+
+def test_import_commits_each_chunk(client: TestClient, db_session: Session, admin_auth_headers: dict):
+    """Test that each chunk is committed on its own, and kept when the import stops early."""
+    from tests.conftest import engine
+    assert client.get("/clients/", headers=admin_auth_headers).status_code == 200 # Auth and revocation state warmed up
+    commits = []
+    listener = lambda connection: commits.append(connection)
+    event.listen(engine, "commit", listener) # Real COMMITs only, not savepoint releases
+    try:
+        response = client.post(
+            "/clients/import?chunk_size=1",
+            files={"file": ("clients.csv", "name,email,cpf\nBia,bia@import.com,11144477735\nCaio,caio@import.com,39053344705\n", "text/csv")},
+            headers=admin_auth_headers,
+        )
+    finally:
+        event.remove(engine, "commit", listener)
+    assert response.json()["inserted"] == 2
+    assert len(commits) == 2
+
+    content = "name,email,cpf\nAna,ana@import.com,52998224725\nJo\xe3o,joao@import.com,11144477735\n".encode("latin-1")
+    response = client.post(
+        "/clients/import?chunk_size=1", files={"file": ("clients.csv", content, "text/csv")}, headers=admin_auth_headers
+    )
+    assert response.status_code == 400
+    assert client_service.get_client_by_email(db_session, "ana@import.com") is not None
+
+def test_import_clients_non_admin(client: TestClient, auth_headers: dict):
+    """Test bulk import by a non-admin user (should fail)."""
+    response = client.post(
+        "/clients/import",
+        files={"file": ("clients.csv", "name,email,cpf\n", "text/csv")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 403
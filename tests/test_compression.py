@@ -0,0 +1,62 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.core import compression
+
+def test_large_json_is_gzipped(client: TestClient):
+    """Test that large JSON bodies are compressed only when the client accepts it."""
+    response = client.get("/api/v1/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content) # httpx decoded the body
+    assert response.json()["info"]["title"] == "Lu Estilo API"
+
+    response = client.get("/api/v1/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"}) # Under the minimum size
+    assert "content-encoding" not in response.headers
+
+def test_streams_and_encoded_bodies_are_skipped():
+    """Test that streaming responses and already-encoded bodies pass through untouched."""
+    payload = {"rows": ["x" * 50] * 100}
+
+    def stream(request):
+        return StreamingResponse(iter([b"a" * 4096, b"b" * 4096]), media_type="text/csv")
+
+    body = JSONResponse(payload).body
+    encoded_body = gzip.compress(body, compresslevel=1)
+
+    def encoded(request):
+        return Response(encoded_body, media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    app = Starlette(routes=[Route("/stream", stream), Route("/encoded", encoded), Route("/json", lambda r: JSONResponse(payload))])
+    with TestClient(compression.CompressionMiddleware(app)) as test_client:
+        response = test_client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.content == b"a" * 4096 + b"b" * 4096
+
+        response = test_client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip" # Set by the app, not compressed again
+        assert response.headers["content-length"] == str(len(encoded_body))
+        assert response.content == body
+
+        response = test_client.get("/json", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == payload
+
+def test_negotiate():
+    """Test Accept-Encoding parsing, including q-values and wildcards."""
+    available = {"br": None, "gzip": None}
+    assert compression.negotiate("gzip, deflate", available) == "gzip"
+    assert compression.negotiate("gzip, br", available) == "br"
+    assert compression.negotiate("br;q=0.5, gzip", available) == "gzip"
+    assert compression.negotiate("*", available) == "br"
+    assert compression.negotiate("gzip;q=0, identity", available) is None
+    assert compression.negotiate("", available) is None
+    assert gzip.decompress(compression.ENCODERS["gzip"](b"abc" * 100, 5)) == b"abc" * 100
@@ -0,0 +1,189 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
+
+from src.core import database
+
+def test_pool_options_from_settings():
+    """Test that the DB_POOL_* settings reach PostgreSQL engines but not SQLite ones."""
+    options = database.pool_options("postgresql+psycopg2://u:p@db/app", "primary")
+    assert options["poolclass"] is database.InstrumentedQueuePool
+    assert options["pool_size"] == database.settings.DB_POOL_SIZE
+    assert options["pool_pre_ping"] is database.settings.DB_POOL_PRE_PING
+    assert options["pool_use_lifo"] is database.settings.DB_POOL_USE_LIFO
+    async_options = database.pool_options("postgresql+asyncpg://u:p@db/app", "primary_async", is_async=True)
+    assert async_options["poolclass"] is database.InstrumentedAsyncQueuePool
+    assert database.pool_options("sqlite://", "test") == {"pool_logging_name": "test"}
+
+def test_pool_metrics(tmp_path, client: TestClient):
+    """Test that checkouts, overflow and timeouts are recorded and exposed on /metrics."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=database.InstrumentedQueuePool,
+        pool_logging_name="pool_test",
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    database.instrument_pool(engine, "pool_test")
+    first = engine.connect()
+    second = engine.connect() # Overflow connection
+    assert database.POOL_CHECKED_OUT.value(pool="pool_test") == 2
+    assert database.POOL_OVERFLOW.value(pool="pool_test") == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert database.POOL_CHECKOUT_TIMEOUTS.value(pool="pool_test") == 1
+    second.close()
+    first.close()
+    assert database.POOL_CHECKED_OUT.value(pool="pool_test") == 0
+    assert database.POOL_CHECKOUT_WAIT.count(pool="pool_test") == 3
+    assert database.POOL_CONNECTS.value(pool="pool_test") == 2
+    engine.dispose()
+
+    response = client.get("/metrics")
+    assert 'db_pool_checkout_wait_seconds_count{pool="pool_test"} 3' in response.text
+    assert 'db_pool_checkout_timeouts_total{pool="pool_test"} 1' in response.text
+
+# Read replicas: the primary is the in-memory test database, replicas are SQLite files
+@pytest.fixture
+def replica_files(tmp_path, client: TestClient, monkeypatch):
+    """Installs two file-backed replicas; the second file's directory does not exist, so it is unreachable."""
+    from sqlalchemy.orm import Session
+    from src.core import replicas
+    from src.models import Product
+
+    replica_path = tmp_path / "replica.db"
+    replica_engine = create_engine(f"sqlite:///{replica_path}")
+    database.Base.metadata.create_all(bind=replica_engine)
+    with Session(replica_engine) as session:
+        session.add(Product(id=1, description="Replica Product", sale_value=10.0, initial_stock=1, current_stock=1))
+        session.commit()
+    replica_engine.dispose()
+
+    replica_set = replicas.ReplicaSet([f"sqlite:///{tmp_path / 'missing' / 'down.db'}", f"sqlite:///{replica_path}"])
+    monkeypatch.setattr(replicas, "read_replicas", replica_set)
+    yield replica_set
+    client.cookies.clear()
+    client.portal.call(replica_set.dispose)
+
+def test_reads_routed_to_healthy_replica(client: TestClient, replica_files):
+    """Test that GET routes read from a replica and an unreachable replica is ejected."""
+    for _ in range(3):
+        response = client.get("/products/")
+        assert response.status_code == 200
+        assert [p["description"] for p in response.json()] == ["Replica Product"]
+    assert replica_files.is_ejected(0)
+    assert not replica_files.is_ejected(1)
+
+def test_read_your_writes_pins_primary(client: TestClient, replica_files, admin_auth_headers: dict):
+    """Test that a client's reads go to the primary right after it writes."""
+    created = client.post(
+        "/products/", json={"description": "Primary Product", "sale_value": 5.0, "initial_stock": 1},
+        headers=admin_auth_headers,
+    )
+    assert created.status_code == 201
+    assert "db_read_primary_until" in created.headers["set-cookie"]
+    response = client.get("/products/")
+    assert [p["description"] for p in response.json()] == ["Primary Product"]
+
+    client.cookies.clear() # Pin gone: back to the replica, which has not seen the write
+    response = client.get("/products/")
+    assert [p["description"] for p in response.json()] == ["Replica Product"]
+
+# Request-scoped sessions and the unit-of-work boundary
+@pytest.fixture
+def pool_events():
+    """Counts pool/connection events on both test engines: pool_events("checkout") -> list."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from tests.conftest import async_engine, engine
+
+    @contextmanager
+    def record(name: str):
+        seen = []
+        def listener(*args):
+            seen.append(args)
+        targets = (engine, async_engine.sync_engine)
+        for target in targets:
+            event.listen(target, name, listener)
+        try:
+            yield seen
+        finally:
+            for target in targets:
+                event.remove(target, name, listener)
+    return record
+
+def test_short_circuited_request_skips_pool(client: TestClient, auth_headers: dict, pool_events):
+    """Test that a request rejected by validation never checks out a connection."""
+    client.get("/clients/", headers=auth_headers) # Warm the auth caches
+    with pool_events("checkout") as checkouts:
+        response = client.post("/clients/", json={"name": "No Email"}, headers=auth_headers)
+    assert response.status_code == 422
+    assert checkouts == []
+
+def test_order_request_commits_once(client: TestClient, db_session, auth_headers: dict, pool_events):
+    """Test that creating an order (stock, stats, order rows) is a single commit."""
+    from src.models import Client, Product
+    db_client = Client(name="Once", email="once@example.com", cpf="52998224725")
+    product = Product(description="Once", sale_value=3.0, initial_stock=5, current_stock=5)
+    db_session.add_all([db_client, product])
+    db_session.commit()
+    order = {"client_id": db_client.id, "items": [{"product_id": product.id, "quantity": 2}]}
+    client.get("/clients/", headers=auth_headers) # Warm the auth caches and revocation filter
+    with pool_events("commit") as commits:
+        response = client.post("/orders/", json=order, headers=auth_headers)
+    assert response.status_code == 201
+    assert len(commits) == 1
+
+def test_session_scope_unit_of_work():
+    """Test that unused sessions are never created and the boundary commits once."""
+    from fastapi import HTTPException
+    from src.models import Product
+    from tests.conftest import TestingSessionLocal
+
+    with database.session_scope(TestingSessionLocal) as db:
+        pass
+    assert not db.started
+
+    # A deliberate HTTP error keeps writes the route asked to commit
+    with pytest.raises(HTTPException):
+        with database.session_scope(TestingSessionLocal) as db:
+            db.add(Product(description="Kept", sale_value=1.0, initial_stock=1, current_stock=1))
+            db.commit()
+            raise HTTPException(status_code=409)
+    # Anything unexpected rolls the request back
+    with pytest.raises(RuntimeError):
+        with database.session_scope(TestingSessionLocal) as db:
+            db.add(Product(description="Dropped", sale_value=1.0, initial_stock=1, current_stock=1))
+            db.commit()
+            raise RuntimeError("boom")
+
+    with TestingSessionLocal() as session:
+        assert [p.description for p in session.query(Product).all()] == ["Kept"]
+
+# Per-request SQL instrumentation
+def test_server_timing_reports_queries(client: TestClient, auth_headers: dict):
+    """Test that responses carry the request's query count and DB time."""
+    client.get("/clients/", headers=auth_headers) # Warm the auth caches
+    response = client.get("/products/", headers=auth_headers)
+    db_timing, app_timing = response.headers["server-timing"].split(", ")
+    assert db_timing.startswith("db;dur=") and db_timing.endswith('desc="1 queries"')
+    assert app_timing.startswith("app;dur=")
+
+def test_n_plus_one_detection(caplog):
+    """Test that one SELECT repeated within a request is logged, or raised in strict mode."""
+    from src.core.query_stats import NPlusOneError, track_queries
+    from src.services import product_service
+    from tests.conftest import TestingSessionLocal
+
+    with TestingSessionLocal() as db:
+        with track_queries("GET /loop", threshold=3, strict=False) as stats:
+            for product_id in range(4):
+                product_service.get_product(db, product_id)
+        assert stats.count == 4
+        assert "N+1 query in GET /loop: same SELECT run 3 times" in caplog.text
+
+        with pytest.raises(NPlusOneError):
+            with track_queries("GET /loop", threshold=3, strict=True):
+                for product_id in range(3):
+                    product_service.get_product(db, product_id)
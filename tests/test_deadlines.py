@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from src.core import deadlines
+from src.services import order_service
+from tests.conftest import TestingAsyncSessionLocal
+
+# Counts to a billion: minutes of work unless something stops it
+SLOW_QUERY = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT count(*) FROM c")
+
+def test_timeout_from_header_or_route():
+    """Test that the header wins (capped), then the route default, then the global default."""
+    middleware = deadlines.DeadlineMiddleware(
+        None, default_seconds=30, max_seconds=60, routes=deadlines.parse_route_timeouts("GET /orders=10;* /clients/import=300")
+    )
+    def scope(method, path, timeout=None):
+        return {"method": method, "path": path, "headers": [(b"x-request-timeout", timeout.encode())] if timeout else []}
+    assert middleware.timeout_for(scope("GET", "/orders/", "2.5")) == 2.5
+    assert middleware.timeout_for(scope("GET", "/orders/", "600")) == 60
+    assert middleware.timeout_for(scope("GET", "/orders/", "soon")) == 10
+    assert middleware.timeout_for(scope("GET", "/orders/7")) == 10
+    assert middleware.timeout_for(scope("POST", "/orders/")) == 30
+    assert middleware.timeout_for(scope("POST", "/clients/import")) == 300
+
+def test_statement_interrupted_at_deadline(client: TestClient):
+    """Test that a statement running past the deadline is stopped and the connection stays usable."""
+    async def run():
+        async with TestingAsyncSessionLocal() as session:
+            with deadlines.deadline_scope(0.1):
+                start = time.monotonic()
+                with pytest.raises(deadlines.DeadlineExceeded):
+                    await session.execute(SLOW_QUERY)
+                assert time.monotonic() - start < 2
+            await session.rollback()
+            assert (await session.execute(text("SELECT 1"))).scalar() == 1 # No deadline now
+    client.portal.call(run)
+
+def test_postgresql_timeout_armed_only_when_needed(monkeypatch):
+    """Test the SET LOCAL statements emitted on PostgreSQL: once, re-armed as time runs out, none past the server default."""
+    class Cursor:
+        def __init__(self):
+            self.statements = []
+        def execute(self, statement):
+            self.statements.append(statement)
+
+    class Connection:
+        dialect = postgresql.dialect()
+        def __init__(self):
+            self.info = {}
+
+    now = [1000.0]
+    monkeypatch.setattr(deadlines.time, "monotonic", lambda: now[0])
+    connection, cursor = Connection(), Cursor()
+    def run_statement():
+        deadlines._arm_statement_timeout(connection, cursor, "SELECT 1", (), None, False)
+
+    run_statement()
+    assert cursor.statements == [] # No deadline
+    with deadlines.deadline_scope(5):
+        deadlines._reset_statement_timeout(connection)
+        run_statement()
+        run_statement()
+        now[0] += 0.05 # Within the slack: no round trip
+        run_statement()
+        now[0] += 1.95
+        run_statement()
+        assert cursor.statements == ["SET LOCAL statement_timeout = 5000", "SET LOCAL statement_timeout = 3000"]
+
+        deadlines._reset_statement_timeout(connection) # Next transaction
+        run_statement()
+        assert cursor.statements[-1] == "SET LOCAL statement_timeout = 3000"
+
+    monkeypatch.setattr(deadlines.settings, "DB_STATEMENT_TIMEOUT_MS", 30000)
+    cursor.statements.clear()
+    with deadlines.deadline_scope(60):
+        deadlines._reset_statement_timeout(connection)
+        run_statement()
+        assert cursor.statements == [] # The server default stops it first
+        now[0] += 40
+        run_statement()
+        assert cursor.statements == ["SET LOCAL statement_timeout = 20000"]
+
+def test_slow_route_returns_504(client: TestClient, auth_headers: dict, monkeypatch):
+    """Test that a pathological orders query fails fast with 504 and later requests still work."""
+    async def pathological_filter(db, **filters):
+        await db.execute(SLOW_QUERY)
+        return []
+
+    monkeypatch.setattr(order_service, "get_orders_async", pathological_filter)
+    before = deadlines.DEADLINE_EXCEEDED.value(stage="statement")
+    start = time.monotonic()
+    response = client.get("/orders/", headers={**auth_headers, "X-Request-Timeout": "0.2"})
+    assert response.status_code == 504
+    assert time.monotonic() - start < 2
+    assert deadlines.DEADLINE_EXCEEDED.value(stage="statement") == before + 1
+
+    monkeypatch.undo()
+    assert client.get("/orders/?limit=5", headers=auth_headers).status_code == 200
+
+def test_backstop_outside_database():
+    """Test that waits outside the database end in 504 too, but a started response is not cut."""
+    async def stuck(request):
+        await asyncio.sleep(10)
+
+    async def stream(request):
+        async def chunks():
+            yield b"a"
+            await asyncio.sleep(0.4)
+            yield b"b"
+        return StreamingResponse(chunks())
+
+    async def run():
+        app = deadlines.DeadlineMiddleware(
+            Starlette(routes=[Route("/stuck", stuck), Route("/stream", stream)]), default_seconds=0.05, max_seconds=1
+        )
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/stuck")
+            assert response.status_code == 504
+            assert response.json() == {"detail": "Request deadline exceeded"}
+            response = await client.get("/stream")
+            assert (response.status_code, response.content) == (200, b"ab")
+    asyncio.run(run())
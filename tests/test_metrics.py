@@ -0,0 +1,85 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from src.core import metrics
+from src.core.request_metrics import HTTP_REQUESTS, HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DURATION
+
+def test_request_metrics_by_route_template(client: TestClient, auth_headers: dict):
+    """Test that requests are counted under their route template, not the raw path."""
+    labels = {"method": "GET", "route": "/products/{product_id}", "status": "404"}
+    before = HTTP_REQUESTS.value(**labels)
+    timed_before = HTTP_REQUEST_DURATION.count(**labels)
+    for product_id in (991, 992):
+        assert client.get(f"/products/{product_id}", headers=auth_headers).status_code == 404
+    assert HTTP_REQUESTS.value(**labels) == before + 2
+    assert HTTP_REQUEST_DURATION.count(**labels) == timed_before + 2
+    assert HTTP_REQUEST_DB_QUERIES.count(method="GET", route="/products/{product_id}") >= 2
+
+    client.get("/no-such-page")
+    for _ in range(2):
+        client.get("/clients/", headers=auth_headers) # Second lookup hits the JWT claims cache
+    response = client.get("/metrics")
+    assert 'http_requests_total{method="GET",route="/products/{product_id}",status="404"}' in response.text
+    assert 'route="unmatched"' in response.text
+    assert "/products/991" not in response.text
+    assert "http_requests_in_flight 1" in response.text # The scrape itself
+    assert 'cache_requests_total{cache="jwt_claims",result="hit"}' in response.text
+
+def test_counters_across_threads():
+    """Test that lock-free per-thread counters and histograms add up."""
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("thread_test", "Test counter", ["kind"])
+    histogram = registry.histogram("thread_test_seconds", "Test histogram")
+
+    def work():
+        for _ in range(10_000):
+            counter.inc(kind="a")
+            histogram.observe(0.01)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value(kind="a") == 80_000
+    assert histogram.count() == 80_000
+    assert 'thread_test_seconds_count 80000' in registry.render()
+
+_WORKER = """
+from src.core.metrics import MetricsRegistry
+registry = MetricsRegistry()
+registry.counter("mp_requests", "Test counter").inc(3)
+registry.histogram("mp_seconds", "Test histogram").observe(0.2)
+registry.gauge("mp_in_flight", "Test gauge").set(7)
+registry.enable_multiprocess({directory!r}, sync_seconds=3600)
+"""
+
+def test_multiprocess_aggregation(tmp_path: Path):
+    """Test that /metrics output sums counters over every worker's snapshot and drops exited workers' gauges."""
+    for _ in range(2): # Two workers that have since exited
+        subprocess.run([sys.executable, "-c", _WORKER.format(directory=str(tmp_path))], check=True, cwd=Path(__file__).parent.parent)
+
+    registry = metrics.MetricsRegistry()
+    registry.counter("mp_requests", "Test counter").inc(2)
+    registry.histogram("mp_seconds", "Test histogram").observe(0.2)
+    registry.gauge("mp_in_flight", "Test gauge").set(1)
+    registry.enable_multiprocess(str(tmp_path), sync_seconds=3600)
+    text = registry.render()
+    assert "mp_requests_total 8" in text
+    assert "mp_seconds_count 3" in text
+    assert "mp_in_flight 1" in text
+    # Exited workers were folded into one aggregate file: this worker's snapshot and the aggregate remain
+    assert {path.name for path in tmp_path.glob("metrics_*.json")} == {
+        "metrics_aggregate.json", Path(registry._snapshot_path).name
+    }
+    assert "mp_requests_total 8" in registry.render() # Counted once after compaction
+
+    subprocess.run([sys.executable, "-c", _WORKER.format(directory=str(tmp_path))], check=True, cwd=Path(__file__).parent.parent)
+    text = registry.render()
+    assert "mp_requests_total 11" in text
+    assert "mp_seconds_count 4" in text
+    assert "mp_in_flight 1" in text
+    assert len(list(tmp_path.glob("metrics_*.json"))) == 2
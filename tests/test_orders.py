@@ -1,9 +1,12 @@
+from typing import List
+
 import pytest
 from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from src import schemas
-from src.services import client_service, product_service, order_service
+from src.services import client_service, product_service, order_service, client_stats_service
 from src.models import Client, Product, Order, OrderItem, User, OrderStatus
 
 @pytest.fixture(scope="function")
@@ -242,3 +245,78 @@ def test_delete_nonexistent_order(client: TestClient, admin_auth_headers: dict):
     response = client.delete("/orders/99999", headers=admin_auth_headers)
     assert response.status_code == 404
 
+
+# Test denormalized client stats
+def test_client_stats_maintained_on_write(client: TestClient, db_session: Session, admin_auth_headers: dict, setup_order_data: dict):
+    """Test that order creation, cancellation and deletion keep client stats current."""
+    client_id = setup_order_data["client"].id
+    prod1_id = setup_order_data["product1"].id
+    order1 = order_service.create_order(db_session, schemas.OrderCreate(
+        client_id=client_id, items=[schemas.OrderItemCreate(product_id=prod1_id, quantity=2)]
+    ))
+    order2 = order_service.create_order(db_session, schemas.OrderCreate(
+        client_id=client_id, items=[schemas.OrderItemCreate(product_id=prod1_id, quantity=1)]
+    ))
+
+    stats = client.get(f"/clients/{client_id}?include_stats=true", headers=admin_auth_headers).json()["stats"]
+    assert stats["order_count"] == 2
+    assert stats["lifetime_value"] == 30.0
+    assert stats["last_order_at"] is not None
+
+    client.put(f"/orders/{order2.id}", json={"status": OrderStatus.CANCELLED.value}, headers=admin_auth_headers)
+    stats = client.get(f"/clients/{client_id}?include_stats=true", headers=admin_auth_headers).json()["stats"]
+    assert (stats["order_count"], stats["lifetime_value"]) == (1, 20.0)
+
+    client.put(f"/orders/{order2.id}", json={"status": OrderStatus.PENDING.value}, headers=admin_auth_headers)
+    client.delete(f"/orders/{order1.id}", headers=admin_auth_headers)
+    stats = client.get(f"/clients/{client_id}?include_stats=true", headers=admin_auth_headers).json()["stats"]
+    assert (stats["order_count"], stats["lifetime_value"]) == (1, 10.0)
+
+    client.delete(f"/orders/{order2.id}", headers=admin_auth_headers)
+    stats = client.get(f"/clients/{client_id}?include_stats=true", headers=admin_auth_headers).json()["stats"]
+    assert stats == {"order_count": 0, "lifetime_value": 0.0, "last_order_at": None}
+
+def test_rebuild_client_stats(db_session: Session, setup_order_data: dict):
+    """Test recomputing client stats from the orders table."""
+    test_client = setup_order_data["client"]
+    order_service.create_order(db_session, schemas.OrderCreate(
+        client_id=test_client.id, items=[schemas.OrderItemCreate(product_id=setup_order_data["product2"].id, quantity=2)]
+    ))
+    test_client.order_count, test_client.lifetime_value = 99, 0.0 # Simulate drift
+    db_session.commit()
+
+    client_stats_service.rebuild_client_stats(db_session)
+    db_session.refresh(test_client)
+    assert (test_client.order_count, test_client.lifetime_value) == (1, 11.0)
+    assert test_client.last_order_at is not None
+
+def test_order_query_budget(client: TestClient, auth_headers: dict, setup_order_data: dict, query_budget):
+    """Test that order creation and reads run a fixed number of queries, whatever the item count."""
+    client_id = setup_order_data["client"].id
+    product_ids = [setup_order_data[name].id for name in ("product1", "product2", "product_low_stock")]
+    client.get("/orders/", headers=auth_headers) # Warm the auth caches and revocation filter
+    selects = []
+    for items in ([{"product_id": product_ids[0], "quantity": 1}],
+                  [{"product_id": product_id, "quantity": 1} for product_id in product_ids]):
+        with query_budget(10 + len(items)) as statements: # SQLite inserts order items one by one
+            response = client.post("/orders/", json={"client_id": client_id, "items": items}, headers=auth_headers)
+        assert response.status_code == 201
+        selects.append(sum(statement.startswith("SELECT") for statement in statements))
+    assert selects[0] == selects[1]
+
+    with query_budget(4): # Order, then client, items and products in one query each
+        response = client.get(f"/orders/{response.json()['id']}", headers=auth_headers)
+    assert len(response.json()["items"]) == 3
+
+def test_order_list_matches_response_model(client: TestClient, db_session: Session, auth_headers: dict, setup_order_data: dict):
+    """Test that the fast list path renders exactly what the OrderRead response_model would."""
+    client_id = setup_order_data["client"].id
+    for product in ("product1", "product2"):
+        order_service.create_order(db_session, schemas.OrderCreate(
+            client_id=client_id, items=[schemas.OrderItemCreate(product_id=setup_order_data[product].id, quantity=2)]
+        ))
+    response = client.get("/orders/", headers=auth_headers)
+    assert response.status_code == 200
+    db_session.expire_all()
+    adapter = TypeAdapter(List[schemas.OrderRead])
+    assert response.content == adapter.dump_json(adapter.validate_python(order_service.get_orders(db_session)))
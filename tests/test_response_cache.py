@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.core import response_cache as rc
+from src.main import app
+from src.models import Product
+
+def _product(client: TestClient, headers: dict, description: str = "Camisa") -> dict:
+    response = client.post("/products/", json={"description": description, "sale_value": 10.0, "initial_stock": 5}, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+def test_hit_after_miss(client: TestClient, admin_auth_headers: dict):
+    """Test that a repeated GET is answered from the cache with the same body."""
+    product = _product(client, admin_auth_headers)
+    first = client.get(f"/products/{product['id']}")
+    assert first.headers["x-cache"] == "MISS"
+    second = client.get(f"/products/{product['id']}")
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+    assert second.headers["content-type"] == first.headers["content-type"]
+    assert client.get("/products/?limit=100&skip=0").headers["x-cache"] == "MISS"
+    assert client.get("/products/?skip=0&limit=100").headers["x-cache"] == "HIT" # Query order does not matter
+
+def test_api_write_invalidates(client: TestClient, admin_auth_headers: dict):
+    """Test that a write through the API drops the entries tagged with what it changed."""
+    product = _product(client, admin_auth_headers)
+    client.get(f"/products/{product['id']}")
+    client.get("/products/")
+    response = client.put(f"/products/{product['id']}", json={"description": "Camisa Polo"}, headers=admin_auth_headers)
+    assert response.status_code == 200
+
+    response = client.get(f"/products/{product['id']}")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()["description"] == "Camisa Polo"
+    response = client.get("/products/")
+    assert response.headers["x-cache"] == "MISS"
+    assert [p["description"] for p in response.json()] == ["Camisa Polo"]
+
+def test_direct_session_write_invalidates(client: TestClient, admin_auth_headers: dict, db_session: Session):
+    """Test that commits outside a request (scripts, services) invalidate too."""
+    product = _product(client, admin_auth_headers)
+    client.get("/products/")
+    db_session.get(Product, product["id"]).current_stock = 1
+    db_session.commit()
+    response = client.get("/products/")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()[0]["current_stock"] == 1
+
+def test_cached_auth_route_still_requires_auth(client: TestClient, auth_headers: dict):
+    """Test that a cached entry behind auth is not served to anonymous callers."""
+    assert client.get("/clients/", headers=auth_headers).headers["x-cache"] == "MISS"
+    assert client.get("/clients/", headers=auth_headers).headers["x-cache"] == "HIT"
+    assert client.get("/clients/").status_code == 401
+
+def test_concurrent_misses_share_one_query(client: TestClient, admin_auth_headers: dict, query_budget):
+    """Test that 500 concurrent identical requests for an uncached page run its query once."""
+    _product(client, admin_auth_headers)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(async_client.get("/products/?limit=20") for _ in range(500)))
+
+    with query_budget(1) as statements:
+        responses = client.portal.call(burst)
+    assert len(statements) == 1
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert [response.headers["x-cache"] for response in responses].count("MISS") == 1
+    assert rc.response_cache.flight("public|/products/?limit=20") is None
+
+def test_expired_entry_served_stale_while_refreshing(client: TestClient, admin_auth_headers: dict):
+    """Test that an expired entry answers requests while another request refreshes it."""
+    _product(client, admin_auth_headers)
+    key = "public|/products/?"
+    client.get("/products/")
+    entry = rc.response_cache._entries[key]
+    rc.response_cache._entries[key] = entry._replace(expires_at=time.monotonic() - 1)
+
+    async def start_flight():
+        return [rc.response_cache.start_flight(key)] # Listed: portal.call would await a bare future
+    flight, = client.portal.call(start_flight) # A request is refreshing it
+    response = client.get("/products/")
+    assert response.headers["x-cache"] == "STALE"
+    assert response.content == entry.body
+    client.portal.call(rc.response_cache.end_flight, key, flight, None)
+
+    assert client.get("/products/").headers["x-cache"] == "MISS" # No refresh running: this one refreshes
+    assert client.get("/products/").headers["x-cache"] == "HIT"
+
+def test_invalidated_entry_is_not_served_stale(client: TestClient, admin_auth_headers: dict):
+    """Test that stale-while-revalidate never serves an entry a write invalidated."""
+    product = _product(client, admin_auth_headers)
+    client.get("/products/")
+    client.put(f"/products/{product['id']}", json={"description": "Camisa Polo"}, headers=admin_auth_headers)
+    response = client.get("/products/")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()[0]["description"] == "Camisa Polo"
+
+def _cache(**kwargs) -> rc.ResponseCache:
+    options = {"max_bytes": 10_000, "max_entry_bytes": 5_000, "default_ttl": 60}
+    options.update(kwargs)
+    return rc.ResponseCache(rc.MemoryInvalidationStore(tag_ttl=600), **options)
+
+def test_byte_budget_evicts_least_recently_used():
+    """Test that entries beyond the byte budget are evicted oldest first, and oversized ones skipped."""
+    cache = _cache(max_bytes=3 * (1000 + rc._ENTRY_OVERHEAD))
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await cache.put(rc.PendingEntry(key, 60, {rc.ALL}, 0), 200, [], b"x" * 1000)
+        assert await cache.get("a") is not None # Now the most recently used
+        await cache.put(rc.PendingEntry("d", 60, {rc.ALL}, 0), 200, [], b"x" * 1000)
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None
+        await cache.put(rc.PendingEntry("big", 60, {rc.ALL}, 0), 200, [], b"x" * 6000)
+        assert await cache.get("big") is None
+    asyncio.run(run())
+    assert len(cache) == 3
+
+def test_fill_racing_a_write_is_not_stored():
+    """Test that a response computed across an invalidation of its tags is discarded."""
+    cache = _cache()
+
+    async def run():
+        seq = await cache.store.current_seq()
+        await cache.invalidate({"product:1"}) # Committed while the route was reading
+        await cache.put(rc.PendingEntry("k", 60, {rc.ALL, "product:1"}, seq), 200, [], b"{}")
+        assert await cache.get("k") is None
+        await cache.put(rc.PendingEntry("k", 60, {rc.ALL, "product:1"}, await cache.store.current_seq()), 200, [], b"{}")
+        assert await cache.get("k") is not None
+    asyncio.run(run())
+
+def test_replica_fill_waits_out_replica_lag():
+    """Test that replica reads are not stored right after their tags were invalidated."""
+    cache = _cache(replica_lag=5)
+
+    async def run():
+        await cache.invalidate({"products"})
+        seq = await cache.store.current_seq()
+        await cache.put(rc.PendingEntry("k", 60, {rc.ALL, "products"}, seq), 200, [], b"[]", from_replica=True)
+        assert await cache.get("k") is None
+        cache.store._tags["products"] = (seq, time.time() - 10) # The write is older than the lag bound
+        await cache.put(rc.PendingEntry("k", 60, {rc.ALL, "products"}, seq), 200, [], b"[]", from_replica=True)
+        assert await cache.get("k") is not None
+    asyncio.run(run())
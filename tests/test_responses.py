@@ -0,0 +1,43 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from src import schemas
+from src.core import responses
+from src.models import OrderStatus
+
+def _order(order_id: int) -> SimpleNamespace:
+    product = SimpleNamespace(
+        id=3, description="Camisa ç", sale_value=Decimal("59.90"), barcode=None, section="Camisas",
+        initial_stock=10, current_stock=8, validity_date=date(2030, 1, 31), image_urls=None,
+    )
+    client = SimpleNamespace(
+        id=2, name="Ana", email="ana@example.com", cpf="12345678901", phone=None, address=None,
+        created_at=datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc), updated_at=None,
+    )
+    return SimpleNamespace(
+        id=order_id, client_id=2, status=OrderStatus.PENDING, created_at=datetime(2024, 5, 2, 9, 0),
+        updated_at=None, total_value=120, client=client,
+        items=[SimpleNamespace(id=1, product_id=3, quantity=2, unit_price=60, product=product)],
+    )
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_rows_matches_pydantic(monkeypatch, use_orjson: bool):
+    """Test that dump_rows + FastJSONResponse render the same bytes as the response_model, with and without orjson."""
+    if not use_orjson:
+        monkeypatch.setattr(responses, "orjson", None)
+    elif responses.orjson is None:
+        pytest.skip("orjson is not installed")
+    rows = [_order(1), _order(2)]
+    rendered = responses.FastJSONResponse(responses.dump_rows(schemas.OrderRead, rows)).body
+    adapter = TypeAdapter(List[schemas.OrderRead]) # What FastAPI does with a response_model
+    assert rendered == adapter.dump_json(adapter.validate_python(rows))
+
+def test_missing_required_attribute():
+    """Test that rows missing a required field fail loudly instead of rendering partial objects."""
+    with pytest.raises(AttributeError):
+        responses.dump_rows(schemas.ProductRead, [SimpleNamespace(id=1)])
@@ -0,0 +1,30 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core import warmup
+from src.main import app
+from src.services.token_revocation_service import token_revocation_store
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+
+def test_warm_up():
+    """Test that every warmup step runs against the database and the routes are built."""
+    app.openapi_schema = None
+    timings = asyncio.run(warmup.warm_up(app, 5, TestingSessionLocal, TestingAsyncSessionLocal))
+    assert None not in timings.values(), timings
+    assert app.openapi_schema is not None
+    assert token_revocation_store._bloom is not None
+
+def test_warm_up_survives_unreachable_database(tmp_path, caplog):
+    """Test that database steps are logged and skipped when the database cannot be reached."""
+    url = f"sqlite:///{tmp_path}/missing/app.db"
+    session_factory = sessionmaker(bind=create_engine(url))
+    async_session_factory = async_sessionmaker(
+        create_async_engine(url.replace("sqlite", "sqlite+aiosqlite")), class_=AsyncSession
+    )
+    timings = asyncio.run(warmup.warm_up(app, 5, session_factory, async_session_factory))
+    assert timings["routes"] is not None
+    assert timings["pool"] is None and timings["async statements"] is None
+    assert "Startup warmup step 'pool' failed" in caplog.text
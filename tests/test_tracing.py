@@ -0,0 +1,63 @@
+import pytest
+
+from src.core.tracing import AdaptiveTraceSampler, parse_trace_rates
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def _context(method: str, path: str, parent_sampled=None) -> dict:
+    return {"parent_sampled": parent_sampled, "asgi_scope": {"type": "http", "method": method, "path": path}}
+
+@pytest.fixture
+def sampler() -> AdaptiveTraceSampler:
+    return AdaptiveTraceSampler(
+        0.01,
+        parse_trace_rates("GET /products/{product_id}=0.2;POST /clients/import=1"),
+        slow_seconds=1.0,
+        problem_rate=0.5,
+        per_route_per_minute=30,
+        clock=FakeClock(),
+    )
+
+def test_parse_trace_rates():
+    """Test the "METHOD /route=rate" format, with trailing slashes ignored."""
+    assert parse_trace_rates("get /products/=0.5; POST /orders=1") == {("GET", "/products"): 0.5, ("POST", "/orders"): 1.0}
+    with pytest.raises(ValueError):
+        parse_trace_rates("GET /products=2")
+
+def test_route_base_rates(sampler: AdaptiveTraceSampler):
+    """Test that configured routes get their own rate once their template has been seen."""
+    assert sampler(_context("GET", "/orders/")) == 0.01
+    assert sampler(_context("POST", "/clients/import")) == 1.0
+    sampler.observe("GET", "/products/{product_id}", 0.01, 200)
+    sampler.observe("GET", "/products/", 0.01, 200)
+    assert sampler(_context("GET", "/products/7")) == 0.2
+    assert sampler(_context("GET", "/products")) == 0.01
+    assert sampler(_context("GET", "/products/7", parent_sampled=False)) == 0.0 # Upstream decision wins
+
+def test_slow_or_failing_route_is_boosted(sampler: AdaptiveTraceSampler):
+    """Test that a route that was recently slow or failed is sampled at the problem rate, then recovers."""
+    sampler.observe("GET", "/orders/{order_id}", 0.02, 200)
+    assert sampler(_context("GET", "/orders/3")) == 0.01
+    sampler.observe("GET", "/orders/{order_id}", 2.5, 200)
+    assert sampler(_context("GET", "/orders/3")) == 0.5
+    sampler._clock.now += 60 # Still in the previous window
+    assert sampler(_context("GET", "/orders/3")) == 0.5
+    sampler._clock.now += 120
+    assert sampler(_context("GET", "/orders/3")) == 0.01
+
+    sampler.observe("POST", "/orders/", 0.05, 503)
+    assert sampler(_context("POST", "/orders")) == 0.5
+
+def test_hot_healthy_route_is_down_sampled(sampler: AdaptiveTraceSampler):
+    """Test that a healthy route is capped to about per_route_per_minute traces."""
+    for _ in range(300):
+        sampler.observe("GET", "/products/{product_id}", 0.01, 200)
+    assert sampler(_context("GET", "/products/1")) == pytest.approx(30 / 300)
+    for _ in range(6000):
+        sampler.observe("POST", "/clients/import", 0.01, 201)
+    assert sampler(_context("POST", "/clients/import")) == pytest.approx(30 / 6000)